@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import time
+
+from config import Config
+from database import db
+
+class DownloadAnalytics:
+    """
+    Per-link download analytics (hits, unique viewers, bytes served).
+    Har range request par DB write nahi hota: counters memory mein jama hote hain
+    aur ANALYTICS_FLUSH_INTERVAL par ek bulk write mein time-bucketed collection mein jaate hain.
+    """
+
+    def __init__(self):
+        # {(unique_id, bucket): {"owner": int, "hits": int, "bytes": int, "viewers": set}}
+        self._pending = {}
+        self._flush_task = None
+
+    @staticmethod
+    def viewer_id(ip: str, user_agent: str) -> str:
+        # Raw IP store nahi karte, sirf chhota hash
+        return hashlib.blake2b(f"{ip}|{user_agent}".encode(), digest_size=8).hexdigest()
+
+    def _entry(self, unique_id, owner):
+        bucket = int(time.time()) // Config.ANALYTICS_BUCKET_SECONDS * Config.ANALYTICS_BUCKET_SECONDS
+        entry = self._pending.get((unique_id, bucket))
+        if entry is None:
+            entry = self._pending[(unique_id, bucket)] = {"owner": owner, "hits": 0, "bytes": 0, "viewers": set()}
+        return entry
+
+    def record_hit(self, unique_id, owner, viewer):
+        entry = self._entry(unique_id, owner)
+        entry["hits"] += 1
+        entry["viewers"].add(viewer)
+
+    def record_bytes(self, unique_id, owner, size):
+        if size:
+            self._entry(unique_id, owner)["bytes"] += size
+
+    def hot_files(self, limit=10):
+        """Current (unflushed) window ke sabse zyada hit hone wale unique_ids."""
+        totals = {}
+        for (unique_id, _), entry in self._pending.items():
+            totals[unique_id] = totals.get(unique_id, 0) + entry["hits"]
+        return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        rows = [
+            {"unique_id": uid, "bucket": bucket, "owner": e["owner"], "hits": e["hits"], "bytes": e["bytes"], "viewers": list(e["viewers"])}
+            for (uid, bucket), e in batch.items()
+        ]
+        try:
+            await db.record_download_stats(rows)
+        except Exception as e:
+            print(f"⚠️ Analytics flush failed ({len(rows)} rows), will retry: {e}")
+            for key, e_old in batch.items():
+                entry = self._pending.setdefault(key, {"owner": e_old["owner"], "hits": 0, "bytes": 0, "viewers": set()})
+                entry["hits"] += e_old["hits"]
+                entry["bytes"] += e_old["bytes"]
+                entry["viewers"] |= e_old["viewers"]
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(Config.ANALYTICS_FLUSH_INTERVAL)
+            await self.flush()
+
+    def start(self):
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+
+analytics = DownloadAnalytics()
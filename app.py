@@ -12,21 +12,26 @@ except RuntimeError:
 # ------------------------------------------------
 
 import secrets
+import json
+import hashlib
+import time
 import traceback
 import uvicorn
+import httpx
 import re
 import logging
+from collections import deque
 from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 
 from pyrogram import Client, filters, enums
-from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
-from pyrogram.errors import FloodWait, UserNotParticipant
+from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated, InputMediaPhoto, InputMediaVideo, InputMediaAudio, InputMediaDocument
+from pyrogram.errors import FloodWait, AuthKeyUnregistered, Unauthorized
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response, FileResponse
 from pyrogram.file_id import FileId
 from pyrogram import raw
-from pyrogram.session import Session, Auth
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 import math
@@ -34,88 +39,195 @@ import math
 # Project ki dusri files se important cheezein import karo
 from config import Config
 from database import db
+from analytics import analytics
+from broadcast import BroadcastEngine
+from startup import StartupGraph
+from assets import assets, page_cache, html_response, IMMUTABLE
+from force_sub import force_sub_cache
+from signed_links import link_signer
+from hot_cache import HotFileCache
+from zipstream import ZipEntry, ZipStream
+from ingest import IngestQueue
+from resolver import message_resolver
+from user_context import UserContext
+from session_store import get_media_session, invalidate_media_session, warm_peer
+import metrics
+import server_timing
+from server_timing import ServerTimingMiddleware
 
 # =====================================================================================
 # --- SETUP: BOT, WEB SERVER, AUR LOGGING ---
 # =====================================================================================
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """
-    Yeh function bot ko web server ke saath start aur stop karta hai.
-    """
-    print("--- Lifespan: Server chalu ho raha hai... ---")
-    
-    await db.connect()
-    
+async def start_main_bot():
+    print("Starting main Pyrogram bot...")
+    await bot.start()
+    # Main bot bhi streaming pool ka client 0 hai
+    multi_clients[0] = bot
+    work_loads.setdefault(0, 0)
+
+async def load_bot_identity():
+    me = await bot.get_me()
+    Config.BOT_USERNAME = me.username
+    print(f"✅ Main Bot [@{Config.BOT_USERNAME}] safaltapoorvak start ho gaya.")
+
+async def set_menu_commands():
+    from pyrogram.types import BotCommand
+    await bot.set_bot_commands([
+        BotCommand("start", "🏠 Start Bot"),
+        BotCommand("help", "📝 Help & Guide"),
+        BotCommand("showplan", "💎 Premium Plans"),
+        BotCommand("mydata", "📊 My Data & Usage"),
+        BotCommand("allcommands", "📜 All Commands List"),
+        BotCommand("my_links", "🔗 My Files")
+    ])
+    print("✅ Bot Commands Menu Set.")
+
+async def verify_storage_channel():
+    # Ensure we know about the channels
+    # force_refresh_dialogs removed as it is not supported for bots
+    print(f"Verifying storage channel ({Config.STORAGE_CHANNEL})...")
     try:
-        print("Starting main Pyrogram bot...")
-        await bot.start()
-        
-        me = await bot.get_me()
-        Config.BOT_USERNAME = me.username
-        print(f"✅ Main Bot [@{Config.BOT_USERNAME}] safaltapoorvak start ho gaya.")
+        await bot.get_chat(Config.STORAGE_CHANNEL)
+        print("✅ Storage channel accessible hai.")
+    except Exception as e:
+        print(f"!!! ERROR: Could not access Storage Channel ({Config.STORAGE_CHANNEL}). Error: {e}")
+        print("👉 ACTION REQUIRED: Please SEND A MESSAGE (e.g. '.') in the Storage Channel NOW so I can find it!")
 
-        # --- SET BOT MENU COMMANDS ---
-        try:
-            from pyrogram.types import BotCommand
-            await bot.set_bot_commands([
-                BotCommand("start", "🏠 Start Bot"),
-                BotCommand("help", "📝 Help & Guide"),
-                BotCommand("showplan", "💎 Premium Plans"),
-                BotCommand("mydata", "📊 My Data & Usage"),
-                BotCommand("allcommands", "📜 All Commands List"),
-                BotCommand("my_links", "🔗 My Files")
-            ])
-            print("✅ Bot Commands Menu Set.")
-        except Exception as e:
-            print(f"Warning: Could not set bot commands: {e}")
+async def verify_force_sub_channel():
+    if not Config.FORCE_SUB_CHANNEL:
+        return
+    try:
+        print(f"Verifying force sub channel ({Config.FORCE_SUB_CHANNEL})...")
+        chat = await bot.get_chat(Config.FORCE_SUB_CHANNEL)
+        force_sub_cache.set_invite_link(chat.invite_link)
+        print("✅ Force Sub channel accessible hai.")
+    except Exception as e:
+        print(f"!!! WARNING: Bot cannot access Force Sub channel ({Config.FORCE_SUB_CHANNEL}). Bot, Force Sub channel mein admin nahi hai ya link galat hai. Error: {e}")
+
+async def start_analytics():
+    analytics.start()
 
-        if len(multi_clients) > 1:
-            print(f"✅ Multi-Client Mode Enabled. Total Clients: {len(multi_clients)}")
+async def start_upload_queue():
+    upload_queue.start()
 
-        # Ensure we know about the channels
-        # force_refresh_dialogs removed as it is not supported for bots
+storage_purge_task = None
 
-        print(f"Verifying storage channel ({Config.STORAGE_CHANNEL})...")
+async def purge_orphan_storage():
+    """
+    Dedup index ke jin storage messages ko ab koi active link reference nahi karta (refs 0),
+    unhe storage channel se delete karta hai (delete_messages ek call mein 100 tak).
+    """
+    while True:
         try:
-            await bot.get_chat(Config.STORAGE_CHANNEL)
-            print("✅ Storage channel accessible hai.")
+            while True:
+                msg_ids = await db.pop_orphan_contents(100)
+                if not msg_ids:
+                    break
+                await bot.delete_messages(Config.STORAGE_CHANNEL, msg_ids)
+                # Index entries sirf delete safal hone ke baad hatti hain; fail ho toh marked rehkar agle sweep mein retry
+                await db.confirm_orphan_purge(msg_ids)
+                print(f"🧹 Storage purge: {len(msg_ids)} unreferenced messages deleted.")
+        except FloodWait as e:
+            metrics.flood_wait(bot, "purge", e.value)
+            await asyncio.sleep(e.value + 1)
         except Exception as e:
-            print(f"!!! ERROR: Could not access Storage Channel ({Config.STORAGE_CHANNEL}). Error: {e}")
-            print("👉 ACTION REQUIRED: Please SEND A MESSAGE (e.g. '.') in the Storage Channel NOW so I can find it!")
+            print(f"⚠️ Storage purge error: {e}")
+        await asyncio.sleep(Config.EXPIRY_SWEEP_INTERVAL)
 
-        if Config.FORCE_SUB_CHANNEL:
-            try:
-                print(f"Verifying force sub channel ({Config.FORCE_SUB_CHANNEL})...")
-                await bot.get_chat(Config.FORCE_SUB_CHANNEL)
-                print("✅ Force Sub channel accessible hai.")
-            except Exception as e:
-                print(f"!!! WARNING: Bot cannot access Force Sub channel ({Config.FORCE_SUB_CHANNEL}). Bot, Force Sub channel mein admin nahi hai ya link galat hai. Error: {e}")
-        
+revocation_sync_task = None
+
+async def sync_revocations():
+    """Dusre workers ke /revoke har BAN_REFRESH_INTERVAL par signed URL denylist tak pahunchte hain."""
+    while True:
+        await asyncio.sleep(Config.BAN_REFRESH_INTERVAL)
         try:
-            await cleanup_channel(bot)
+            link_signer.load_revocations(await db.get_revocations())
         except Exception as e:
-            print(f"Warning: Channel cleanup fail ho gaya. Error: {e}")
+            print(f"⚠️ Revocation list refresh failed: {e}")
+
+async def load_revocations():
+    # Critical path par: restart ke baad pehla /s/ request bhi revoke kiye links ko block kare
+    global revocation_sync_task
+    denied = await db.get_revocations()
+    link_signer.load_revocations(denied)
+    print(f"✅ Revocation list loaded ({len(denied)} links).")
+    revocation_sync_task = asyncio.create_task(sync_revocations())
+
+async def start_storage_purge():
+    global storage_purge_task
+    if Config.STORAGE_PURGE:
+        storage_purge_task = asyncio.create_task(purge_orphan_storage())
+
+startup_graph = None
 
-        # --- STARTUP BROADCAST (BACKGROUND) ---
-        # Send restart notification to all users (non-blocking)
-        asyncio.create_task(send_startup_broadcast())
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Yeh function bot ko web server ke saath start aur stop karta hai.
+    Startup ek dependency graph hai: independent steps parallel chalte hain, aur non-critical
+    kaam (index builds, channel cleanup, broadcasts) background mein hota hai taaki server jaldi ready ho.
+    """
+    global startup_graph
+    print("--- Lifespan: Server chalu ho raha hai... ---")
 
+    startup_graph = (
+        StartupGraph()
+        # Critical path: DB, main bot aur MULTI_TOKEN clients sab ek saath start hote hain
+        .add("db", db.connect, timeout=Config.STARTUP_STEP_TIMEOUT)
+        .add("bot", start_main_bot, timeout=Config.STARTUP_STEP_TIMEOUT)
+        .add("clients", initialize_clients, timeout=Config.STARTUP_STEP_TIMEOUT)
+        .add("analytics", start_analytics, after=["db"])
+        .add("revocations", load_revocations, after=["db"], timeout=Config.STARTUP_STEP_TIMEOUT)
+        .add("upload_queue", start_upload_queue, after=["db", "bot"])
+        .add("identity", load_bot_identity, after=["bot"], timeout=Config.STARTUP_STEP_TIMEOUT)
+        .add("storage_channel", verify_storage_channel, after=["bot"], timeout=Config.STARTUP_STEP_TIMEOUT)
+        # Non-critical: background mein
+        .add("fsub_channel", verify_force_sub_channel, after=["bot"], background=True)
+        .add("commands", set_menu_commands, after=["bot"], background=True)
+        .add("indexes", db.ensure_indexes, after=["db"], background=True)
+        .add("storage_purge", start_storage_purge, after=["db", "bot"], background=True)
+        .add("hot_cache", start_hot_cache, after=["bot"], background=True)
+        .add("cleanup", lambda: cleanup_channel(bot), after=["identity"], background=True)
+        # Restart se pehle adhure reh gaye broadcasts resume karo
+        .add("broadcast_resume", broadcaster.resume_pending, after=["db", "bot"], background=True)
+        # --- STARTUP ANNOUNCEMENT (BACKGROUND JOB QUEUE) ---
+        # Har deploy par sirf ek baar enqueue hota hai (idempotency key), restarts par dobara nahi
+        .add("announcement", enqueue_startup_announcement, after=["db", "identity"], background=True)
+    )
+    try:
+        await startup_graph.run(budget=Config.STARTUP_BUDGET)
         print("--- Lifespan: Startup safaltapoorvak poora hua. ---")
-    
     except Exception as e:
         print(f"!!! FATAL ERROR: Bot startup ke dauraan error aa gaya: {traceback.format_exc()}")
     
     yield
     
     print("--- Lifespan: Server band ho raha hai... ---")
+    startup_graph.cancel()
+    await broadcaster.stop()
+    await upload_queue.stop()
+    if chunk_http:
+        await chunk_http.aclose()
+    if storage_purge_task:
+        storage_purge_task.cancel()
+    if revocation_sync_task:
+        revocation_sync_task.cancel()
+    await hot_files.stop()
+    for cid, client in list(multi_clients.items()):
+        if cid != 0 and client.is_initialized:
+            await client.stop()
     if bot.is_initialized:
         await bot.stop()
+    await analytics.stop()
+    await db.disconnect()
     print("--- Lifespan: Shutdown poora hua. ---")
 
 app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
+# Templates fingerprinted local assets use karte hain (build na ho toh CDN)
+templates.env.globals["asset"] = assets.url
+templates.env.globals["asset_built"] = assets.built
 
 app.add_middleware(
     CORSMiddleware,
@@ -124,6 +236,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Slow start ki shikayat par: DB / get_messages / media session / pehla GetFile, kahan time gaya
+app.add_middleware(ServerTimingMiddleware, prefixes=("/dl/", "/s/", "/api/file/", "/show/", "/embed/", "/dashboard/"))
 
 # --- LOG FILTER: YEH SIRF /dl/ WALE LOGS KO CHUPAYEGA ---
 # class HideDLFilter(logging.Filter):
@@ -135,13 +249,30 @@ app.add_middleware(
 # logging.getLogger("uvicorn.access").addFilter(HideDLFilter())
 # --- FIX KHATAM ---
 
-bot = Client("SimpleStreamBot", api_id=Config.API_ID, api_hash=Config.API_HASH, bot_token=Config.BOT_TOKEN, in_memory=False)
+bot = Client("SimpleStreamBot", api_id=Config.API_ID, api_hash=Config.API_HASH, bot_token=Config.BOT_TOKEN, in_memory=False, workdir=Config.SESSION_DIR)
 multi_clients = {}; work_loads = {}; class_cache = {}
+# Active streams per client: scrape ke waqt hi padha jaata hai, stream path par koi extra kaam nahi
+metrics.WORK_LOADS.set_function(lambda: {((multi_clients.get(i) or bot).name,): n for i, n in list(work_loads.items())})
+broadcaster = BroadcastEngine(bot, multi_clients)
 
 # Performance Cache (reduces DB queries for frequent operations)
 user_status_cache = {}  # {user_id: (status_data, expiry_timestamp)}
 CACHE_TTL = 60  # Cache for 60 seconds
 
+# --- INTERACTIVE TRAFFIC TRACKER ---
+# Group -1 mein chalta hai (baaki handlers ko nahi rokta). Har interactive update bot ke
+# flood budget se ek token le leta hai, taaki background broadcasts pehle user replies ko jagah dein.
+@bot.on_message(filters.private & filters.incoming, group=-1)
+async def track_interactive_message(client: Client, message: Message):
+    broadcaster.note_interactive()
+    # Is update ke saare handlers ek hi UserContext share karte hain (user doc ek baar, batched load)
+    if message.from_user:
+        message.user_ctx = UserContext(message.from_user.id)
+
+@bot.on_callback_query(group=-1)
+async def track_interactive_callback(client: Client, cb):
+    broadcaster.note_interactive()
+
 # --- CHANNEL WARMUP HANDLER ---
 @bot.on_message(filters.channel)
 async def channel_warmup(client: Client, message: Message):
@@ -156,19 +287,13 @@ async def check_access(user_id: int):
         return False, "**🚫 You are BANNED from using this bot.**\n__Contact Admin for support.__"
     
     # 2. Check Force Sub (Only if configured)
+    # Membership TTL cache se aati hai (ChatMemberUpdated events se fresh), har baar API call nahi
     if Config.FORCE_SUB_CHANNEL:
         try:
-            await bot.get_chat_member(Config.FORCE_SUB_CHANNEL, user_id)
-        except UserNotParticipant:
-            try:
-                invite_link = (await bot.get_chat(Config.FORCE_SUB_CHANNEL)).invite_link
-                if not invite_link:
-                     invite_link = f"https://t.me/{str(Config.FORCE_SUB_CHANNEL).replace('@', '')}"
-            except:
-                invite_link = f"https://t.me/{str(Config.FORCE_SUB_CHANNEL).replace('@', '')}"
-            
-            # Special return for Force Sub to allow constructing Inline Keyboard
-            return False, ("FORCE_SUB", invite_link)
+            if not await force_sub_cache.is_member(bot, user_id):
+                invite_link = await force_sub_cache.invite_link(bot)
+                # Special return for Force Sub to allow constructing Inline Keyboard
+                return False, ("FORCE_SUB", invite_link)
         except Exception:
             # If bot can't check (e.g. not admin), pass to avoid blocking user
             pass
@@ -194,14 +319,22 @@ async def start_client(client_id, bot_token):
     """ Ek naye client bot ko start karta hai. """
     try:
         print(f"Attempting to start Client: {client_id}")
+        # Session file token ke hash se: restart par dobara authorize nahi karna padta,
+        # aur peers (storage channel ka access hash) + media-DC auth keys bhi save rehte hain
+        session_name = f"client_{hashlib.sha256(bot_token.encode()).hexdigest()[:12]}"
         client = await Client(
-            name=str(client_id), 
+            name=session_name,
             api_id=Config.API_ID, 
             api_hash=Config.API_HASH,
             bot_token=bot_token, 
             no_updates=True, 
-            in_memory=True
+            in_memory=False,
+            workdir=Config.SESSION_DIR
         ).start()
+        try:
+            await warm_peer(client, Config.STORAGE_CHANNEL)
+        except Exception as e:
+            print(f"⚠️ Client {client_id} cannot resolve storage channel yet: {e}")
         work_loads[client_id] = 0
         multi_clients[client_id] = client
         print(f"✅ Client {client_id} started successfully.")
@@ -290,6 +423,11 @@ async def start_command(client: Client, message: Message):
             await message.reply_text(error_data, quote=True)
             return
 
+    # User ne bot dobara start kiya: agar pehle block mark hua tha toh broadcasts phir se milenge
+    # (doc isi update ke UserContext se, batched; har /start par write nahi)
+    if (await UserContext.of(message, user_id).user()).get("blocked"):
+        db.set_user_blocked(user_id, False)
+
     # --- NORMAL START LOGIC ---
     if len(message.command) > 1 and message.command[1].startswith("verify_"):
         unique_id = message.command[1].split("_", 1)[1]
@@ -412,14 +550,14 @@ async def callback_handlers(client: Client, cb: "CallbackQuery"):
         
     await cb.answer()
 
-from subscription import get_plan_status, increment_user_usage, PLANS
+from subscription import PLANS
 
 # ... (Previous imports)
 
 @bot.on_message(filters.command("showplan") & filters.private)
 async def show_plans_command(client: Client, message: Message):
     user_id = message.from_user.id
-    status = await get_plan_status(user_id)
+    status = await UserContext.of(message, user_id).plan_status()
     plan = status['plan_type']
     
     # helper to check active
@@ -467,8 +605,7 @@ Contact Admin to upgrade your plan instantly:
 @bot.on_message(filters.command("mydata") & filters.private)
 async def mydata_command(client: Client, message: Message):
     user_id = message.from_user.id
-    status = await get_plan_status(user_id)
-    total_files = await db.get_user_total_links(user_id)
+    status, counters = await asyncio.gather(UserContext.of(message, user_id).plan_status(), db.get_counters(user_id))
     
     # Format Expiry
     expiry = status.get("expiry_date")
@@ -496,7 +633,9 @@ async def mydata_command(client: Client, message: Message):
 └ **Limit:** `{status['daily_left']}` remaining
 
 🗂 **Total Storage:**
-└ **Total Files Uploaded:** `{total_files}`
+├ **Total Files Uploaded:** `{counters['links']}`
+├ **Active Links:** `{counters['active_links']}`
+└ **Storage Used:** `{get_readable_file_size(counters['bytes'])}`
 
 {upgrade_text}
 """
@@ -526,11 +665,13 @@ Simply forward any file to me to get a Stream Link.
 👑 **ADMIN COMMANDS (Owner Only)**
 
 📊 **Statistics**
-└ `/stats` - View Total Users & Links Count
+├ `/stats` - View Total Users & Links Count
+└ `/hot` - Top Hot Files (Last 24 Hours)
 
 🚫 **Moderation**
 ├ `/ban user_id` - Ban a user
-└ `/unban user_id` - Unban a user
+├ `/unban user_id` - Unban a user
+└ `/revoke unique_id` - Delete a link (stops streaming)
 
 💎 **Subscription Management**
 └ `/setplan user_id plan_name`
@@ -540,7 +681,7 @@ Simply forward any file to me to get a Stream Link.
    └ `bimonthly` (2 Months)
 
 ⚡ **System**
-└ `/broadcast message` - (Coming Soon)
+└ `/broadcast` - Reply to a message to send it to all users
 ━━━━━━━━━━━━━━━━━━
 """
         final_text = user_commands + admin_commands
@@ -613,56 +754,230 @@ async def broadcast_command(client: Client, message: Message):
         await message.reply_text("❌ **Usage:** Reply to a message with `/broadcast` to send it to all users.")
         return
 
-    users = await db.get_all_users()
-    total_users = len(users)
-    
+    total_users = await db.total_users()
     status_msg = await message.reply_text(f"🚀 **Starting Broadcast...**\nTarget: `{total_users}` Users")
+
+    # Engine background mein chalta hai: rate-limited, concurrent, aur restart ke baad resume hota hai
+    try:
+        broadcast_id = await broadcaster.start(
+            message.chat.id,
+            message.reply_to_message.id,
+            status_chat_id=status_msg.chat.id,
+            status_message_id=status_msg.id
+        )
+        print(f"🚀 Broadcast {broadcast_id} started by owner.")
+    except Exception as e:
+        await status_msg.edit_text(f"❌ **Broadcast failed to start:** `{e}`")
+
+def _upload_meta(message: Message, unique_id: str):
+    """ (file_name, file_size_bytes, mime_type) message ke media se. """
+    media = message.document or message.video or message.audio or message.photo
+    if message.photo:
+         # Photo handling (highest quality)
+         media = message.photo
+         file_name = f"Photo_{unique_id}.jpg"
+         file_size_bytes = media.file_size
+         mime_type = "image/jpeg"
+    else:
+         file_name = getattr(media, "file_name", "Unknown_File")
+         file_size_bytes = getattr(media, "file_size", 0)
+         mime_type = getattr(media, "mime_type", "application/octet-stream") or "application/octet-stream"
+    return file_name, file_size_bytes, mime_type
+
+def _public_base_url():
+    # Validate BASE_URL
+    base_url = Config.BASE_URL.strip()
+    if not base_url:
+        raise ValueError("BASE_URL is not configured. Please set it in environment variables.")
     
-    success = 0
-    blocked = 0
-    deleted = 0
-    failed = 0
-    
-    import asyncio
+    # Ensure BASE_URL starts with http:// or https://
+    if not base_url.startswith(('http://', 'https://')):
+        base_url = f"https://{base_url}"
+        
+    # Force HTTPS for production domains to prevent Mixed Content errors in iframes
+    if base_url.startswith("http://") and "localhost" not in base_url and "127.0.0.1" not in base_url:
+        base_url = base_url.replace("http://", "https://", 1)
     
-    for i, user in enumerate(users):
+    # Remove trailing slash
+    return base_url.rstrip('/')
+
+async def _copy_to_storage(message: Message):
+    # FloodWait par worker hi ruk jaata hai (queue mein baaki files wait karti hain), upload fail nahi hota
+    for attempt in range(3):
+        try:
+            return await message.copy(chat_id=Config.STORAGE_CHANNEL)
+        except FloodWait as e:
+            metrics.flood_wait(bot, "upload", e.value)
+            if attempt == 2:
+                raise
+            print(f"⏳ Upload FloodWait: {e.value}s")
+            await asyncio.sleep(e.value + 1)
+
+def _album_media(message: Message):
+    """ Message ko send_media_group ke InputMedia mein badalta hai, saath mein album 'kind' (jo saath ja sakte hain). """
+    caption = {"caption": message.caption or "", "caption_entities": message.caption_entities}
+    if message.photo:
+        return "visual", InputMediaPhoto(message.photo.file_id, **caption)
+    if message.video:
+        return "visual", InputMediaVideo(message.video.file_id, **caption)
+    if message.audio:
+        return "audio", InputMediaAudio(message.audio.file_id, **caption)
+    return "document", InputMediaDocument(message.document.file_id, **caption)
+
+async def _copy_batch_to_storage(messages: list):
+    """
+    Batch ko storage channel mein copy karta hai. Compatible files (2-10, ek hi kind) ek send_media_group
+    call mein jaati hain; baaki concurrent copies (capped). Har message ke liye copied Message ya Exception.
+    """
+    if 2 <= len(messages) <= 10:
+        kinds, media = zip(*(_album_media(m) for m in messages))
+        if len(set(kinds)) == 1:
+            for attempt in range(3):
+                try:
+                    copied = await bot.send_media_group(Config.STORAGE_CHANNEL, list(media))
+                    if len(copied) == len(messages):
+                        return copied
+                    # Count match nahi hua: jo copy hua use chhod kar alag-alag copy karo
+                    print(f"⚠️ Album copy returned {len(copied)}/{len(messages)} messages, falling back to single copies.")
+                    break
+                except FloodWait as e:
+                    print(f"⏳ Upload FloodWait: {e.value}s")
+                    metrics.flood_wait(bot, "upload", e.value)
+                    await asyncio.sleep(e.value + 1)
+                except Exception as e:
+                    print(f"⚠️ Album copy failed ({type(e).__name__}: {e}), falling back to single copies.")
+                    break
+
+    semaphore = asyncio.Semaphore(Config.INGEST_COPY_CONCURRENCY)
+    async def copy_one(message):
+        async with semaphore:
+            return await _copy_to_storage(message)
+    return await asyncio.gather(*(copy_one(m) for m in messages), return_exceptions=True)
+
+def _file_unique_id(message: Message):
+    return getattr(message.document or message.video or message.audio or message.photo, "file_unique_id", None)
+
+async def _release_refs(counts: dict):
+    if counts:
         try:
-            user_id = user["_id"]
-            await message.reply_to_message.copy(chat_id=user_id)
-            success += 1
+            await db.release_contents(counts)
         except Exception as e:
-            err_str = str(e)
-            if "blocked" in err_str.lower():
-                blocked += 1
-            elif "user is deactivated" in err_str.lower():
-                deleted += 1
-            else:
-                failed += 1
+            print(f"⚠️ Dedup: could not release refs ({e}), counter reconcile will fix them.")
+
+async def _store_batch(messages: list):
+    """
+    Content dedup: jo file (file_unique_id) pehle se storage channel mein hai uska message reuse hota hai
+    (refcount +1, koi Telegram call nahi); sirf nayi files copy hoti hain.
+    Har message ke liye storage msg_id ya Exception return karta hai.
+    """
+    fuids = [_file_unique_id(m) for m in messages]
+    claimed = {}
+    if Config.CONTENT_DEDUP:
+        counts = {}
+        for fuid in fuids:
+            if fuid:
+                counts[fuid] = counts.get(fuid, 0) + 1
+        claimed = await db.claim_contents(counts)
+
+    fresh = [(n, m) for n, (m, fuid) in enumerate(zip(messages, fuids)) if fuid not in claimed]
+    results = [claimed.get(fuid) for fuid in fuids]
+    # Is batch ke liye liye gaye refs: beech mein fail ho toh wapas (warna reconcile tak message purge nahi hota)
+    held = {fuid: counts[fuid] for fuid in claimed}
+    try:
+        if fresh:
+            copies = await _copy_batch_to_storage([m for _, m in fresh])
+            for (n, m), sent in zip(fresh, copies):
+                if isinstance(sent, BaseException) or sent is None:
+                    results[n] = sent
+                elif Config.CONTENT_DEDUP and fuids[n]:
+                    msg_id = await db.add_content(fuids[n], sent.id, _upload_meta(m, "")[1])
+                    held[fuids[n]] = held.get(fuids[n], 0) + 1
+                    if msg_id != sent.id:
+                        # Same file parallel mein kisi aur ne store kar di: apni extra copy hata do
+                        try:
+                            await bot.delete_messages(Config.STORAGE_CHANNEL, sent.id)
+                        except Exception:
+                            pass
+                    results[n] = msg_id
+                else:
+                    results[n] = sent.id
+    except BaseException:
+        await _release_refs(held)
+        raise
+    if claimed:
+        print(f"♻️ Dedup: {sum(1 for fuid in fuids if fuid in claimed)}/{len(messages)} file(s) reused from storage.")
+    return results
+
+def _single_link_reply(file_name, file_size, mime_type, page_link, dl_link, embed_link_text, expire_note):
+    # Detect Type & Build UI
+    buttons = []
+    status_text = ""
+    
+    if mime_type.startswith("video"):
+        action_verb = "Stream"
+        emoji = "▶️"
+        status_text = f"🎞 **Stream Link:**\n`{page_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
+        buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Online", url=page_link), InlineKeyboardButton("📥 Download", url=dl_link)])
         
-        # Update Status every 20 users
-        if i % 20 == 0:
-            await status_msg.edit_text(
-                f"🚀 **Broadcasting...**\n\n"
-                f"✅ Sent: `{success}`\n"
-                f"🚫 Blocked: `{blocked}`\n"
-                f"🗑 Deleted: `{deleted}`\n"
-                f"⚠️ Errors: `{failed}`\n\n"
-                f"⏳ Progress: `{i}/{total_users}`"
-            )
+    elif mime_type.startswith("audio"):
+        action_verb = "Listen"
+        emoji = "🎵"
+        status_text = f"🎵 **Listen Link:**\n`{page_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
+        buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Online", url=page_link), InlineKeyboardButton("📥 Download", url=dl_link)])
         
-        await asyncio.sleep(0.05) # Prevent FloodWait
-
-    await status_msg.edit_text(
-        f"✅ **BROADCAST COMPLETED**\n\n"
-        f"👥 Total Users: `{total_users}`\n"
-        f"✅ Success: `{success}`\n"
-        f"🚫 Blocked: `{blocked}`\n"
-        f"🗑 Deleted: `{deleted}`\n"
-        f"⚠️ Failed: `{failed}`"
+    elif mime_type == "application/pdf":
+        action_verb = "Read"
+        emoji = "📖"
+        status_text = f"📖 **Read Link:**\n`{dl_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
+        buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} PDF", url=dl_link), InlineKeyboardButton("📥 Download", url=dl_link)])
+        
+    elif mime_type.startswith("image"):
+        action_verb = "View"
+        emoji = "🖼"
+        status_text = f"🖼 **View Link:**\n`{dl_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
+        buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Image", url=dl_link), InlineKeyboardButton("📥 Download", url=dl_link)])
+        
+    else:
+        action_verb = "Download"
+        status_text = f"⬇️ **Download Link:**\n`{dl_link}`"
+        buttons.append([InlineKeyboardButton("📥 Fast Download", url=dl_link)])
+
+    # Always add Univora Site
+    buttons.append([InlineKeyboardButton("🌐 UNIVORA SITE", url="https://univora.site")])
+
+    text = (
+        f"**✅ File Safely Stored on Univora Cloud!**\n\n"
+        f"**📂 Name:** `{file_name}`\n"
+        f"**💾 Size:** `{file_size}`\n"
+        f"{expire_note}\n\n"
+        f"{status_text}\n\n"
+        f"{embed_link_text}"
+        f"__Tap the button below for {action_verb.lower()}.__\n"
+        f"__Powered by Univora | Dev: Rolex Sir__"
     )
+    return text, InlineKeyboardMarkup(buttons)
+
+def _batch_link_reply(entries, expire_note):
+    # Album/burst: saari files ek hi reply mein
+    text = f"**✅ {len(entries)} Files Safely Stored on Univora Cloud!**\n{expire_note}\n\n"
+    for n, e in enumerate(entries, 1):
+        primary = e["page_link"] if e["mime_type"].startswith(("video", "audio")) else e["dl_link"]
+        text += (
+            f"**{n}.** 📂 `{e['file_name']}` (`{e['file_size']}`)\n"
+            f"🔗 [Open]({primary}) | 📥 [Download]({e['dl_link']})\n\n"
+        )
+    text += "__Powered by Univora | Dev: Rolex Sir__"
+    buttons = [[InlineKeyboardButton("🌐 UNIVORA SITE", url="https://univora.site")]]
+    return text, InlineKeyboardMarkup(buttons)
 
+async def handle_file_upload(messages: list, user_id: int):
+    """
+    Ek upload batch (album ya ek saath bheji gayi files) process karta hai:
+    ek access + quota check, batch copy, ek save_links (insert_many), ek usage update aur ek reply.
+    """
+    message = messages[0]
+    ctx = UserContext.of(message, user_id)
 
-async def handle_file_upload(message: Message, user_id: int):
     # Check Access
     is_allowed, error_data = await check_access(user_id)
     if not is_allowed:
@@ -674,7 +989,7 @@ async def handle_file_upload(message: Message, user_id: int):
             return
 
     # --- SUBSCRIPTION CHECK ---
-    status = await get_plan_status(user_id)
+    status = await ctx.plan_status()
     if not status["can_upload"]:
         await message.reply_text(
             f"**🛑 DAILY LIMIT REACHED!**\n\n"
@@ -685,124 +1000,91 @@ async def handle_file_upload(message: Message, user_id: int):
         )
         return
 
-    try:
-        sent_message = await message.copy(chat_id=Config.STORAGE_CHANNEL)
-        unique_id = secrets.token_urlsafe(8)
-        
-        # Metadata Extraction
-        media = message.document or message.video or message.audio or message.photo
-        if message.photo:
-             # Photo handling (highest quality)
-             media = message.photo
-             file_name = f"Photo_{unique_id}.jpg"
-             file_size_bytes = media.file_size
-             mime_type = "image/jpeg"
-        else:
-             file_name = getattr(media, "file_name", "Unknown_File")
-             file_size_bytes = getattr(media, "file_size", 0)
-             mime_type = getattr(media, "mime_type", "application/octet-stream") or "application/octet-stream"
+    # Free plan: batch mein sirf utni files jitni daily limit mein bachi hain
+    skipped = 0
+    if isinstance(status["daily_left"], int) and status["daily_left"] < len(messages):
+        skipped = len(messages) - status["daily_left"]
+        messages = messages[:status["daily_left"]]
 
-        file_size = get_readable_file_size(file_size_bytes)
-        
-        # Save to DB with Expiry
-        await db.save_link(
-            unique_id, 
-            sent_message.id, 
-            {}, 
-            file_name, 
-            file_size, 
-            user_id,
-            expiry_date=status["expiry_date"]
-        )
+    try:
+        stored = await _store_batch(messages)
+
+        links, entries, failed = [], [], []
+        for msg, msg_id in zip(messages, stored):
+            if isinstance(msg_id, BaseException) or msg_id is None:
+                failed.append((msg, msg_id))
+                continue
+            unique_id = secrets.token_urlsafe(8)
+            
+            # Metadata Extraction
+            file_name, file_size_bytes, mime_type = _upload_meta(msg, unique_id)
+            file_size = get_readable_file_size(file_size_bytes)
+            links.append({
+                "unique_id": unique_id,
+                "message_id": msg_id,
+                "backups": {},
+                "file_name": file_name,
+                "file_size": file_size,
+                "user_id": user_id,
+                "expiry_date": status["expiry_date"],
+                "file_size_bytes": file_size_bytes,
+                "file_unique_id": _file_unique_id(msg) if Config.CONTENT_DEDUP else None
+            })
+            entries.append({"unique_id": unique_id, "file_name": file_name, "file_size": file_size, "mime_type": mime_type, "message": msg})
+
+        for msg, error in failed:
+            print(f"!!! FILE UPLOAD ERROR (user {user_id}, msg {msg.id}): {type(error).__name__}: {error}")
+        if not links:
+            raise failed[0][1] if failed and isinstance(failed[0][1], BaseException) else RuntimeError("Storage copy failed")
+
+        # Save to DB with Expiry (poora batch ek insert mein)
+        try:
+            await db.save_links(links)
+        except BaseException:
+            # Links nahi bane: _store_batch mein claim/add kiye refs wapas
+            held = {}
+            for link in links:
+                if link["file_unique_id"]:
+                    held[link["file_unique_id"]] = held.get(link["file_unique_id"], 0) + 1
+            await _release_refs(held)
+            raise
         
         # Increment Usage
-        await increment_user_usage(user_id)
+        await ctx.increment_usage(len(links))
         
         # Generate Links with Proper URL Encoding
         from urllib.parse import quote
+        base_url = _public_base_url()
         
-        # Validate BASE_URL
-        base_url = Config.BASE_URL.strip()
-        if not base_url:
-            raise ValueError("BASE_URL is not configured. Please set it in environment variables.")
-        
-        # Ensure BASE_URL starts with http:// or https://
-        if not base_url.startswith(('http://', 'https://')):
-            base_url = f"https://{base_url}"
-            
-        # Force HTTPS for production domains to prevent Mixed Content errors in iframes
-        if base_url.startswith("http://") and "localhost" not in base_url and "127.0.0.1" not in base_url:
-            base_url = base_url.replace("http://", "https://", 1)
-        
-        # Remove trailing slash
-        base_url = base_url.rstrip('/')
-        
-        # URL-encode the filename to handle special characters
-        encoded_file_name = quote(file_name, safe='')
-        
-        embed_link_text = ""
-        admin_query = ""
-        if user_id == Config.OWNER_ID:
-            admin_query = "?admin=true"
-            embed_link = f"{base_url}/embed/{unique_id}"
-            embed_link_text = f"⚙️ **Embed Code (Admin):**\n`<iframe src=\"{embed_link}\" width=\"100%\" height=\"100%\" frameborder=\"0\" allowfullscreen></iframe>`\n\n"
-        
-        page_link = f"{base_url}/show/{unique_id}{admin_query}"
-        dl_link = f"{base_url}/dl/{unique_id}/{encoded_file_name}"
-        
-        # Detect Type & Build UI
-        buttons = []
-        status_text = ""
-        
-        if mime_type.startswith("video"):
-            action_verb = "Stream"
-            emoji = "▶️"
-            status_text = f"🎞 **Stream Link:**\n`{page_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
-            buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Online", url=page_link), InlineKeyboardButton("📥 Download", url=dl_link)])
-            
-        elif mime_type.startswith("audio"):
-            action_verb = "Listen"
-            emoji = "🎵"
-            status_text = f"🎵 **Listen Link:**\n`{page_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
-            buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Online", url=page_link), InlineKeyboardButton("📥 Download", url=dl_link)])
-            
-        elif mime_type == "application/pdf":
-            action_verb = "Read"
-            emoji = "📖"
-            status_text = f"📖 **Read Link:**\n`{dl_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
-            buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} PDF", url=dl_link), InlineKeyboardButton("📥 Download", url=dl_link)])
-            
-        elif mime_type.startswith("image"):
-            action_verb = "View"
-            emoji = "🖼"
-            status_text = f"🖼 **View Link:**\n`{dl_link}`\n\n⬇️ **Download Link:**\n`{dl_link}`"
-            buttons.append([InlineKeyboardButton(f"{emoji} {action_verb} Image", url=dl_link), InlineKeyboardButton("📥 Download", url=dl_link)])
-            
-        else:
-            action_verb = "Download"
-            status_text = f"⬇️ **Download Link:**\n`{dl_link}`"
-            buttons.append([InlineKeyboardButton("📥 Fast Download", url=dl_link)])
-
-        # Always add Univora Site
-        buttons.append([InlineKeyboardButton("🌐 UNIVORA SITE", url="https://univora.site")])
+        admin_query = "?admin=true" if user_id == Config.OWNER_ID else ""
+        for e in entries:
+            # URL-encode the filename to handle special characters
+            e["page_link"] = f"{base_url}/show/{e['unique_id']}{admin_query}"
+            e["dl_link"] = f"{base_url}/dl/{e['unique_id']}/{quote(e['file_name'], safe='')}"
         
         # Expire Notice
         expire_note = "\n⏳ **Link Expires:** `24 Hours`" if status['plan_type'] == 'free' else "\n⏳ **Link Expires:** `Premium`"
         if user_id == Config.OWNER_ID: expire_note = "\n⏳ **Link Expires:** `Never (Admin)`"
 
+        if len(entries) == 1:
+            e = entries[0]
+            embed_link_text = ""
+            if user_id == Config.OWNER_ID:
+                embed_link = f"{base_url}/embed/{e['unique_id']}"
+                embed_link_text = f"⚙️ **Embed Code (Admin):**\n`<iframe src=\"{embed_link}\" width=\"100%\" height=\"100%\" frameborder=\"0\" allowfullscreen></iframe>`\n\n"
+            text, markup = _single_link_reply(e["file_name"], e["file_size"], e["mime_type"], e["page_link"], e["dl_link"], embed_link_text, expire_note)
+            reply_to = e["message"]
+        else:
+            text, markup = _batch_link_reply(entries, expire_note)
+            reply_to = message
+
+        if failed:
+            text += f"\n\n⚠️ `{len(failed)}` file(s) could not be stored, please send them again."
+        if skipped:
+            text += f"\n\n🛑 `{skipped}` file(s) skipped: daily limit reached. Use `/showplan` to upgrade."
+
         # Final Reply with Buttons (Production Ready)
-        await message.reply_text(
-            f"**✅ File Safely Stored on Univora Cloud!**\n\n"
-            f"**📂 Name:** `{file_name}`\n"
-            f"**💾 Size:** `{file_size}`\n"
-            f"{expire_note}\n\n"
-            f"{status_text}\n\n"
-            f"{embed_link_text}"
-            f"__Tap the button below for {action_verb.lower()}.__\n"
-            f"__Powered by Univora | Dev: Rolex Sir__",
-            reply_markup=InlineKeyboardMarkup(buttons),
-            quote=True
-        )
+        await reply_to.reply_text(text, reply_markup=markup, quote=True, disable_web_page_preview=True)
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"!!! FILE UPLOAD ERROR !!!")
@@ -818,25 +1100,51 @@ async def handle_file_upload(message: Message, user_id: int):
             quote=True
         )
 
+# Uploads seedhe process nahi hote: bounded, per-user fair queue mein jaate hain
+upload_queue = IngestQueue(handle_file_upload)
+
 @bot.on_message(filters.private & (filters.document | filters.video | filters.audio | filters.photo))
 async def file_handler(_, message: Message):
-    await handle_file_upload(message, message.from_user.id)
+    await upload_queue.submit(message, message.from_user.id)
 
 @bot.on_message(filters.command("stats") & filters.private)
 async def stats_command(client: Client, message: Message):
     if message.from_user.id != Config.OWNER_ID:
         return
         
-    total_links = await db.count_links()
-    total_users = await db.total_users()
+    # Counters document se O(1) read, collection scan nahi
+    counters = await db.get_counters()
     
     await message.reply_text(
         f"**📊 SYSTEM STATISTICS**\n\n"
-        f"🔗 **Total Links:** `{total_links}`\n"
-        f"👥 **Total Users:** `{total_users}`\n"
-        f"💿 **Database:** MongoDB Atlas"
+        f"🔗 **Total Links:** `{counters['links']}`\n"
+        f"🟢 **Active Links:** `{counters['active_links']}`\n"
+        f"💾 **Storage Used:** `{get_readable_file_size(counters['bytes'])}`\n"
+        f"👥 **Total Users:** `{counters['users']}`\n"
+        f"💿 **Database:** {db.backend_name}"
     )
 
+@bot.on_message(filters.command("hot") & filters.private)
+async def hot_files_command(client: Client, message: Message):
+    if message.from_user.id != Config.OWNER_ID:
+        return
+
+    # Pending (unflushed) counters bhi shaamil ho jayein
+    await analytics.flush()
+    hot = await db.get_hot_files(int(time.time()) - 86400, limit=10)
+    if not hot:
+        await message.reply_text("**🔥 No downloads recorded in the last 24 hours.**")
+        return
+
+    text = "**🔥 TOP HOT FILES (Last 24 Hours)**\n\n"
+    for n, row in enumerate(hot, 1):
+        text += (
+            f"**{n}.** `{row['unique_id']}` (Owner: `{row['owner']}`)\n"
+            f"├ 🎯 Hits: `{row['hits']}` | 👀 Viewers: `{row['viewers']}`\n"
+            f"└ 📦 Served: `{get_readable_file_size(row['bytes'])}`\n\n"
+        )
+    await message.reply_text(text)
+
 @bot.on_message(filters.command("ban") & filters.private)
 async def ban_command(client: Client, message: Message):
     if message.from_user.id != Config.OWNER_ID:
@@ -869,6 +1177,27 @@ async def unban_command(client: Client, message: Message):
     except Exception as e:
         await message.reply_text(f"Error: {e}")
 
+@bot.on_message(filters.command("revoke") & filters.private)
+async def revoke_command(client: Client, message: Message):
+    if message.from_user.id != Config.OWNER_ID:
+        return
+
+    if len(message.command) < 2:
+        await message.reply_text("Usage: `/revoke unique_id`")
+        return
+
+    unique_id = message.command[1]
+    try:
+        await db.delete_link(unique_id)
+        # Signed URLs DB nahi dekhte: denylist (DB mein persisted, restart ke baad bhi) + caches se bhi hatao
+        await db.add_revocation(unique_id, link_signer.revoke(unique_id))
+        file_api_cache.pop(unique_id, None)
+        page_cache.invalidate(("show.html", unique_id))
+        page_cache.invalidate(("embed.html", unique_id))
+        await message.reply_text(f"🗑️ Link `{unique_id}` has been REVOKED.")
+    except Exception as e:
+        await message.reply_text(f"Error: {e}")
+
 @bot.on_chat_member_updated(filters.chat(Config.STORAGE_CHANNEL))
 async def simple_gatekeeper(c: Client, m_update: ChatMemberUpdated):
     try:
@@ -878,6 +1207,11 @@ async def simple_gatekeeper(c: Client, m_update: ChatMemberUpdated):
             print(f"Gatekeeper: Kicking {u.id}"); await c.ban_chat_member(Config.STORAGE_CHANNEL,u.id); await c.unban_chat_member(Config.STORAGE_CHANNEL,u.id)
     except Exception as e: print(f"Gatekeeper Error: {e}")
 
+@bot.on_chat_member_updated(filters.chat(Config.FORCE_SUB_CHANNEL) if Config.FORCE_SUB_CHANNEL else filters.create(lambda *_: False), group=1)
+async def force_sub_member_update(c: Client, m_update: ChatMemberUpdated):
+    # Join/leave/kick par membership cache turant update (bot ko channel mein admin hona chahiye)
+    force_sub_cache.on_member_update(m_update)
+
 async def cleanup_channel(c: Client):
     print("Gatekeeper: Running cleanup..."); allowed={Config.OWNER_ID,c.me.id}
     try:
@@ -885,31 +1219,11 @@ async def cleanup_channel(c: Client):
             if m.user.id in allowed: continue
             if m.status in [enums.ChatMemberStatus.ADMINISTRATOR,enums.ChatMemberStatus.OWNER]: continue
             try: print(f"Cleanup: Kicking {m.user.id}"); await c.ban_chat_member(Config.STORAGE_CHANNEL,m.user.id); await asyncio.sleep(1)
-            except FloodWait as e: await asyncio.sleep(e.value)
+            except FloodWait as e: metrics.flood_wait(c, "cleanup", e.value); await asyncio.sleep(e.value)
             except Exception as e: print(f"Cleanup Error: {e}")
     except Exception as e: print(f"Cleanup Error: {e}")
 
-async def send_startup_broadcast():
-    """
-    Sends a restart notification to all users when bot starts.
-    Runs in background, doesn't block startup.
-    """
-    try:
-        # Wait 5 seconds for bot to fully initialize
-        await asyncio.sleep(5)
-        
-        print("🔔 Starting Startup Broadcast...")
-        
-        # Get all users from database
-        users = await db.get_all_users()
-        total_users = len(users)
-        
-        if total_users == 0:
-            print("ℹ️ No users to broadcast to.")
-            return
-        
-        # Beautiful restart message
-        restart_message = """
+STARTUP_ANNOUNCEMENT = """
 🔄 **STREAMDROP BOT RESTARTED** 🔄
 
 ✅ **Bot is now LIVE and fully operational!**
@@ -925,45 +1239,23 @@ Need help? Contact: @Univora88
 
 __Powered by Univora | Dev: @rolexsir_8__
 """
-        
-        success = 0
-        blocked = 0
-        failed = 0
-        
-        # Send to all users
-        for user in users:
-            try:
-                user_id = user["_id"]
-                await bot.send_message(user_id, restart_message)
-                success += 1
-                await asyncio.sleep(0.05)  # Prevent FloodWait (20 msgs/second)
-                
-            except FloodWait as e:
-                print(f"⏳ FloodWait: Sleeping {e.value}s...")
-                await asyncio.sleep(e.value)
-                # Retry after wait
-                try:
-                    await bot.send_message(user_id, restart_message)
-                    success += 1
-                except:
-                    failed += 1
-                    
-            except Exception as e:
-                error_str = str(e).lower()
-                if "blocked" in error_str or "user is deactivated" in error_str:
-                    blocked += 1
-                else:
-                    failed += 1
-        
-        # Final report
-        print(f"✅ Startup Broadcast Complete!")
-        print(f"   └─ Total Users: {total_users}")
-        print(f"   └─ Success: {success}")
-        print(f"   └─ Blocked/Deleted: {blocked}")
-        print(f"   └─ Failed: {failed}")
-        
+
+async def enqueue_startup_announcement():
+    """
+    Restart announcement ko low-priority job ke roop mein queue karta hai.
+    Key deploy id (ya message text) se banti hai, isliye ek announcement sirf ek baar jaata hai,
+    chahe instance kitni baar bhi restart ho. Low lane interactive replies ko pehle jagah deti hai
+    aur FloodWait dekh kar apni speed khud kam karti hai.
+    """
+    try:
+        version = Config.DEPLOY_ID or hashlib.sha1(STARTUP_ANNOUNCEMENT.encode()).hexdigest()[:12]
+        job_id = await broadcaster.start(text=STARTUP_ANNOUNCEMENT, key=f"startup:{version}", priority="low")
+        if job_id:
+            print(f"🔔 Startup announcement queued ({job_id}).")
+        else:
+            print("ℹ️ Startup announcement already sent/queued for this deploy, skipping.")
     except Exception as e:
-        print(f"⚠️ Startup Broadcast Error: {e}")
+        print(f"⚠️ Startup announcement error: {e}")
         # Don't crash bot, just log error
 
 # =====================================================================================
@@ -977,82 +1269,126 @@ async def health_check():
     """
     return {"status": "ok", "message": "Server is healthy and running!"}
 
+@app.get("/metrics")
+async def metrics_endpoint(request: Request, token: str = ""):
+    """
+    Prometheus scrape endpoint: `Authorization: Bearer <METRICS_TOKEN>` ya ?token= zaroori.
+    Token set na ho toh endpoint band (404), jab tak METRICS_PUBLIC=true explicitly na diya ho.
+    """
+    if Config.METRICS_TOKEN:
+        import hmac
+        supplied = token or request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(supplied, Config.METRICS_TOKEN):
+            raise HTTPException(status_code=403, detail="Forbidden")
+    elif not Config.METRICS_PUBLIC:
+        raise HTTPException(status_code=404, detail="Not found")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def _preload_hint(details):
+    """
+    Page ke <head> ke liye resource hint. Images ka preload; audio/video ka preload nahi (as="video" valid
+    destination nahi, browser use ignore karta hai ya poori file kheench leta hai), sirf stream origin ka
+    preconnect taaki player ki pehli range request ka TCP/TLS handshake page parse ke saath ho jaaye.
+    """
+    if not details:
+        return None
+    mime_type = details["mime_type"]
+    if details["is_media"]:
+        url = urlsplit(details["direct_dl_link"])
+        return {"rel": "preconnect", "href": f"{url.scheme}://{url.netloc}"}
+    if mime_type.startswith("image"):
+        return {"rel": "preload", "href": details["direct_dl_link"], "as": "image", "type": mime_type}
+    return None
+
+def _file_page(request: Request, template: str, unique_id: str):
+    # Metadata server par hi resolve hokar HTML mein inline (browser ko /api/file ka round trip nahi karna padta).
+    # Rendered + compressed page thodi der cache: repeat views par na DB lookup, na Jinja render.
+    async def render():
+        details = await build_file_details(unique_id)
+        return templates.get_template(template).render(file=details, preload=_preload_hint(details))
+    return page_cache.respond(request, (template, unique_id), render)
+
+@app.get("/static/{filename}")
+async def static_asset(request: Request, filename: str):
+    return assets.response(request, filename)
+
 @app.get("/show/{unique_id}", response_class=HTMLResponse)
 async def show_page(request: Request, unique_id: str):
-    return templates.TemplateResponse(
-        "show.html",
-        {"request": request}
-    )
+    return await _file_page(request, "show.html", unique_id)
 
 @app.get("/embed/{unique_id}", response_class=HTMLResponse)
 async def embed_page(request: Request, unique_id: str):
-    return templates.TemplateResponse(
-        "embed.html",
-        {"request": request}
-    )
+    return await _file_page(request, "embed.html", unique_id)
+
+def _dashboard_token_ok(user_id: int, token: str) -> bool:
+    import hmac
+    # Secret key should be unique to bot. Using BOT_TOKEN as salt.
+    expected_token = hmac.new(Config.BOT_TOKEN.encode(), str(user_id).encode(), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(token, expected_token)
+
+def _dashboard_link(link: dict) -> dict:
+    # Template aur /api/search dono isi format mein links dete hain
+    f_name = link.get("file_name", "Unknown")
+    u_id = link.get("_id")
+    expiry = link.get("expiry_date")
+    return {
+        "id": u_id,
+        "name": f_name,
+        "size": link.get("file_size", "Unknown"),
+        "date": link.get("date_str", "Unknown"),
+        "dl_link": f"{Config.BASE_URL}/dl/{u_id}/{f_name}",
+        "stream_link": f"{Config.BASE_URL}/show/{u_id}",
+        "timestamp": link.get("timestamp", 0),
+        "expiry": expiry.strftime('%Y-%m-%d') if expiry else "Never"
+    }
 
 @app.get("/dashboard/{user_id}", response_class=HTMLResponse)
 async def dashboard_page(request: Request, user_id: int, token: str):
     # 1. Validate Token (HMAC)
     try:
-        import hmac, hashlib
-        secret = Config.BOT_TOKEN.encode()
-        msg = str(user_id).encode()
-        expected_token = hmac.new(secret, msg, hashlib.sha256).hexdigest()
-        
-        if not hmac.compare_digest(token, expected_token):
+        if not _dashboard_token_ok(user_id, token):
              raise HTTPException(status_code=403, detail="Invalid Token. Please use the link from the bot.")
              
-        # 2. Fetch User Links (All Active)
-        links = await db.get_all_user_active_links(user_id)
-        
-        # 3. Format Data for Template
-        # Convert datetime objects to string for template safety if needed, 
-        # but Jinja handles them okay. We might want to pre-process for sorting.
-        formatted_links = []
-        for link in links:
-             # Basic Data
-             f_name = link.get("file_name", "Unknown")
-             f_size = link.get("file_size", "Unknown")
-             u_id = link.get("_id")
-             ts = link.get("timestamp", 0)
-             expiry = link.get("expiry_date")
-             
-             # Derived Data
-             dl_link = f"{Config.BASE_URL}/dl/{u_id}/{f_name}"
-             stream_link = f"{Config.BASE_URL}/show/{u_id}"
-             date_str = link.get("date_str", "Unknown")
+        # 2. Sirf pehla page (newest first); search / sort / aage ke pages /api/search se aate hain
+        links = await db.search_user_links(user_id, limit=Config.DASHBOARD_PAGE_SIZE + 1)
+        counters = await db.get_counters(user_id)
              
-             formatted_links.append({
-                 "name": f_name,
-                 "size": f_size,
-                 "date": date_str,
-                 "dl_link": dl_link,
-                 "stream_link": stream_link,
-                 "timestamp": ts,
-                 "expiry": expiry.strftime('%Y-%m-%d') if expiry else "Never"
-             })
-             
-        return templates.TemplateResponse(
-            "dashboard.html",
-            {
-                "request": request,
-                "user_id": user_id,
-                "links": formatted_links,
-                "total_count": len(formatted_links)
-            }
-        )
+        # Per-user page hai, cache nahi hota; sirf compressed bhejte hain
+        with server_timing.phase("render"):
+            html = templates.get_template("dashboard.html").render(
+                user_id=user_id,
+                token=token,
+                links=[_dashboard_link(l) for l in links[:Config.DASHBOARD_PAGE_SIZE]],
+                has_more=len(links) > Config.DASHBOARD_PAGE_SIZE,
+                page_size=Config.DASHBOARD_PAGE_SIZE,
+                total_count=counters["active_links"]
+            )
+        return html_response(request, html.encode())
              
     except Exception as e:
          print(f"Dashboard Error: {e}")
          raise HTTPException(status_code=403, detail="Access Denied")
-@app.get("/api/file/{unique_id}", response_class=JSONResponse)
-async def get_file_details_api(request: Request, unique_id: str):
+
+@app.get("/api/search/{user_id}", response_class=JSONResponse)
+async def search_links_api(user_id: int, token: str, q: str = "", sort: str = "newest", page: int = 1):
+    """Dashboard search: name token prefix match, sorting aur pagination sab DB mein (index par)."""
+    if not _dashboard_token_ok(user_id, token):
+        raise HTTPException(status_code=403, detail="Invalid Token. Please use the link from the bot.")
+    size = Config.DASHBOARD_PAGE_SIZE
+    page = max(1, page)
+    links = await db.search_user_links(user_id, q[:200], sort, skip=(page - 1) * size, limit=size + 1)
+    return {"results": [_dashboard_link(l) for l in links[:size]], "page": page, "has_more": len(links) > size}
+
+async def build_file_details(unique_id: str):
+    """ /api/file aur show/embed pages ka shared metadata builder. Link expired/invalid ho toh None. """
     # db.get_link_full directly returns data without Telegram API, preventing "Access Denied" on refresh due to FloodWaits
     link_data = await db.get_link_full(unique_id)
     
     if not link_data:
-        raise HTTPException(status_code=404, detail="Link expired or invalid.")
+        return None
+    return _file_details(unique_id, link_data)
+
+def _file_details(unique_id: str, link_data: dict):
     file_name = link_data.get("file_name")
     if not file_name:
         file_name = "file"
@@ -1081,6 +1417,10 @@ async def get_file_details_api(request: Request, unique_id: str):
     base_url = base_url.rstrip('/')
         
     direct_dl_link = f"{base_url}/dl/{unique_id}/{encoded_file_name}"
+    if Config.SIGNED_URLS:
+        # Page / players ke range requests signed URL par: har request par DB lookup nahi
+        token = link_signer.sign(unique_id, link_data["msg_id"], link_data.get("user_id"), link_data.get("expiry_date"))
+        direct_dl_link = f"{base_url}/s/{token}/{encoded_file_name}"
     
     # Format intents correctly
     # VLC mobile needs specific action and scheme
@@ -1095,6 +1435,7 @@ async def get_file_details_api(request: Request, unique_id: str):
     response_data = {
         "file_name": file_name,
         "file_size": file_size,
+        "mime_type": mime_type,
         "is_media": mime_type.startswith(("video", "audio")),
         "direct_dl_link": direct_dl_link,
         "embed_link": f"{base_url}/embed/{unique_id}",
@@ -1105,6 +1446,53 @@ async def get_file_details_api(request: Request, unique_id: str):
     }
     return response_data
 
+# /api/file ke serialized responses: {unique_id: {"body", "etag", "expires_at", "cached_until"}}
+file_api_cache = {}
+_FILE_API_HIT, _FILE_API_MISS = metrics.cache_counters("file_api")
+
+async def _file_api_entry(unique_id: str):
+    now = time.time()
+    entry = file_api_cache.get(unique_id)
+    if entry and entry["cached_until"] > now:
+        _FILE_API_HIT.inc()
+        return entry
+    _FILE_API_MISS.inc()
+    link_data = await db.get_link_full(unique_id)
+    if not link_data:
+        file_api_cache.pop(unique_id, None)
+        return None
+    # Payload link expire hone tak badalta nahi, isliye bytes aur ETag ek baar hi bante hain
+    with server_timing.phase("render"):
+        body = json.dumps(_file_details(unique_id, link_data), separators=(",", ":")).encode()
+    expiry = link_data.get("expiry_date")
+    expires_at = expiry.timestamp() if expiry else None
+    entry = {
+        "body": body,
+        "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        "expires_at": expires_at,
+        "cached_until": min(now + Config.FILE_API_CACHE_TTL, expires_at or float("inf")),
+    }
+    if len(file_api_cache) >= Config.FILE_API_CACHE_SIZE:
+        for key in [k for k, v in file_api_cache.items() if v["cached_until"] <= now] or list(file_api_cache)[:len(file_api_cache) // 2]:
+            del file_api_cache[key]
+    file_api_cache[unique_id] = entry
+    return entry
+
+@app.get("/api/file/{unique_id}", response_class=JSONResponse)
+async def get_file_details_api(request: Request, unique_id: str):
+    entry = await _file_api_entry(unique_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Link expired or invalid.")
+    # Browser/edge cache link ke expiry se aage kabhi nahi jaata
+    max_age = Config.FILE_API_MAX_AGE
+    if entry["expires_at"] is not None:
+        max_age = max(0, min(max_age, int(entry["expires_at"] - time.time())))
+    headers = {"ETag": entry["etag"], "Cache-Control": f"public, max-age={max_age}"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry["etag"] in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(entry["body"], media_type="application/json", headers=headers)
+
 class ByteStreamer:
     def __init__(self, c: Client):
         self.client = c
@@ -1118,52 +1506,62 @@ class ByteStreamer:
             thumb_size=f.thumbnail_size
         )
 
-    async def fetch_chunk(self, ms, loc, offset, limit):
+    async def fetch_chunk(self, ms, loc, offset, limit, timer=None):
+        # timer: pehle se bound tg_getfile_seconds{dc} child (yield_file har stream par ek baar bind karta hai)
         for attempt in range(5):
             try:
+                start = time.perf_counter()
                 r = await ms.invoke(
                     raw.functions.upload.GetFile(location=loc, offset=offset, limit=limit),
                     retries=1
                 )
+                end = time.perf_counter()
+                if timer is not None:
+                    timer.observe(end - start)
+                server_timing.record("getfile", start, end)
                 if isinstance(r, raw.types.upload.File):
                     return r.bytes
                 elif isinstance(r, raw.types.upload.FileCdnRedirect):
                     print("DEBUG: CDN Redirect")
                     break
             except (FloodWait) as e:
+                metrics.flood_wait(self.client, "stream", e.value)
                 await asyncio.sleep(e.value + 1)
+            except (AuthKeyUnregistered, Unauthorized) as e:
+                # Saved media session ab valid nahi; hata do taaki agli request naya authorize kare
+                print(f"⚠️ Media session for DC {ms.dc_id} unauthorized: {e}")
+                await invalidate_media_session(self.client, ms.dc_id)
+                break
             except Exception as e:
                 await asyncio.sleep(0.5)
         return None
 
-    async def yield_file(self, f: FileId, i: int, start_byte: int, end_byte: int, chunk_size: int):
+    async def yield_file(self, f: FileId, i: int, start_byte: int, end_byte: int, chunk_size: int, stats: tuple = None):
         c = self.client
         work_loads[i] += 1
+        # stats = (unique_id, owner, viewer): analytics memory mein aggregate hote hain, DB write nahi
+        if stats:
+            analytics.record_hit(*stats)
+        bytes_served = 0
         
-        # Session Setup
+        # Session Setup (saved media-DC auth key reuse hoti hai, concurrent streams ek hi session share karte hain)
         ms = None
-        for _ in range(3):
-            try:
-                ms = c.media_sessions.get(f.dc_id)
-                if ms is None:
-                    if f.dc_id != await c.storage.dc_id():
-                        ak = await Auth(c, f.dc_id, await c.storage.test_mode()).create()
-                        ms = Session(c, f.dc_id, ak, await c.storage.test_mode(), is_media=True)
-                        await ms.start()
-                        ea = await c.invoke(raw.functions.auth.ExportAuthorization(dc_id=f.dc_id))
-                        await ms.invoke(raw.functions.auth.ImportAuthorization(id=ea.id, bytes=ea.bytes))
-                    else:
-                        ms = c.session
-                    c.media_sessions[f.dc_id] = ms
-                break
-            except Exception as e:
-                await asyncio.sleep(0.5)
+        server_timing.annotate(dc=f.dc_id)
+        with server_timing.phase("session"):
+            for _ in range(3):
+                try:
+                    ms = await get_media_session(c, f.dc_id)
+                    break
+                except Exception as e:
+                    await asyncio.sleep(0.5)
         
         if not ms:
             work_loads[i] -= 1
             return 
 
         loc = await self.get_location(f)
+        getfile_timer = metrics.GETFILE_SECONDS.labels(f.dc_id)
+        bytes_counter = metrics.STREAM_BYTES.labels(c.name, f.dc_id)
         
         try:
             current_pos = start_byte
@@ -1173,7 +1571,7 @@ class ByteStreamer:
                 chunk_index = current_pos // chunk_size
                 req_offset = chunk_index * chunk_size
                 
-                chunk_data = await self.fetch_chunk(ms, loc, req_offset, chunk_size)
+                chunk_data = await self.fetch_chunk(ms, loc, req_offset, chunk_size, getfile_timer)
                 
                 if chunk_data is None:
                     print(f"CRITICAL: Failed to fetch chunk at {req_offset}")
@@ -1193,6 +1591,8 @@ class ByteStreamer:
                 yield payload
                 
                 sent_len = len(payload)
+                bytes_served += sent_len
+                bytes_counter.inc(sent_len)
                 current_pos += sent_len
                 bytes_remaining -= sent_len
                 
@@ -1205,15 +1605,10 @@ class ByteStreamer:
             traceback.print_exc()
         finally:
             work_loads[i] -= 1
+            if stats:
+                analytics.record_bytes(stats[0], stats[1], bytes_served)
 
-@app.get("/dl/{unique_id}/{fname}")
-async def stream_media(r:Request, unique_id: str, fname: str):
-    # Retrieve Message ID from DB
-    message_id, backups = await db.get_link(unique_id)
-    if not message_id:
-        raise HTTPException(status_code=404, detail="Link expired or invalid.")
-    mid = message_id
-
+def _pick_client():
     # Fallback logic for client selection
     c = None
     client_id = 0
@@ -1231,25 +1626,289 @@ async def stream_media(r:Request, unique_id: str, fname: str):
         else:
             print("DEBUG: Critical - Both multi_clients and global bot missing.")
             raise HTTPException(503, detail="Bot not initialized")
-    
+    return client_id, c
+
+# Telegram GetFile ki max limit; /c/ chunks isi par aligned hain (badalne se saare edge cache keys badal jaate)
+CHUNK_SIZE = 1024 * 1024
+
+chunk_http = None
+
+async def _yield_from_chunks(mid: int, start_byte: int, end_byte: int, stats: tuple = None):
+    """Range ko aligned /c/ chunks se compose karta hai (CHUNK_ORIGIN ke cache tier se), hot files Telegram tak nahi jaatin."""
+    global chunk_http
+    if chunk_http is None:
+        chunk_http = httpx.AsyncClient(
+            base_url=Config.CHUNK_ORIGIN.rstrip("/"), timeout=60, headers={"X-Chunk-Auth": link_signer.chunk_origin_token()}
+        )
+    key = link_signer.chunk_key(mid)
+    if stats:
+        analytics.record_hit(*stats)
+    bytes_served = 0
+    # Agle chunks pehle se fetch ho rahe hote hain (ZipStream jaisa): client ko bhejte waqt origin idle nahi
+    ahead = deque()
+    next_index, last_index = start_byte // CHUNK_SIZE, end_byte // CHUNK_SIZE
+
+    def fetch_more():
+        nonlocal next_index
+        while next_index <= last_index and len(ahead) < max(1, Config.CHUNK_PREFETCH):
+            task = asyncio.create_task(chunk_http.get(f"/c/{key}/{next_index}"))
+            # Beech mein ruk gaye toh bache tasks ka error "never retrieved" warning na de
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            ahead.append((next_index, task))
+            next_index += 1
+
+    try:
+        pos = start_byte
+        fetch_more()
+        while ahead:
+            index, task = ahead.popleft()
+            fetch_more()
+            with server_timing.phase("origin"):
+                resp = await task
+            if resp.status_code != 200:
+                print(f"CRITICAL: Chunk {index} of msg {mid} failed ({resp.status_code})")
+                break
+            base = index * CHUNK_SIZE
+            if pos < base:
+                # Pichla chunk chhota aaya: gap chhod kar aage ke bytes nahi bhejte
+                print(f"CRITICAL: Chunk {index - 1} of msg {mid} was short")
+                break
+            payload = resp.content[pos - base : end_byte - base + 1]
+            if not payload:
+                break
+            yield payload
+            bytes_served += len(payload)
+            pos += len(payload)
+    except Exception as e:
+        print(f"Chunk compose error: {e}")
+    finally:
+        for _, task in ahead:
+            task.cancel()
+        if stats:
+            analytics.record_bytes(stats[0], stats[1], bytes_served)
+
+async def _download_to_disk(mid: int, path: str, max_size: int) -> int:
+    """Storage message ki poori file disk par (hot cache ke liye). max_size se badi ho toh 0."""
+    client_id, c = _pick_client()
+    tc=class_cache.get(c) or ByteStreamer(c);class_cache[c]=tc
+    msg = await message_resolver.get(c, mid)
+    m = msg.document or msg.video or msg.audio
+    if not m or msg.empty or m.file_size > max_size:
+        return 0
+    written = 0
+    with open(path, "wb") as f:
+        async for part in tc.yield_file(FileId.decode(m.file_id), client_id, 0, m.file_size - 1, CHUNK_SIZE):
+            # Disk write thread mein, taaki event loop streams serve karta rahe
+            await asyncio.to_thread(f.write, part)
+            written += len(part)
+    return written if written == m.file_size else 0
+
+hot_files = HotFileCache(_download_to_disk)
+
+async def start_hot_cache():
+    if Config.HOT_CACHE:
+        await hot_files.start()
+
+def _serve_hot_file(path: str, mid: int, m, headers: dict):
+    if Config.HOT_ACCEL_PREFIX:
+        # nginx khud file (aur Range) serve karta hai, Python sirf header bhejta hai
+        headers = {k: v for k, v in headers.items() if k in ("Content-Type", "Content-Disposition")}
+        headers["X-Accel-Redirect"] = f"{Config.HOT_ACCEL_PREFIX.rstrip('/')}/{mid}"
+        return Response(status_code=200, headers=headers)
+    # FileResponse Range / 206 khud handle karta hai
+    return FileResponse(path, media_type=m.mime_type or "application/octet-stream",
+                        headers={"Content-Disposition": headers["Content-Disposition"]})
+
+@app.get("/zip/{user_id}")
+async def zip_bundle(r: Request, user_id: int, token: str, ids: str):
+    """
+    Dashboard se chune gaye links ka ek store-only ZIP64 stream: N alag /dl downloads ki jagah ek connection.
+    Content-Length pehle se pata hai aur Range (resume) support hai.
+    """
+    if not _dashboard_token_ok(user_id, token):
+        raise HTTPException(status_code=403, detail="Invalid Token. Please use the link from the bot.")
+
+    wanted = list(dict.fromkeys(i for i in ids.split(",") if i))[:Config.ZIP_MAX_FILES]
+    # Sirf chune hue links ki ek DB query (_id IN), phir saare storage messages ek batched get_messages mein
+    links = {l["_id"]: l for l in await db.get_user_links_by_ids(user_id, wanted)}
+    links = [links[i] for i in wanted if i in links]
+    if not links:
+        raise HTTPException(status_code=404, detail="No active links selected.")
+
+    client_id, c = _pick_client()
     tc=class_cache.get(c) or ByteStreamer(c);class_cache[c]=tc
+    msgs = await asyncio.gather(*(message_resolver.get(c, l["msg_id"]) for l in links))
+
+    entries = []
+    for link, msg in zip(links, msgs):
+        m = None if msg.empty else (msg.document or msg.video or msg.audio)
+        if not m:
+            continue
+        fid = FileId.decode(m.file_id)
+        def source(start, end, fid=fid):
+            return tc.yield_file(fid, client_id, start, end, CHUNK_SIZE)
+        entries.append(ZipEntry(link["msg_id"], link.get("file_name") or m.file_name or "file", m.file_size, link.get("timestamp", 0), source))
+    if not entries:
+        raise HTTPException(status_code=404, detail="Files not found.")
+
+    archive = ZipStream(entries)
+    total = archive.total_size
+    start, end = 0, total - 1
+    rh = r.headers.get("Range", "")
+    if rh:
+        try:
+            first, _, last = rh.replace("bytes=", "").partition("-")
+            if first:
+                start = int(first)
+                if last:
+                    end = min(int(last), total - 1)
+            else:
+                # Suffix range "bytes=-N": aakhri N bytes
+                start = max(0, total - int(last))
+        except ValueError:
+            # Multi-range ya kharab header: poora archive (200)
+            start, end, rh = 0, total - 1, ""
+        if start > end:
+            raise HTTPException(416)
+        # Pehle ki files ke CRC (is process mein) pata nahi toh poora archive dobara (200), resume nahi
+        if not archive.can_resume_from(start):
+            start, end, rh = 0, total - 1, ""
+
+    hdrs = {
+        "Content-Type": "application/zip",
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": f'attachment; filename="StreamDrop-{len(entries)}-files.zip"',
+        "Content-Length": str(end - start + 1),
+    }
+    if rh:
+        hdrs["Content-Range"] = f"bytes {start}-{end}/{total}"
+    return StreamingResponse(archive.iter_range(start, end), status_code=206 if rh else 200, headers=hdrs)
+
+@app.get("/c/{key}/{chunk_index}")
+async def stream_chunk(request: Request, key: str, chunk_index: int):
+    """
+    Fixed, aligned CHUNK_SIZE chunks, storage msg_id se addressed (HMAC signed key, guess nahi ho sakti).
+    Storage message ka content kabhi nahi badalta, isliye response immutable hai aur nginx ise hamesha cache kar sakta hai.
+    Key permanent hai aur link state nahi dekhti, isliye yeh sirf cache tier ke liye internal route hai: CHUNK_ORIGIN
+    set na ho ya request par app ka X-Chunk-Auth na ho toh 404. Cache tier khud kabhi public nahi hona chahiye.
+    """
+    import hmac
+    if not Config.CHUNK_ORIGIN or not hmac.compare_digest(request.headers.get("x-chunk-auth", ""), link_signer.chunk_origin_token()):
+        raise HTTPException(status_code=404, detail="Not found")
+    mid = link_signer.verify_chunk_key(key)
+    if mid is None or chunk_index < 0:
+        raise HTTPException(status_code=404, detail="Not found")
+    client_id, c = _pick_client()
+    tc=class_cache.get(c) or ByteStreamer(c);class_cache[c]=tc
+    msg = await message_resolver.get(c, mid)
+    m = msg.document or msg.video or msg.audio
+    if not m or msg.empty:
+        raise HTTPException(status_code=404, detail="Not found")
+    start = chunk_index * CHUNK_SIZE
+    if start >= m.file_size:
+        raise HTTPException(status_code=404, detail="Not found")
+    end = min(m.file_size, start + CHUNK_SIZE) - 1
+    # Pura chunk buffer karke bhejte hain: adhoora chunk kabhi cache mein nahi jaana chahiye
+    data = b"".join([part async for part in tc.yield_file(FileId.decode(m.file_id), client_id, start, end, CHUNK_SIZE)])
+    if len(data) != end - start + 1:
+        raise HTTPException(status_code=502, detail="Upstream fetch failed")
+    return Response(data, media_type="application/octet-stream", headers={"Cache-Control": IMMUTABLE, "ETag": f'"{mid}-{chunk_index}"'})
+
+@app.get("/dl/{unique_id}/{fname}")
+async def stream_media(r:Request, unique_id: str, fname: str):
+    started = time.perf_counter()
+    # Retrieve Message ID from DB
+    link = await db.get_link_full(unique_id)
+    if not link:
+        raise HTTPException(status_code=404, detail="Link expired or invalid.")
+    return await _stream_file(r, unique_id, link["msg_id"], link.get("user_id"), started)
+
+@app.get("/s/{token}/{fname}")
+async def stream_signed(r:Request, token: str, fname: str):
+    started = time.perf_counter()
+    # Signed URL: msg_id / owner / expiry token mein hi hain, DB read zero
+    claims = link_signer.verify(token)
+    if not claims:
+        raise HTTPException(status_code=404, detail="Link expired or invalid.")
+    return await _stream_file(r, claims["unique_id"], claims["msg_id"], claims["owner_id"], started)
+
+_TTFB_TELEGRAM = metrics.DL_TTFB_SECONDS.labels("telegram")
+_TTFB_CHUNKS = metrics.DL_TTFB_SECONDS.labels("chunks")
+_HOT_HIT, _HOT_MISS = metrics.cache_counters("hot_file")
+
+async def _primed_body(body, started: float, ttfb):
+    """
+    Pehla chunk response headers se pehle hi nikal leta hai: media session aur pehla GetFile Server-Timing mein aa jaate hain,
+    aur pehle byte se pehle hi fail ho toh client ko adhoora 200 nahi, 502 milta hai. Pehla chunk na mile toh None.
+    """
     try:
-        msg=await c.get_messages(Config.STORAGE_CHANNEL,mid);m=msg.document or msg.video or msg.audio
+        first = await body.__anext__()
+    except StopAsyncIteration:
+        return None
+    except BaseException:
+        await body.aclose()
+        raise
+    ttfb.observe(time.perf_counter() - started)
+
+    async def rest():
+        # Client beech mein chala jaaye toh bhi andar wala generator band ho (work_loads / analytics finally)
+        try:
+            yield first
+            async for chunk in body:
+                yield chunk
+        finally:
+            await body.aclose()
+    return rest()
+
+async def _stream_file(r:Request, unique_id: str, mid: int, owner_id, started: float):
+    client_ip = (r.headers.get("X-Forwarded-For") or (r.client.host if r.client else "")).split(",")[0].strip()
+    stats = (unique_id, owner_id, analytics.viewer_id(client_ip, r.headers.get("User-Agent", "")))
+
+    client_id, c = _pick_client()
+    tc=class_cache.get(c) or ByteStreamer(c);class_cache[c]=tc
+    try:
+        # Concurrent requests ke lookups batch hokar ek get_messages call mein jaate hain (+ short cache)
+        server_timing.annotate(client=c.name,msg_id=mid,range=r.headers.get("Range"))
+        with server_timing.phase("resolve"):msg=await message_resolver.get(c,mid)
+        m=msg.document or msg.video or msg.audio
         if not m or msg.empty:raise FileNotFoundError
         fid=FileId.decode(m.file_id);fsize=m.file_size;rh=r.headers.get("Range","");fb,ub=0,fsize-1
         if rh:
-            rps=rh.replace("bytes=","").split("-");fb=int(rps[0])
-            if len(rps)>1 and rps[1]:ub=int(rps[1])
-        if(ub>=fsize)or(fb<0):raise HTTPException(416)
-        rl=ub-fb+1;cs=1024*1024
-        
-        # New Call Signature: pass start byte (fb) and end byte (ub) directly
-        body=tc.yield_file(fid,client_id,fb,ub,cs)
+            try:
+                first,_,last=rh.replace("bytes=","").partition("-")
+                if first:
+                    # End EOF ke paar ho toh EOF tak clamp (RFC 9110), 416 sirf start EOF ke paar hone par
+                    fb=int(first)
+                    if last:ub=min(int(last),fsize-1)
+                else:fb=max(0,fsize-int(last)) # Suffix range "bytes=-N": aakhri N bytes
+            except ValueError:rh="";fb,ub=0,fsize-1 # Multi-range / kharab header: poori file (200)
+        if fb>ub and fsize:raise HTTPException(416)
+        rl=ub-fb+1;cs=CHUNK_SIZE
         
         sc=206 if rh else 200
         hdrs={"Content-Type":m.mime_type or "application/octet-stream","Accept-Ranges":"bytes","Content-Disposition":f'inline; filename="{m.file_name}"',"Content-Length":str(rl)}
         if rh:hdrs["Content-Range"]=f"bytes {fb}-{ub}/{fsize}"
+
+        # Hot file: poori file disk par hai, Telegram / generator ki zaroorat nahi
+        if Config.HOT_CACHE:
+            hot_files.record(mid)
+            hot_path = hot_files.path_for(mid)
+            if hot_path:
+                _HOT_HIT.inc()
+                analytics.record_hit(*stats)
+                analytics.record_bytes(stats[0], stats[1], rl)
+                return _serve_hot_file(hot_path, mid, m, hdrs)
+            _HOT_MISS.inc()
+
+        # New Call Signature: pass start byte (fb) and end byte (ub) directly
+        # CHUNK_ORIGIN set ho toh bytes cache tier (nginx) ke /c/ chunks se aate hain, Telegram se nahi
+        if Config.CHUNK_ORIGIN:body=await _primed_body(_yield_from_chunks(mid,fb,ub,stats),started,_TTFB_CHUNKS)
+        else:body=await _primed_body(tc.yield_file(fid,client_id,fb,ub,cs,stats),started,_TTFB_TELEGRAM)
+        if body is None:
+            if rl>0:raise HTTPException(502,detail="Upstream fetch failed, please retry.")
+            body=iter(())
         return StreamingResponse(body,status_code=sc,headers=hdrs)
+    except HTTPException:raise
     except FileNotFoundError:raise HTTPException(404)
     except Exception:print(traceback.format_exc());raise HTTPException(500)
 
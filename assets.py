@@ -0,0 +1,234 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import subprocess
+import time
+import urllib.request
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from config import Config
+from metrics import cache_counters
+from server_timing import phase
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Build output: fingerprinted files + .br/.gz variants + manifest.json (logical name -> file)
+DIST_DIR = os.path.join("static", "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+TAILWIND_INPUT = os.path.join("static", "src", "tailwind.css")
+
+# Vendor assets: build time par yahin se download hote hain; build na hua ho toh runtime par yahi CDN URLs use hote hain
+VENDOR = {
+    "plyr.js": "https://cdn.plyr.io/3.7.8/plyr.js",
+    "plyr.css": "https://cdn.plyr.io/3.7.8/plyr.css",
+    "remixicon.css": "https://cdn.jsdelivr.net/npm/remixicon@3.5.0/fonts/remixicon.css",
+}
+REMIXICON_FONT = "https://cdn.jsdelivr.net/npm/remixicon@3.5.0/fonts/remixicon.woff2"
+
+# Pehle se compressed formats ko dobara compress karne ka fayda nahi
+_INCOMPRESSIBLE = (".woff2", ".png", ".jpg", ".webp")
+IMMUTABLE = "public, max-age=31536000, immutable"
+_PAGE_HIT, _PAGE_MISS = cache_counters("page")
+
+mimetypes.add_type("font/woff2", ".woff2")
+
+
+def _accepted_encodings(request: Request) -> set:
+    header = request.headers.get("accept-encoding", "")
+    return {part.split(";")[0].strip().lower() for part in header.split(",") if part.strip()}
+
+
+def _compress(data: bytes, level: int = 9):
+    gz = gzip.compress(data, compresslevel=level, mtime=0)
+    br = brotli.compress(data, quality=11 if level == 9 else 5) if brotli else None
+    return gz, br
+
+
+class Assets:
+    """
+    Static assets (Tailwind CSS, Plyr, Remixicon) ka serving layer.
+    `python assets.py` (Docker build mein) sab kuch pehle se build, fingerprint aur brotli/gzip mein compress karta hai;
+    runtime par `asset()` Jinja global fingerprinted URL deta hai jo `immutable` cache ke saath serve hota hai.
+    Build na hua ho toh templates purane CDN URLs par fall back karte hain.
+    """
+
+    def __init__(self):
+        self._manifest = {}
+        self._files = set()
+
+    def load(self):
+        try:
+            with open(MANIFEST_PATH) as f:
+                self._manifest = json.load(f)
+        except (OSError, ValueError):
+            self._manifest = {}
+        self._files = set(self._manifest.values())
+        if self._manifest:
+            print(f"✅ Static assets loaded: {len(self._manifest)} fingerprinted files.")
+        else:
+            print("⚠️ Static assets not built (python assets.py), CDN fallback in use.")
+
+    def built(self, name: str) -> bool:
+        return name in self._manifest
+
+    def url(self, name: str) -> str:
+        if name in self._manifest:
+            return f"/static/{self._manifest[name]}"
+        return VENDOR.get(name, "")
+
+    def response(self, request: Request, filename: str):
+        # Sirf manifest wali files serve hoti hain (path traversal ka sawaal hi nahi)
+        if filename not in self._files:
+            raise HTTPException(status_code=404, detail="Not found")
+        path = os.path.join(DIST_DIR, filename)
+        media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding"}
+        accepted = _accepted_encodings(request)
+        for encoding, ext in (("br", ".br"), ("gzip", ".gz")):
+            if encoding in accepted and os.path.exists(path + ext):
+                headers["Content-Encoding"] = encoding
+                return FileResponse(path + ext, media_type=media_type, headers=headers)
+        return FileResponse(path, media_type=media_type, headers=headers)
+
+assets = Assets()
+assets.load()
+
+
+class PageCache:
+    """
+    Rendered HTML pages ka chhota TTL cache, gzip/brotli variants ke saath.
+    Hit par na DB lookup hota hai na Jinja render, bas pehle se compressed bytes jaate hain.
+    (Global GZipMiddleware jaan-bujhkar nahi lagaya: woh /dl ke streams ko bhi compress karne lagta.)
+    """
+
+    def __init__(self):
+        # {key: (expires_at, html, gz, br)}
+        self._pages = {}
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, v in self._pages.items() if v[0] <= now]:
+            del self._pages[key]
+        if len(self._pages) > Config.PAGE_CACHE_SIZE:
+            for key in list(self._pages)[:len(self._pages) // 2]:
+                del self._pages[key]
+
+    def invalidate(self, key):
+        self._pages.pop(key, None)
+
+    async def respond(self, request: Request, key, render):
+        """`render()` (async) sirf cache miss par chalta hai aur HTML string deta hai."""
+        entry = self._pages.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            _PAGE_HIT.inc()
+        else:
+            _PAGE_MISS.inc()
+            with phase("render"):
+                html = (await render()).encode()
+            with phase("compress"):
+                entry = (time.monotonic() + Config.PAGE_CACHE_TTL, html, *_compress(html, level=6))
+            self._pages[key] = entry
+            if len(self._pages) > Config.PAGE_CACHE_SIZE:
+                self._evict_expired()
+        return html_response(request, *entry[1:])
+
+page_cache = PageCache()
+
+
+def html_response(request: Request, html: bytes, gz: bytes = None, br: bytes = None):
+    """Client ke Accept-Encoding ke hisaab se br / gzip / plain HTML."""
+    if gz is None:
+        with phase("compress"):
+            gz, br = _compress(html, level=6)
+    headers = {"Vary": "Accept-Encoding"}
+    accepted = _accepted_encodings(request)
+    if br is not None and "br" in accepted:
+        body, headers["Content-Encoding"] = br, "br"
+    elif "gzip" in accepted:
+        body, headers["Content-Encoding"] = gz, "gzip"
+    else:
+        body = html
+    return Response(body, media_type="text/html; charset=utf-8", headers=headers)
+
+
+# --- BUILD STEP ---
+
+def _fetch(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=60) as resp:
+        return resp.read()
+
+def _emit(manifest: dict, name: str, data: bytes):
+    stem, ext = os.path.splitext(name)
+    filename = f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+    path = os.path.join(DIST_DIR, filename)
+    with open(path, "wb") as f:
+        f.write(data)
+    if not filename.endswith(_INCOMPRESSIBLE):
+        gz, br = _compress(data)
+        with open(path + ".gz", "wb") as f:
+            f.write(gz)
+        if br is not None:
+            with open(path + ".br", "wb") as f:
+                f.write(br)
+    manifest[name] = filename
+    print(f"  {name} -> {filename} ({len(data) // 1024} KB)")
+
+def _build_tailwind() -> bytes:
+    """Templates mein use hui classes se Tailwind CSS (standalone CLI, TAILWIND_BIN ya PATH se)."""
+    binary = os.environ.get("TAILWIND_BIN") or shutil.which("tailwindcss")
+    if not binary:
+        print("⚠️ tailwindcss CLI not found, pages will keep using the Tailwind Play CDN.")
+        return None
+    out = os.path.join(DIST_DIR, "_tailwind.css")
+    subprocess.run(
+        [binary, "-i", TAILWIND_INPUT, "-o", out, "--content", "./templates/*.html", "--minify"],
+        check=True
+    )
+    with open(out, "rb") as f:
+        data = f.read()
+    os.remove(out)
+    return data
+
+def build():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    manifest = {}
+
+    tailwind = _build_tailwind()
+    if tailwind:
+        _emit(manifest, "tailwind.css", tailwind)
+
+    for name, url in VENDOR.items():
+        try:
+            data = _fetch(url)
+            if name == "remixicon.css":
+                font_data = _fetch(REMIXICON_FONT)
+        except OSError as e:
+            # Network / CDN down: yeh entry manifest mein nahi jaati, runtime par iska CDN URL use hota hai
+            print(f"⚠️ Could not fetch {name} ({e}), CDN fallback will be used for it.")
+            continue
+        if name == "remixicon.css":
+            # Font bhi apne server se: sirf woff2 rakho (sab modern browsers) aur fingerprinted path par point karo
+            _emit(manifest, "remixicon.woff2", font_data)
+            font = f"/static/{manifest['remixicon.woff2']}"
+            data = re.sub(rb"src:[^;]*;[^\n]*\n", b"", data)
+            data = data.replace(
+                b"font-display:", f'src: url("{font}") format("woff2");\n  font-display:'.encode(), 1
+            )
+        _emit(manifest, name, data)
+
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"✅ Built {len(manifest)} assets into {DIST_DIR}")
+
+if __name__ == "__main__":
+    build()
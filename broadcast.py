@@ -0,0 +1,269 @@
+import asyncio
+import secrets
+import time
+
+from pyrogram import Client
+from pyrogram.errors import FloodWait, UserIsBlocked, InputUserDeactivated, PeerIdInvalid, UserDeactivated
+
+from config import Config
+from database import db
+from metrics import BROADCAST_MESSAGES, flood_wait
+
+class TokenBucket:
+    """
+    Simple token bucket rate limiter. Telegram bots ke liye ~30 msgs/sec global limit hai,
+    isliye default rate usse thoda neeche rakha gaya hai. FloodWait aane par poora bucket pause hota hai
+    aur rate aadha ho jaata hai (AIMD); har successful send ke saath rate dheere dheere wapas badhta hai.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    async def acquire(self, reserve: float = 0):
+        """
+        reserve > 0 (low-priority lane): tabhi token lo jab bucket mein itne token bache rahein,
+        taaki interactive replies ke liye hamesha budget rahe.
+        """
+        async with self._lock:
+            while True:
+                now = self._refill()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                if self._tokens >= 1 + reserve:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 + reserve - self._tokens) / self.rate)
+
+    def consume_interactive(self):
+        """Interactive reply ne budget use kiya: bucket se token ghatao (negative bhi ja sakta hai), wait kabhi nahi."""
+        self._refill()
+        self._tokens = max(-self.capacity, self._tokens - 1)
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    def on_flood_wait(self, seconds: float):
+        self.pause(seconds)
+        self.rate = max(Config.BROADCAST_MIN_RATE, self.rate / 2)
+
+    def on_success(self):
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + Config.BROADCAST_RATE_RECOVERY)
+
+
+class BroadcastEngine:
+    """
+    Concurrent, rate-limited, resumable broadcast / outbound-message job queue.
+    Users DB cursor se pages mein aate hain (poori list memory mein nahi). Page ke shuru se lagataar poore
+    hue sends ke baad progress (last_user_id + counts) DB mein save hoti hai, isliye restart ke baad broadcast
+    wahi se resume hota hai; sirf checkpoint ke aage pehle hi ho chuke kuch sends (max BROADCAST_WORKERS) dobara jaate hain.
+    Idempotency key wale jobs sirf ek baar enqueue hote hain, chahe kitne bhi restart ho.
+    """
+
+    def __init__(self, bot: Client, multi_clients: dict):
+        self.bot = bot
+        self.multi_clients = multi_clients
+        self._buckets = {}
+        self._tasks = {}
+
+    def _bucket(self, client: Client) -> TokenBucket:
+        bucket = self._buckets.get(id(client))
+        if bucket is None:
+            bucket = self._buckets[id(client)] = TokenBucket(Config.BROADCAST_RATE)
+        return bucket
+
+    def _clients(self):
+        # Extra clients sirf tab jab allowed ho: unhe user ne /start kiya hona chahiye, warna main bot fallback
+        if Config.BROADCAST_MULTI_CLIENT:
+            extra = [c for cid, c in sorted(self.multi_clients.items()) if cid != 0 and c is not self.bot]
+            return [self.bot] + extra
+        return [self.bot]
+
+    def note_interactive(self):
+        """Bot ne kisi user ko interactive reply diya: low-priority lane ko jagah do."""
+        self._bucket(self.bot).consume_interactive()
+
+    async def start(self, from_chat_id=None, message_id=None, text=None, key=None, priority="normal", status_chat_id=None, status_message_id=None):
+        """
+        Naya broadcast job DB mein register karke background mein chalata hai.
+        Ya toh (from_chat_id, message_id) copy hota hai ya plain `text` bheja jaata hai.
+        Broadcast id return karta hai; same `key` wala job pehle se ho toh None.
+        """
+        source_chat, source_msg = from_chat_id or 0, message_id or 0
+        if message_id and len(self._clients()) > 1:
+            # Dusre bots owner ki private chat nahi padh sakte, isliye message storage channel mein copy karo
+            copied = await self.bot.copy_message(Config.STORAGE_CHANNEL, from_chat_id, message_id)
+            source_chat, source_msg = Config.STORAGE_CHANNEL, copied.id
+
+        job = {
+            "_id": key or secrets.token_hex(6),
+            "status": "running",
+            "priority": priority,
+            "text": text,
+            "source_chat": source_chat,
+            "source_msg": source_msg,
+            "status_chat": status_chat_id,
+            "status_msg": status_message_id,
+            "last_user_id": 0,
+            "sent": 0,
+            "blocked": 0,
+            "failed": 0,
+            "total": await db.total_users(),
+            "created": int(time.time()),
+        }
+        if not await db.create_broadcast(job):
+            return None
+        self._spawn(job)
+        return job["_id"]
+
+    async def resume_pending(self):
+        """Restart ke baad adhure broadcasts ko resume karta hai."""
+        try:
+            for job in await db.get_running_broadcasts():
+                if job["_id"] not in self._tasks:
+                    print(f"🔁 Resuming broadcast {job['_id']} after user {job['last_user_id']}...")
+                    self._spawn(job)
+        except Exception as e:
+            print(f"⚠️ Broadcast resume error: {e}")
+
+    def _spawn(self, job):
+        task = asyncio.create_task(self._run(job))
+        self._tasks[job["_id"]] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job["_id"], None))
+
+    async def stop(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    async def _send(self, user_id, job, client: Client):
+        """Returns 'sent', 'blocked' ya 'failed'."""
+        reserve = Config.LOW_PRIORITY_RESERVE if job.get("priority") == "low" else 0
+        for _ in range(3):
+            await self._bucket(client).acquire(reserve)
+            try:
+                if job.get("text"):
+                    await client.send_message(user_id, job["text"])
+                else:
+                    await client.copy_message(user_id, job["source_chat"], job["source_msg"])
+                self._bucket(client).on_success()
+                return "sent"
+            except FloodWait as e:
+                print(f"⏳ Broadcast FloodWait: {e.value}s")
+                flood_wait(client, "broadcast", e.value)
+                self._bucket(client).on_flood_wait(e.value + 1)
+            except (UserIsBlocked, InputUserDeactivated, UserDeactivated):
+                if client is not self.bot:
+                    # User ne extra bot block kiya/start nahi kiya; main bot se try karo
+                    client = self.bot
+                    continue
+                return "blocked"
+            except PeerIdInvalid:
+                if client is not self.bot:
+                    client = self.bot
+                    continue
+                return "failed"
+            except Exception:
+                return "failed"
+        return "failed"
+
+    async def _run(self, job):
+        # Text jobs main bot se hi jaate hain (extra bots ko users ne start nahi kiya hota)
+        clients = [self.bot] if job.get("text") else self._clients()
+        semaphore = asyncio.Semaphore(Config.BROADCAST_WORKERS)
+        last_status_edit = 0
+        rr = 0
+        user_ids, results, frontier = [], [], 0
+        save_lock = asyncio.Lock()
+        dirty = False
+
+        async def save_progress():
+            nonlocal dirty
+            # Ek waqt mein ek hi write (purana snapshot naye ke baad na likhe); beech ke advances ek hi write mein
+            async with save_lock:
+                if not dirty:
+                    return
+                dirty = False
+                await db.update_broadcast(job["_id"], {k: job[k] for k in ("last_user_id", "sent", "blocked", "failed")})
+
+        async def worker(i, client):
+            nonlocal frontier, dirty
+            async with semaphore:
+                result = await self._send(user_ids[i], job, client)
+            results[i] = result
+            BROADCAST_MESSAGES.labels(result).inc()
+            if result == "blocked":
+                db.set_user_blocked(user_ids[i])
+            # Checkpoint sirf shuru se lagataar poore hue sends tak (aage wale restart par dobara jaayenge, isliye gine bhi nahi)
+            advanced = False
+            while frontier < len(results) and results[frontier] is not None:
+                job[results[frontier]] += 1
+                job["last_user_id"] = user_ids[frontier]
+                frontier += 1
+                advanced = True
+            if advanced:
+                dirty = True
+                await save_progress()
+
+        try:
+            while True:
+                user_ids = await db.get_broadcast_targets(job["last_user_id"], Config.BROADCAST_BATCH)
+                if not user_ids:
+                    break
+                results, frontier = [None] * len(user_ids), 0
+                tasks = []
+                for i in range(len(user_ids)):
+                    tasks.append(worker(i, clients[rr % len(clients)]))
+                    rr += 1
+                await asyncio.gather(*tasks)
+
+                if time.time() - last_status_edit >= Config.BROADCAST_STATUS_INTERVAL:
+                    last_status_edit = time.time()
+                    await self._edit_status(job, done=False)
+
+            job["status"] = "done"
+            await db.update_broadcast(job["_id"], {"status": "done", "finished": int(time.time())})
+            await self._edit_status(job, done=True)
+            print(f"✅ Broadcast {job['_id']} complete: sent={job['sent']} blocked={job['blocked']} failed={job['failed']}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Broadcast {job['_id']} error (will resume on restart): {e}")
+
+    async def _edit_status(self, job, done: bool):
+        if not job.get("status_chat") or not job.get("status_msg"):
+            return
+        processed = job["sent"] + job["blocked"] + job["failed"]
+        if done:
+            text = (
+                f"✅ **BROADCAST COMPLETED**\n\n"
+                f"👥 Total Users: `{job['total']}`\n"
+                f"✅ Success: `{job['sent']}`\n"
+                f"🚫 Blocked/Deleted: `{job['blocked']}`\n"
+                f"⚠️ Failed: `{job['failed']}`"
+            )
+        else:
+            text = (
+                f"🚀 **Broadcasting...**\n\n"
+                f"✅ Sent: `{job['sent']}`\n"
+                f"🚫 Blocked/Deleted: `{job['blocked']}`\n"
+                f"⚠️ Errors: `{job['failed']}`\n\n"
+                f"⏳ Progress: `{processed}/{job['total']}`"
+            )
+        try:
+            await self.bot.edit_message_text(job["status_chat"], job["status_msg"], text)
+        except Exception:
+            pass
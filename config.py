@@ -18,6 +18,7 @@ class Config:
     else: STORAGE_CHANNEL = 0
     
     BASE_URL = os.environ.get("BASE_URL", "").rstrip('/')
+    # mongodb+srv://... (MongoDB Atlas) ya sqlite:///database.db (embedded, single-node)
     DATABASE_URL = os.environ.get("DATABASE_URL", "")
     REDIRECT_BLOGGER_URL = os.environ.get("REDIRECT_BLOGGER_URL", "")
     BLOGGER_PAGE_URL = os.environ.get("BLOGGER_PAGE_URL", "")
@@ -30,5 +31,124 @@ class Config:
         except ValueError: FORCE_SUB_CHANNEL = _fsub_channel_str
     else: FORCE_SUB_CHANNEL = 0
         
+    # Write-behind buffer: user activity/usage updates itne second ya itne users ke baad flush honge
+    USER_FLUSH_INTERVAL = float(os.environ.get("USER_FLUSH_INTERVAL", 5))
+    USER_FLUSH_SIZE = int(os.environ.get("USER_FLUSH_SIZE", 200))
+    # Fail hote flush par backoff; ek user ke updates itni baar retry ke baad chhod diye jaate hain
+    USER_FLUSH_RETRIES = int(os.environ.get("USER_FLUSH_RETRIES", 5))
+
+    # Ban list memory mein rehti hai; dusre instances ke changes itne second mein sync hote hain
+    BAN_REFRESH_INTERVAL = float(os.environ.get("BAN_REFRESH_INTERVAL", 60))
+    BAN_POLL_INTERVAL = float(os.environ.get("BAN_POLL_INTERVAL", 2))
+
+    # Expired links ka sweep aur counters ka reconciliation (seconds)
+    EXPIRY_SWEEP_INTERVAL = float(os.environ.get("EXPIRY_SWEEP_INTERVAL", 300))
+    COUNTER_RECONCILE_INTERVAL = float(os.environ.get("COUNTER_RECONCILE_INTERVAL", 6 * 3600))
+
+    # Download analytics: memory mein aggregate, itne second par flush, hourly buckets
+    ANALYTICS_FLUSH_INTERVAL = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 30))
+    ANALYTICS_BUCKET_SECONDS = int(os.environ.get("ANALYTICS_BUCKET_SECONDS", 3600))
+    ANALYTICS_RETENTION_DAYS = int(os.environ.get("ANALYTICS_RETENTION_DAYS", 90))
+
+    # Broadcast engine: per-bot msgs/sec, concurrent senders, users per page (progress checkpoint)
+    BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", 25))
+    BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", 20))
+    BROADCAST_BATCH = int(os.environ.get("BROADCAST_BATCH", 200))
+    BROADCAST_STATUS_INTERVAL = float(os.environ.get("BROADCAST_STATUS_INTERVAL", 5))
+    # FloodWait par rate aadha (min itna), har success par itna wapas badhta hai
+    BROADCAST_MIN_RATE = float(os.environ.get("BROADCAST_MIN_RATE", 1))
+    BROADCAST_RATE_RECOVERY = float(os.environ.get("BROADCAST_RATE_RECOVERY", 0.05))
+    # Low-priority jobs (startup announcement) itne tokens interactive replies ke liye chhod dete hain
+    LOW_PRIORITY_RESERVE = float(os.environ.get("LOW_PRIORITY_RESERVE", 10))
+    # Startup announcement har deploy par sirf ek baar (restarts par dobara nahi)
+    DEPLOY_ID = os.environ.get("DEPLOY_ID") or os.environ.get("RENDER_GIT_COMMIT", "")
+    # MULTI_TOKEN bots se bhi bhejo (sirf tab useful jab users ne un bots ko bhi start kiya ho)
+    BROADCAST_MULTI_CLIENT = os.environ.get("BROADCAST_MULTI_CLIENT", "false").lower() in ("1", "true", "yes")
+
+    # Startup: critical steps ka total budget aur har step ka timeout (seconds)
+    STARTUP_BUDGET = float(os.environ.get("STARTUP_BUDGET", 45))
+    STARTUP_STEP_TIMEOUT = float(os.environ.get("STARTUP_STEP_TIMEOUT", 30))
+
+    # Pyrogram session files (auth keys, peers, media-DC keys) yahan persist hote hain
+    SESSION_DIR = os.environ.get("SESSION_DIR", ".")
+    os.makedirs(SESSION_DIR, exist_ok=True)
+
+    # Force-sub membership cache: member ka result lamba, non-member ka chhota (join ke baad Refresh jaldi chale)
+    FSUB_MEMBER_TTL = int(os.environ.get("FSUB_MEMBER_TTL", 6 * 3600))
+    FSUB_NONMEMBER_TTL = int(os.environ.get("FSUB_NONMEMBER_TTL", 15))
+    FSUB_INVITE_TTL = int(os.environ.get("FSUB_INVITE_TTL", 6 * 3600))
+    FSUB_CACHE_SIZE = int(os.environ.get("FSUB_CACHE_SIZE", 100000))
+
+    # Upload ingestion queue: workers flood budget ke hisaab se, ek user ke parallel uploads capped
+    INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 4))
+    INGEST_USER_CONCURRENCY = int(os.environ.get("INGEST_USER_CONCURRENCY", 2))
+    INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 500))
+    # Album / burst batching: itne seconds tak aayi files ek batch (max INGEST_BATCH_MAX) mein jaati hain
+    INGEST_BATCH_WINDOW = float(os.environ.get("INGEST_BATCH_WINDOW", 1.0))
+    INGEST_BATCH_MAX = int(os.environ.get("INGEST_BATCH_MAX", 10))
+    INGEST_COPY_CONCURRENCY = int(os.environ.get("INGEST_COPY_CONCURRENCY", 3))
+
+    # Content dedup: same file (file_unique_id) dobara aaye toh purana storage message reuse (refcounted).
+    # STORAGE_PURGE: jis storage message ka koi active link na bache use channel se delete karo (default off, opt-in).
+    CONTENT_DEDUP = os.environ.get("CONTENT_DEDUP", "true").lower() in ("1", "true", "yes")
+    STORAGE_PURGE = os.environ.get("STORAGE_PURGE", "false").lower() in ("1", "true", "yes")
+
+    # Storage message resolver: itne ms tak ke lookups ek get_messages call (max 200 ids) mein, results thodi der cache
+    RESOLVER_WINDOW_MS = int(os.environ.get("RESOLVER_WINDOW_MS", 5))
+    RESOLVER_BATCH_MAX = int(os.environ.get("RESOLVER_BATCH_MAX", 200))
+    RESOLVER_CACHE_TTL = int(os.environ.get("RESOLVER_CACHE_TTL", 60))
+    RESOLVER_CACHE_SIZE = int(os.environ.get("RESOLVER_CACHE_SIZE", 5000))
+
+    # Show/embed pages ka rendered (aur compressed) HTML itne seconds tak cache rehta hai
+    PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", 60))
+    PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", 2000))
+
+    # /api/file: serialized JSON process mein itni der cache; browsers/edges ke liye max-age (link expiry se zyada kabhi nahi)
+    FILE_API_CACHE_TTL = int(os.environ.get("FILE_API_CACHE_TTL", 600))
+    FILE_API_CACHE_SIZE = int(os.environ.get("FILE_API_CACHE_SIZE", 5000))
+    FILE_API_MAX_AGE = int(os.environ.get("FILE_API_MAX_AGE", 3600))
+
+    # Signed download URLs (/s/...): stream bina DB read ke. Secret na diya ho toh BOT_TOKEN se derive hota hai.
+    # Permanent links ke tokens SIGNED_URL_TTL se 2*SIGNED_URL_TTL seconds tak valid rehte hain.
+    # /revoke ki denylist DB mein persist hoti hai aur har BAN_REFRESH_INTERVAL par reload hoti hai (restart / workers).
+    SIGNED_URLS = os.environ.get("SIGNED_URLS", "true").lower() in ("1", "true", "yes")
+    LINK_SIGNING_SECRET = os.environ.get("LINK_SIGNING_SECRET", "")
+    SIGNED_URL_TTL = int(os.environ.get("SIGNED_URL_TTL", 86400))
+
+    # Edge cache tier (nginx/Varnish) ka base URL jo /c/ chunks cache karta hai, e.g. "http://127.0.0.1:8081".
+    # Yeh tier sirf app ke liye hai (loopback / private network), kabhi public nahi: cached chunks link expiry/revoke nahi dekhte.
+    # Set ho toh /dl aur /s ke streams Telegram ki jagah in cached chunks se compose hote hain (deploy/nginx-chunk-cache.conf)
+    CHUNK_ORIGIN = os.environ.get("CHUNK_ORIGIN", "")
+    # Current chunk ke saath itne agle /c/ chunks parallel fetch hote hain (min 1)
+    CHUNK_PREFETCH = int(os.environ.get("CHUNK_PREFETCH", 2))
+
+    # Hot file cache: sabse zyada stream hone wali top-K files local disk par, wahan se FileResponse / X-Accel-Redirect.
+    # HOT_ACCEL_PREFIX set ho (e.g. "/_hot/") toh nginx file serve karta hai (deploy/nginx-chunk-cache.conf dekho)
+    HOT_CACHE = os.environ.get("HOT_CACHE", "false").lower() in ("1", "true", "yes")
+    HOT_CACHE_DIR = os.environ.get("HOT_CACHE_DIR", "hot_cache")
+    HOT_TOP_K = int(os.environ.get("HOT_TOP_K", 20))
+    HOT_MIN_HITS = int(os.environ.get("HOT_MIN_HITS", 200))
+    HOT_CACHE_INTERVAL = int(os.environ.get("HOT_CACHE_INTERVAL", 120))
+    HOT_CACHE_MAX_BYTES = int(os.environ.get("HOT_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+    HOT_MAX_FILE_SIZE = int(os.environ.get("HOT_MAX_FILE_SIZE", 4 * 1024 ** 3))
+    HOT_ACCEL_PREFIX = os.environ.get("HOT_ACCEL_PREFIX", "")
+
+    # Dashboard ZIP download: ek archive mein max files, aur kitne 1 MiB chunks aage tak prefetch hon
+    ZIP_MAX_FILES = int(os.environ.get("ZIP_MAX_FILES", 100))
+    ZIP_PREFETCH_CHUNKS = int(os.environ.get("ZIP_PREFETCH_CHUNKS", 4))
+
+    # Dashboard ek baar mein itne links dikhata hai (search / load more /api/search se)
+    DASHBOARD_PAGE_SIZE = int(os.environ.get("DASHBOARD_PAGE_SIZE", 30))
+
+    # /metrics (Prometheus) ke liye bearer token; khaali ho toh endpoint band (404).
+    # Bina token ke kholna ho (private network / sidecar scrape) toh METRICS_PUBLIC=true
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "false").lower() in ("1", "true", "yes")
+
+    # /dl, /api/file, /show, /dashboard par Server-Timing header; isse dheemi requests ki timeline sampled log hoti hai
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+    SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", 1000))
+    SLOW_REQUEST_SAMPLE_RATE = float(os.environ.get("SLOW_REQUEST_SAMPLE_RATE", 0.1))
+
     # Yeh bot ka username store karega (code isse automatic set karega)
     BOT_USERNAME = ""
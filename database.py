@@ -1,38 +1,251 @@
 import motor.motor_asyncio
+import asyncio
+import re
+import secrets
 import time
 import datetime
+from abc import ABC, abstractmethod
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError, OperationFailure
 from config import Config
+from metrics import DB_SECONDS, time_methods
+
+# Whitespace, ASCII punctuation aur general punctuation (– • “ ” etc.)
+_TOKEN_SEPARATORS = re.compile(r"[\s!-/:-@\[-`{-~\u2000-\u206f\u3000-\u303f]+")
+
+# Name sort case-insensitive (dashboard jaisa)
+_NAME_COLLATION = {"locale": "en", "strength": 2}
+# Standalone mongod / purana server: change streams kabhi nahi chalenge
+_CHANGE_STREAM_UNSUPPORTED = (40573, 40324)
+
+class BaseDatabase(ABC):
+    """
+    Storage backend interface. App sirf isi interface ko use karta hai,
+    backend (MongoDB / SQLite) DATABASE_URL se choose hota hai.
+    """
+    backend_name = "Unknown"
 
-class Database:
     def __init__(self):
-        self._client = None
-        self.db = None
-        self.col = None
+        # Write-behind buffer: {user_id: {field: value}}
+        # last_active / daily_count jaise chhote updates yahan jama hote hain aur ek bulk_write mein flush hote hain
+        self._user_updates = {}
+        # Likhe ja rahe batches (purane pehle); overlay inhe bhi dekhta hai taaki write ke dauran reads stale na hon
+        self._user_updates_inflight = []
+        self._flush_task = None
+        # Loop aur threshold flush ek saath nahi chalte
+        self._flush_lock = asyncio.Lock()
+        # Fail hote flush: {user_id: attempts}, lagataar failures aur agla retry (backoff)
+        self._flush_attempts = {}
+        self._flush_failures = 0
+        self._flush_retry_at = 0.0
+        self._background_tasks = []
+        # Ban list chhoti hai aur kam badalti hai, isliye poori memory mein rehti hai
+        self._banned_ids = set()
+
+    # --- BACKEND METHODS (har backend implement karta hai; adhoora backend instantiate hi nahi hota) ---
 
+    # Connection
+
+    @abstractmethod
     async def connect(self):
-        print(f"Connecting to MongoDB...")
-        self._client = motor.motor_asyncio.AsyncIOMotorClient(Config.DATABASE_URL)
-        self.db = self._client["UnivoraStreamDrop"]
-        self.col = self.db.links
-        
-        # Create indexes for faster queries (Performance Optimization)
-        try:
-            await self.col.create_index("user_id")
-            await self.col.create_index("timestamp")
-            await self.col.create_index([("user_id", 1), ("timestamp", -1)])
-            await self.db.users.create_index("_id")
-            print("✅ Database indexes created/verified.")
-        except Exception as e:
-            print(f"⚠️ Index creation warning: {e}")
-        
-        print("✅ Database connection established (MongoDB).")
+        """Connection kholo aur background loops (_start_background_tasks) shuru karo."""
+
+    async def ensure_indexes(self):
+        """Indexes / backfills; startup ke critical path se bahar chalta hai. Default: kuch nahi."""
+
+    @abstractmethod
+    async def _close(self):
+        """Connection band karo (disconnect() buffer flush ke baad bulata hai)."""
+
+    # Users
+
+    @abstractmethod
+    async def _write_user_updates(self, batch: dict):
+        """Write-behind batch {user_id: {field: value}} ek bulk write mein (naye users upsert)."""
+
+    @abstractmethod
+    async def get_user_data(self, user_id):
+        """User doc (na ho toh default free user banakar), pending updates overlay ke saath."""
+
+    @abstractmethod
+    async def get_users_data(self, user_ids: list):
+        """Kai users ke docs ek query mein: {user_id: doc}."""
+
+    @abstractmethod
+    async def set_user_plan(self, user_id, plan_name, expiry_date: datetime.datetime):
+        """Plan aur uski expiry set karo."""
+
+    @abstractmethod
+    async def get_all_users(self):
+        """Saare users ke {"_id"} docs."""
+
+    # Links
+
+    @abstractmethod
+    async def save_link(
+        self,
+        unique_id,
+        message_id,
+        backups: dict,
+        file_name: str = "Unknown",
+        file_size: str = "Unknown",
+        user_id: int = 0,
+        expiry_date: datetime.datetime = None,
+        file_size_bytes: int = 0,
+        file_unique_id: str = None,
+    ):
+        """Ek link upsert; counters sirf naye link par badhte hain."""
+
+    @abstractmethod
+    async def save_links(self, links: list):
+        """Album / burst ke links (save_link ke kwargs ki list) ek write mein."""
+
+    @abstractmethod
+    async def _find_link(self, unique_id):
+        """Raw link doc ya None (expiry check get_link_full karta hai)."""
+
+    @abstractmethod
+    async def get_user_links(self, user_id, limit=20):
+        """User ke naye se purane links."""
+
+    @abstractmethod
+    async def get_user_active_links(self, user_id, limit=5):
+        """User ke abhi valid (expire na hue) links, naye pehle."""
+
+    @abstractmethod
+    async def get_all_user_active_links(self, user_id):
+        """User ke saare valid links (dashboard)."""
+
+    @abstractmethod
+    async def get_user_links_by_ids(self, user_id, ids: list):
+        """User ke diye gaye _ids wale valid links (zip bundle), order ki guarantee nahi."""
+
+    @abstractmethod
+    async def search_user_links(self, user_id, query: str = "", sort: str = "newest", skip: int = 0, limit: int = 30):
+        """Valid links, name token prefix match, sort: newest / oldest / name_asc / name_desc, _id tie-breaker."""
+
+    @abstractmethod
+    async def get_all_links(self):
+        """Sabse naye links (max 100)."""
+
+    @abstractmethod
+    async def delete_link(self, unique_id):
+        """Link hatao; counters aur content refcount bhi ghatte hain."""
+
+    @abstractmethod
+    async def expire_links(self):
+        """Expiry nikal chuke links ko expired mark karo; kitne hue woh return."""
+
+    # Counters
+
+    @abstractmethod
+    async def _get_counter_doc(self, key):
+        """"global" ya "user:<id>" counter doc, ya None."""
+
+    @abstractmethod
+    async def reconcile_counters(self):
+        """Counters aur content refcounts links se dobara calculate karo (drift fix)."""
+
+    # Bans
+
+    @abstractmethod
+    async def _insert_ban(self, user_id, reason):
+        """Ban row upsert."""
+
+    @abstractmethod
+    async def _delete_ban(self, user_id):
+        """Ban row hatao."""
+
+    @abstractmethod
+    async def _load_banned_ids(self):
+        """Saare banned user ids."""
+
+    # Signed URL revocations
+
+    @abstractmethod
+    async def add_revocation(self, unique_id, until: int):
+        """Revoke kiye link ka deny_until (unix) persist karo, taaki restart ke baad bhi signed URLs block rahein."""
+
+    @abstractmethod
+    async def get_revocations(self):
+        """Abhi tak active revocations {unique_id: deny_until}."""
+
+    # Download analytics
+
+    @abstractmethod
+    async def record_download_stats(self, rows: list):
+        """Aggregated rows {unique_id, owner, bucket, hits, bytes, viewers} hourly buckets mein jodo."""
+
+    @abstractmethod
+    async def get_hot_files(self, since: int, limit: int = 10):
+        """`since` ke baad sabse zyada hits wale links."""
+
+    @abstractmethod
+    async def get_owner_download_stats(self, owner: int, since: int):
+        """Owner ke links ke totals {"hits", "bytes", "viewers"}."""
+
+    # Broadcasts
+
+    @abstractmethod
+    async def get_broadcast_targets(self, after_user_id: int, limit: int):
+        """after_user_id ke baad ke (block na kiye) user ids, ascending."""
+
+    @abstractmethod
+    async def create_broadcast(self, job: dict):
+        """Naya job insert (_id = idempotency key): True, pehle se ho toh False."""
+
+    @abstractmethod
+    async def update_broadcast(self, broadcast_id, fields: dict):
+        """Job ki progress / status update."""
+
+    @abstractmethod
+    async def get_running_broadcasts(self):
+        """Restart par resume karne wale jobs."""
+
+    # Content index (file_unique_id -> storage message, refcounted)
+
+    @abstractmethod
+    async def claim_contents(self, counts: dict):
+        """{file_unique_id: n} ke refs badhao; jo mile (purge mein na hon) unka {file_unique_id: msg_id}."""
+
+    @abstractmethod
+    async def add_content(self, file_unique_id, message_id, file_size_bytes: int = 0):
+        """Naya content (refs=1) register; pehle se ho toh use claim karke uska msg_id."""
+
+    @abstractmethod
+    async def release_contents(self, counts: dict):
+        """Claim kiye refs wapas (save fail hua)."""
+
+    @abstractmethod
+    async def pop_orphan_contents(self, limit: int = 100):
+        """refs <= 0 wale contents purge ke liye mark karo, unke msg_ids."""
+
+    @abstractmethod
+    async def confirm_orphan_purge(self, msg_ids: list):
+        """Messages delete ho gaye: marked entries hatao."""
+
+    # --- SHARED LOGIC ---
 
     async def disconnect(self):
-        if self._client:
-            self._client.close()
+        for task in self._background_tasks:
+            task.cancel()
+        self._background_tasks = []
+        # Shutdown se pehle buffer mein pade updates likh do
+        await self.flush_user_updates()
+        await self._close()
+
+    async def _start_background_tasks(self):
+        await self.reload_banned()
+        self._background_tasks = [
+            asyncio.create_task(self._user_flush_loop()),
+            asyncio.create_task(self._watch_bans()),
+            asyncio.create_task(self._expiry_sweep_loop()),
+            asyncio.create_task(self._reconcile_loop()),
+        ]
 
-    async def save_link(self, unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown", user_id: int = 0, expiry_date: datetime.datetime = None):
-        data = {
+    @staticmethod
+    def _new_link_doc(unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown", user_id: int = 0, expiry_date: datetime.datetime = None, file_size_bytes: int = 0, file_unique_id: str = None):
+        return {
             "_id": unique_id,
             "msg_id": int(message_id),
             "backups": backups,
@@ -41,70 +254,340 @@ class Database:
             "user_id": user_id,
             "timestamp": int(time.time()),
             "date_str": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "expiry_date": expiry_date # New Field
+            "expiry_date": expiry_date, # New Field
+            "file_size_bytes": int(file_size_bytes or 0),
+            "file_unique_id": file_unique_id,
+            "name_tokens": BaseDatabase._name_tokens(file_name),
+            "expired": False
         }
-        await self.col.update_one({"_id": unique_id}, {"$set": data}, upsert=True)
-        # Also track user
-        if user_id:
-            await self.db.users.update_one({"_id": user_id}, {"$set": {"last_active": int(time.time())}}, upsert=True)
-        print(f"DEBUG DB: Saved {unique_id} to MongoDB.")
+
+    @staticmethod
+    def _name_tokens(file_name):
+        """
+        Filename search ke liye normalized tokens: lowercase, whitespace/punctuation par split ("My.Movie_2024.mkv" -> my, movie, 2024, mkv).
+        `\\w` par match nahi karte kyunki Devanagari ki matras `\\w` mein nahi aatin ("बाहुबली" toot jaata).
+        """
+        return list(dict.fromkeys(t for t in _TOKEN_SEPARATORS.split((file_name or "").lower()) if t))[:32]
+
+    @staticmethod
+    def _new_user_doc(user_id):
+        return {
+            "_id": user_id,
+            "plan": "free",
+            "plan_expiry": None,
+            "daily_count": 0,
+            "last_usage_date": datetime.date.today().isoformat()
+        }
+
+    @staticmethod
+    def _is_expired(link):
+        expiry = link.get("expiry_date")
+        return bool(expiry and expiry < datetime.datetime.now())
 
     async def get_link(self, unique_id):
-        link = await self.col.find_one({"_id": unique_id})
+        link = await self.get_link_full(unique_id)
         if link:
-            # Check Expiry
-            expiry = link.get("expiry_date")
-            if expiry and expiry < datetime.datetime.now():
-                # Link Expired
-                # Optional: Delete it? No, keep for now, just deny access. Or delete to save space?
-                # User said "link 24hr ke baad expire ho jayega". Usually implies it stops working.
-                # Let's return None to simulate 404.
-                return None, None
             return link["msg_id"], link.get("backups", {})
         return None, None
 
     async def get_link_full(self, unique_id):
-        link = await self.col.find_one({"_id": unique_id})
+        link = await self._find_link(unique_id)
         if link:
             # Check Expiry
-            expiry = link.get("expiry_date")
-            if expiry and expiry < datetime.datetime.now():
+            # User said "link 24hr ke baad expire ho jayega". Usually implies it stops working.
+            # Expired link ko None return karte hain (404 simulate).
+            if self._is_expired(link):
                 return None
             return link
         return None
 
-    # --- SUBSCRIPTION METHODS ---
-
-    async def get_user_data(self, user_id):
-        user = await self.db.users.find_one({"_id": user_id})
-        if not user:
-            # Create default free user
-            user = {
-                "_id": user_id,
-                "plan": "free",
-                "plan_expiry": None,
-                "daily_count": 0,
-                "last_usage_date": datetime.date.today().isoformat()
-            }
-            await self.db.users.insert_one(user)
-        return user
-
     async def update_user_usage(self, user_id, daily_count: int = None, date_str: str = None):
         update_data = {}
         if daily_count is not None:
             update_data["daily_count"] = daily_count
         if date_str is not None:
             update_data["last_usage_date"] = date_str
-            
+
         if update_data:
-            await self.db.users.update_one({"_id": user_id}, {"$set": update_data})
+            self._buffer_user_update(user_id, update_data)
+
+    # --- COUNTERS (O(1) STATS) ---
+    # Global aur per-user totals save_link / delete_link / expiry sweep ke saath update hote hain,
+    # isliye /stats aur /mydata ko poori collection count nahi karni padti.
+
+    async def get_counters(self, user_id=None):
+        key = f"user:{user_id}" if user_id is not None else "global"
+        doc = await self._get_counter_doc(key) or {}
+        return {
+            "links": doc.get("links", 0),
+            "bytes": doc.get("bytes", 0),
+            "active_links": doc.get("active_links", 0),
+            "users": doc.get("users", 0),
+        }
+
+    async def count_links(self):
+        return (await self.get_counters())["links"]
+
+    async def get_user_total_links(self, user_id):
+        return (await self.get_counters(user_id))["links"]
+
+    async def total_users(self):
+        return (await self.get_counters())["users"]
+
+    async def _expiry_sweep_loop(self):
+        while True:
+            try:
+                expired = await self.expire_links()
+                if expired:
+                    print(f"🧹 Expiry sweep: {expired} links expired.")
+            except Exception as e:
+                print(f"⚠️ Expiry sweep error: {e}")
+            await asyncio.sleep(Config.EXPIRY_SWEEP_INTERVAL)
+
+    async def _reconcile_loop(self):
+        # Pehli baar (counters abhi bane hi nahi) turant reconcile, warna interval ke baad
+        if await self._get_counter_doc("global") is not None:
+            await asyncio.sleep(Config.COUNTER_RECONCILE_INTERVAL)
+        while True:
+            try:
+                started = time.time()
+                await self.reconcile_counters()
+                print(f"✅ Counters reconciled in {time.time() - started:.1f}s.")
+            except Exception as e:
+                print(f"⚠️ Counter reconciliation error: {e}")
+            await asyncio.sleep(Config.COUNTER_RECONCILE_INTERVAL)
+
+    def set_user_blocked(self, user_id, blocked: bool = True):
+        """Bot block karne wale users ko mark karta hai taaki agle broadcasts unhe skip karein (write-behind)."""
+        self._buffer_user_update(user_id, {"blocked": blocked})
+
+    # --- BAN LIST (IN-MEMORY) ---
+
+    async def ban_user(self, user_id, reason="Admin Ban"):
+        await self._insert_ban(user_id, reason)
+        self._banned_ids.add(user_id)
+
+    async def unban_user(self, user_id):
+        await self._delete_ban(user_id)
+        self._banned_ids.discard(user_id)
+
+    async def is_banned(self, user_id):
+        # No DB round trip: set ko startup par load kiya jaata hai aur change notifications se fresh rakha jaata hai
+        return user_id in self._banned_ids
+
+    async def reload_banned(self):
+        self._banned_ids = set(await self._load_banned_ids())
+        print(f"✅ Ban list loaded ({len(self._banned_ids)} users).")
+
+    async def _watch_bans(self):
+        """Fallback invalidation: ban list ko periodically reload karta hai (dusre instances ke changes ke liye)."""
+        while True:
+            await asyncio.sleep(Config.BAN_REFRESH_INTERVAL)
+            try:
+                self._banned_ids = set(await self._load_banned_ids())
+            except Exception as e:
+                print(f"⚠️ Ban list refresh failed: {e}")
+
+    # --- WRITE-BEHIND BUFFER (USER ACTIVITY & USAGE) ---
+
+    def _buffer_user_update(self, user_id, fields: dict):
+        """Queues a $set on the user's document; same-user updates are coalesced in memory."""
+        self._user_updates.setdefault(user_id, {}).update(fields)
+        if (len(self._user_updates) >= Config.USER_FLUSH_SIZE and (self._flush_task is None or self._flush_task.done())
+                and time.monotonic() >= self._flush_retry_at):
+            self._flush_task = asyncio.create_task(self.flush_user_updates())
+
+    def _overlay_user_updates(self, user):
+        """Applies not-yet-flushed updates on top of a user document (read-your-writes)."""
+        user_id = user["_id"]
+        for pending in (*self._user_updates_inflight, self._user_updates):
+            if user_id in pending:
+                user.update(pending[user_id])
+        return user
+
+    async def flush_user_updates(self):
+        async with self._flush_lock:
+            if not self._user_updates:
+                return
+            batch, self._user_updates = self._user_updates, {}
+            self._user_updates_inflight.append(batch)
+            try:
+                await self._write_user_updates(batch)
+                self._flush_failures = 0
+                for uid in batch:
+                    self._flush_attempts.pop(uid, None)
+            except Exception as e:
+                self._flush_failures += 1
+                delay = min(Config.USER_FLUSH_INTERVAL * 2 ** self._flush_failures, 300)
+                self._flush_retry_at = time.monotonic() + delay
+                print(f"⚠️ User update flush failed ({len(batch)} users), retrying in {delay:.0f}s: {e}")
+                # Naye updates ko overwrite kiye bina batch wapas buffer mein daal do (har user ke max USER_FLUSH_RETRIES)
+                dropped = 0
+                for uid, fields in batch.items():
+                    attempts = self._flush_attempts.get(uid, 0) + 1
+                    if attempts > Config.USER_FLUSH_RETRIES:
+                        self._flush_attempts.pop(uid, None)
+                        dropped += 1
+                        continue
+                    self._flush_attempts[uid] = attempts
+                    self._user_updates[uid] = {**fields, **self._user_updates.get(uid, {})}
+                if dropped:
+                    print(f"⚠️ Dropped buffered updates of {dropped} users after {Config.USER_FLUSH_RETRIES} retries.")
+            finally:
+                self._user_updates_inflight = [b for b in self._user_updates_inflight if b is not batch]
+
+    async def _user_flush_loop(self):
+        while True:
+            await asyncio.sleep(Config.USER_FLUSH_INTERVAL)
+            if time.monotonic() < self._flush_retry_at:
+                continue
+            try:
+                await self.flush_user_updates()
+            except Exception as e:
+                print(f"⚠️ User flush loop error: {e}")
+
+
+class Database(BaseDatabase):
+    """MongoDB (Motor) backend."""
+    backend_name = "MongoDB Atlas"
+
+    def __init__(self, url: str = None):
+        super().__init__()
+        self._url = url or Config.DATABASE_URL
+        self._client = None
+        self.db = None
+        self.col = None
+
+    async def connect(self):
+        print(f"Connecting to MongoDB...")
+        self._client = motor.motor_asyncio.AsyncIOMotorClient(self._url)
+        self.db = self._client["UnivoraStreamDrop"]
+        self.col = self.db.links
+        await self._start_background_tasks()
+        print("✅ Database connection established (MongoDB).")
+
+    async def ensure_indexes(self):
+        # Create indexes for faster queries (Performance Optimization)
+        # Startup ke critical path se bahar, background step mein chalta hai
+        try:
+            await self.col.create_index("user_id")
+            await self.col.create_index("timestamp")
+            await self.col.create_index([("user_id", 1), ("timestamp", -1)])
+            await self.col.create_index([("expired", 1), ("expiry_date", 1)])
+            await self.db.users.create_index("_id")
+            await self.db.contents.create_index("refs")
+            await self.col.create_index("file_unique_id", sparse=True)
+            await self.col.create_index([("user_id", 1), ("name_tokens", 1)])
+            await self.col.create_index([("user_id", 1), ("file_name", 1)], collation=_NAME_COLLATION)
+            await self._backfill_name_tokens()
+            await self.db.download_stats.create_index([("bucket", 1), ("hits", -1)])
+            await self.db.download_stats.create_index([("owner", 1), ("bucket", 1)])
+            await self.db.download_stats.create_index("bucket", name="bucket_ttl", expireAfterSeconds=Config.ANALYTICS_RETENTION_DAYS * 86400)
+            await self.db.download_viewers.create_index([("unique_id", 1), ("bucket", 1)])
+            await self.db.download_viewers.create_index([("owner", 1), ("bucket", 1)])
+            await self.db.download_viewers.create_index("bucket", name="bucket_ttl", expireAfterSeconds=Config.ANALYTICS_RETENTION_DAYS * 86400)
+            # Revocations deny_until ke baad khud hat jaati hain (tab tak ke saare tokens expire ho chuke)
+            await self.db.revocations.create_index("until", expireAfterSeconds=0)
+            print("✅ Database indexes created/verified.")
+        except Exception as e:
+            print(f"⚠️ Index creation warning: {e}")
+
+    async def _close(self):
+        if self._client:
+            self._client.close()
+
+    async def _write_user_updates(self, batch: dict):
+        ops = [UpdateOne({"_id": uid}, {"$set": fields}, upsert=True) for uid, fields in batch.items()]
+        result = await self.db.users.bulk_write(ops, ordered=False)
+        if result.upserted_count:
+            await self._inc_counters(None, users=result.upserted_count)
+
+    async def _inc_counters(self, user_id, links=0, size=0, active=0, users=0):
+        # v: har $inc par badhta hai; reconcile_counters isse concurrent updates pehchaanta hai
+        inc = {"links": links, "bytes": size, "active_links": active, "v": 1}
+        ops = [UpdateOne({"_id": "global"}, {"$inc": {**inc, "users": users}}, upsert=True)]
+        if user_id and (links or size or active):
+            ops.append(UpdateOne({"_id": f"user:{user_id}"}, {"$inc": inc}, upsert=True))
+        await self.db.counters.bulk_write(ops, ordered=False)
+
+    async def _get_counter_doc(self, key):
+        return await self.db.counters.find_one({"_id": key})
+
+    async def save_link(self, unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown", user_id: int = 0, expiry_date: datetime.datetime = None, file_size_bytes: int = 0, file_unique_id: str = None):
+        data = self._new_link_doc(unique_id, message_id, backups, file_name, file_size, user_id, expiry_date, file_size_bytes, file_unique_id)
+        result = await self.col.update_one({"_id": unique_id}, {"$set": data}, upsert=True)
+        if result.upserted_id is not None:
+            await self._inc_counters(user_id, links=1, size=data["file_size_bytes"], active=1)
+        # Also track user (write-behind, flushed in batches)
+        if user_id:
+            self._buffer_user_update(user_id, {"last_active": int(time.time())})
+        print(f"DEBUG DB: Saved {unique_id} to MongoDB.")
+
+    async def save_links(self, links: list):
+        """Album/burst ke saare links ek insert_many mein; counters bhi ek hi baar."""
+        docs = [self._new_link_doc(**link) for link in links]
+        if not docs:
+            return
+        try:
+            await self.col.insert_many(docs, ordered=False)
+            inserted = docs
+        except BulkWriteError as e:
+            # Duplicate _id (bahut rare) skip; baaki insert ho chuke hain
+            failed = {err["index"] for err in e.details.get("writeErrors", [])}
+            inserted = [d for i, d in enumerate(docs) if i not in failed]
+        per_user = {}
+        for d in inserted:
+            n, size = per_user.get(d["user_id"], (0, 0))
+            per_user[d["user_id"]] = (n + 1, size + d["file_size_bytes"])
+        for user_id, (n, size) in per_user.items():
+            await self._inc_counters(user_id, links=n, size=size, active=n)
+            if user_id:
+                self._buffer_user_update(user_id, {"last_active": int(time.time())})
+        print(f"DEBUG DB: Saved {len(inserted)} links to MongoDB.")
+
+    async def _find_link(self, unique_id):
+        return await self.col.find_one({"_id": unique_id})
+
+    # --- SUBSCRIPTION METHODS ---
+
+    async def get_user_data(self, user_id):
+        user = await self.db.users.find_one({"_id": user_id})
+        if not user:
+            # Create default free user
+            user = self._new_user_doc(user_id)
+            try:
+                await self.db.users.insert_one(user)
+                await self._inc_counters(None, users=1)
+            except DuplicateKeyError:
+                # Kisi parallel upsert ne user pehle hi bana diya
+                user = await self.db.users.find_one({"_id": user_id}) or user
+        return self._overlay_user_updates(user)
+
+    async def get_users_data(self, user_ids: list):
+        """Kai users ke docs ek $in query mein ({user_id: doc}); jo nahi hain woh default free user ban jaate hain."""
+        users = {doc["_id"]: doc async for doc in self.db.users.find({"_id": {"$in": list(user_ids)}})}
+        missing = [self._new_user_doc(uid) for uid in user_ids if uid not in users]
+        if missing:
+            try:
+                await self.db.users.insert_many(missing, ordered=False)
+                inserted = len(missing)
+            except BulkWriteError as e:
+                # Kisi parallel upsert ne kuch users pehle hi bana diye
+                inserted = e.details.get("nInserted", 0)
+            if inserted:
+                await self._inc_counters(None, users=inserted)
+            for doc in missing:
+                users[doc["_id"]] = doc
+        return {uid: self._overlay_user_updates(doc) for uid, doc in users.items()}
 
     async def set_user_plan(self, user_id, plan_name, expiry_date: datetime.datetime):
-        await self.db.users.update_one(
-            {"_id": user_id}, 
+        result = await self.db.users.update_one(
+            {"_id": user_id},
             {"$set": {"plan": plan_name, "plan_expiry": expiry_date}},
             upsert=True
         )
+        if result.upserted_id is not None:
+            await self._inc_counters(None, users=1)
 
     async def get_user_links(self, user_id, limit=20):
         # Deprecated: use get_active_links for user facing apps
@@ -137,33 +620,395 @@ class Database:
         cursor = self.col.find(query).sort("timestamp", -1)
         return await cursor.to_list(length=None)
 
+    async def get_user_links_by_ids(self, user_id, ids: list):
+        if not ids:
+            return []
+        now = datetime.datetime.now()
+        query = {
+            "_id": {"$in": list(ids)},
+            "user_id": user_id,
+            "$or": [
+                {"expiry_date": None},
+                {"expiry_date": {"$gt": now}}
+            ]
+        }
+        return await self.col.find(query).to_list(length=len(ids))
+
+    async def search_user_links(self, user_id, query: str = "", sort: str = "newest", skip: int = 0, limit: int = 30):
+        # Har query token kisi name token ka prefix ho; anchored regex multikey index (user_id, name_tokens) use karta hai
+        now = datetime.datetime.now()
+        query_filter = {
+            "user_id": user_id,
+            "$or": [{"expiry_date": None}, {"expiry_date": {"$gt": now}}]
+        }
+        tokens = self._name_tokens(query)
+        if tokens:
+            query_filter["$and"] = [{"name_tokens": {"$regex": f"^{re.escape(t)}"}} for t in tokens]
+        cursor = self.col.find(query_filter, {"name_tokens": 0, "backups": 0})
+        # _id tie-breaker: same second mein bane links pages ke beech repeat/skip na hon
+        if sort in ("name_asc", "name_desc"):
+            direction = 1 if sort == "name_asc" else -1
+            cursor = cursor.sort([("file_name", direction), ("_id", direction)]).collation(_NAME_COLLATION)
+        else:
+            direction = 1 if sort == "oldest" else -1
+            cursor = cursor.sort([("timestamp", direction), ("_id", direction)])
+        return await cursor.skip(skip).limit(limit).to_list(length=limit)
+
+    async def _backfill_name_tokens(self):
+        # Search feature se pehle ke links ke tokens (ek baar, batches mein)
+        ops = []
+        async for doc in self.col.find({"name_tokens": {"$exists": False}}, {"file_name": 1}):
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_tokens": self._name_tokens(doc.get("file_name"))}}))
+            if len(ops) >= 1000:
+                await self.col.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            await self.col.bulk_write(ops, ordered=False)
+
     async def get_all_links(self):
         cursor = self.col.find().sort("timestamp", -1)
         return await cursor.to_list(length=100) # Cap at 100 for safety
-        
+
     async def delete_link(self, unique_id):
-        await self.col.delete_one({"_id": unique_id})
-        
-    async def count_links(self):
-        return await self.col.count_documents({})
+        doc = await self.col.find_one_and_delete({"_id": unique_id})
+        if doc:
+            active = 0 if doc.get("expired") else -1
+            await self._inc_counters(doc.get("user_id"), links=-1, size=-doc.get("file_size_bytes", 0), active=active)
+            if active and doc.get("file_unique_id"):
+                await self.db.contents.update_one({"_id": doc["file_unique_id"]}, {"$inc": {"refs": -1}})
 
-    async def get_user_total_links(self, user_id):
-        return await self.col.count_documents({"user_id": user_id})
-        
-    async def total_users(self):
-        return await self.db.users.count_documents({})
+    async def expire_links(self):
+        """Expiry date nikal chuke links ko expired mark karta hai aur active_links counters ghatata hai."""
+        now = datetime.datetime.now()
+        total = 0
+        while True:
+            ids = [doc["_id"] for doc in await self.col.find(
+                {"expired": False, "expiry_date": {"$lte": now}}, {"_id": 1}
+            ).limit(500).to_list(length=500)]
+            if not ids:
+                return total
+            # Ek update_many, condition ke saath: sweep token se pata chalta hai ki kaunse links isi sweep ne expire kiye
+            # (dusra instance same links sweep kare toh double count na ho)
+            sweep = secrets.token_hex(8)
+            await self.col.update_many({"_id": {"$in": ids}, "expired": False}, {"$set": {"expired": True, "expired_by": sweep}})
+            per_user, released = {}, {}
+            async for doc in self.col.find({"_id": {"$in": ids}, "expired_by": sweep}, {"user_id": 1, "file_unique_id": 1}):
+                per_user[doc.get("user_id")] = per_user.get(doc.get("user_id"), 0) + 1
+                if doc.get("file_unique_id"):
+                    released[doc["file_unique_id"]] = released.get(doc["file_unique_id"], 0) + 1
+            if released:
+                # Expired link ab storage message ko reference nahi karta
+                await self.db.contents.bulk_write(
+                    [UpdateOne({"_id": fuid}, {"$inc": {"refs": -n}}) for fuid, n in released.items()], ordered=False
+                )
+            if per_user:
+                ops = [UpdateOne({"_id": "global"}, {"$inc": {"active_links": -sum(per_user.values())}}, upsert=True)]
+                ops += [UpdateOne({"_id": f"user:{uid}"}, {"$inc": {"active_links": -n}}, upsert=True) for uid, n in per_user.items() if uid]
+                await self.db.counters.bulk_write(ops, ordered=False)
+                total += sum(per_user.values())
+
+    async def reconcile_counters(self):
+        """Links/users collections se counters dobara calculate karke drift theek karta hai."""
+        # Purane links (bina expired field ke) ko backfill karo taaki sweep index use kar sake
+        await self.col.update_many({"expired": {"$exists": False}}, {"$set": {"expired": False}})
+        pipeline = [{"$group": {
+            "_id": "$user_id",
+            "links": {"$sum": 1},
+            "bytes": {"$sum": {"$ifNull": ["$file_size_bytes", 0]}},
+            "active_links": {"$sum": {"$cond": [{"$eq": ["$expired", True]}, 0, 1]}},
+        }}]
+        # Pehle counters ka snapshot ({_id: v}), phir aggregation. Har write sirf tab lagta hai jab doc ka v
+        # snapshot jaisa hi ho: beech mein aaya $inc (naya link, pehla upload) overwrite/delete nahi hota,
+        # woh doc agle run mein theek hota hai.
+        snapshot = {doc["_id"]: doc.get("v") async for doc in self.db.counters.find({}, {"v": 1})}
+        totals = {"links": 0, "bytes": 0, "active_links": 0}
+        seen = set()
+        ops = []
+
+        async def write(ops):
+            try:
+                await self.db.counters.bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                # Upsert race (run ke dauran kisi $inc ne doc bana diya): baaki ops lag chuke, yeh doc agle run mein
+                if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                    raise
+
+        def set_op(key, values):
+            if key in snapshot:
+                return UpdateOne({"_id": key, "v": snapshot[key]}, {"$set": values, "$inc": {"v": 1}})
+            # Snapshot ke baad kisi $inc ne doc bana diya ho toh use mat chhedo
+            return UpdateOne({"_id": key}, {"$setOnInsert": {**values, "v": 0}}, upsert=True)
+
+        async for row in self.col.aggregate(pipeline, allowDiskUse=True):
+            values = {k: row[k] for k in totals}
+            for k in totals:
+                totals[k] += values[k]
+            if row["_id"]:
+                seen.add(f"user:{row['_id']}")
+                ops.append(set_op(f"user:{row['_id']}", values))
+            if len(ops) >= 1000:
+                await write(ops)
+                ops = []
+        totals["users"] = await self.db.users.count_documents({})
+        ops.append(set_op("global", totals))
+        # Jin users ke saare links ja chuke hain (snapshot mein the, aggregation mein nahi) unke stale counters hatao
+        # (SQLite ka DELETE FROM counters jaisa); run ke dauran bane/badle docs nahi
+        ops.extend(
+            DeleteOne({"_id": key, "v": v}) for key, v in snapshot.items()
+            if key.startswith("user:") and key not in seen
+        )
+        await write(ops)
+
+        # Content refcounts bhi active links se dobara (drift ho toh message kabhi purge na ho ya galat purge ho).
+        # Abhi claim hue contents chhod do: unka link save ho raha ho sakta hai.
+        refs = {}
+        async for row in self.col.aggregate([
+            {"$match": {"expired": False, "file_unique_id": {"$ne": None}}},
+            {"$group": {"_id": "$file_unique_id", "refs": {"$sum": 1}}},
+        ], allowDiskUse=True):
+            refs[row["_id"]] = row["refs"]
+        ops = []
+        async for content in self.db.contents.find({"updated": {"$lt": int(time.time()) - 600}}, {"refs": 1}):
+            if content.get("refs") != refs.get(content["_id"], 0):
+                ops.append(UpdateOne({"_id": content["_id"]}, {"$set": {"refs": refs.get(content["_id"], 0)}}))
+        if ops:
+            await self.db.contents.bulk_write(ops, ordered=False)
 
     async def get_all_users(self):
         cursor = self.db.users.find({}, {"_id": 1})
         return await cursor.to_list(length=None)
 
-    async def ban_user(self, user_id, reason="Admin Ban"):
+    async def _insert_ban(self, user_id, reason):
         await self.db.banned.update_one({"_id": user_id}, {"$set": {"reason": reason}}, upsert=True)
 
-    async def unban_user(self, user_id):
+    async def _delete_ban(self, user_id):
         await self.db.banned.delete_one({"_id": user_id})
 
-    async def is_banned(self, user_id):
-        return await self.db.banned.find_one({"_id": user_id}) is not None
+    async def _load_banned_ids(self):
+        return [doc["_id"] async for doc in self.db.banned.find({}, {"_id": 1})]
+
+    async def add_revocation(self, unique_id, until: int):
+        await self.db.revocations.update_one(
+            {"_id": unique_id}, {"$max": {"until": datetime.datetime.fromtimestamp(until)}}, upsert=True
+        )
+
+    async def get_revocations(self):
+        now = datetime.datetime.now()
+        return {doc["_id"]: doc["until"].timestamp() async for doc in self.db.revocations.find({"until": {"$gt": now}})}
+
+    async def _watch_bans(self):
+        """
+        Atlas (replica set) par change stream se dusre instances ke ban/unban turant milte hain.
+        Stream toote (network blip, primary election) toh backoff ke saath dobara khulti hai;
+        sirf change streams support hi na hon (standalone mongod) tab periodic reload par fallback.
+        """
+        delay = 1
+        while True:
+            opened, error = time.monotonic(), "stream closed"
+            try:
+                async with self.db.banned.watch() as stream:
+                    # Stream khulne ke beech jo changes miss hue ho, unke liye ek baar reload
+                    self._banned_ids = set(await self._load_banned_ids())
+                    async for change in stream:
+                        user_id = change.get("documentKey", {}).get("_id")
+                        if change["operationType"] in ("insert", "replace", "update"):
+                            self._banned_ids.add(user_id)
+                        elif change["operationType"] == "delete":
+                            self._banned_ids.discard(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if isinstance(e, OperationFailure) and e.code in _CHANGE_STREAM_UNSUPPORTED:
+                    print(f"⚠️ Ban change stream unavailable ({e}), falling back to periodic refresh.")
+                    return await super()._watch_bans()
+                error = e
+            # Kuch der chali stream ke baad ki galti naya incident hai: backoff shuru se
+            if time.monotonic() - opened > Config.BAN_REFRESH_INTERVAL:
+                delay = 1
+            print(f"⚠️ Ban change stream error ({error}), retrying in {delay}s.")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, Config.BAN_REFRESH_INTERVAL)
+
+    # --- DOWNLOAD ANALYTICS ---
+
+    async def record_download_stats(self, rows: list):
+        ops = [
+            UpdateOne(
+                {"_id": f"{row['unique_id']}:{row['bucket']}"},
+                {
+                    "$setOnInsert": {"unique_id": row["unique_id"], "owner": row["owner"], "bucket": datetime.datetime.fromtimestamp(row["bucket"])},
+                    "$inc": {"hits": row["hits"], "bytes": row["bytes"]},
+                },
+                upsert=True
+            )
+            for row in rows
+        ]
+        if ops:
+            await self.db.download_stats.bulk_write(ops, ordered=False)
+        # Viewers alag collection mein, ek doc per (unique_id, bucket, viewer): viral link ka stats doc
+        # 16MB tak nahi badhta. _id hi unique key hai, repeat viewer upsert no-op hai (SQLite ki download_viewers jaisa)
+        viewer_ops = [
+            UpdateOne(
+                {"_id": f"{row['unique_id']}:{row['bucket']}:{viewer}"},
+                {"$setOnInsert": {
+                    "unique_id": row["unique_id"], "owner": row["owner"],
+                    "bucket": datetime.datetime.fromtimestamp(row["bucket"]), "viewer": viewer,
+                }},
+                upsert=True
+            )
+            for row in rows for viewer in row["viewers"]
+        ]
+        if viewer_ops:
+            await self.db.download_viewers.bulk_write(viewer_ops, ordered=False)
+
+    async def _count_viewers(self, match: dict, group_by=None):
+        """Window ke distinct viewers, group_by field ke hisaab se ({value: count}) ya total (int)."""
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"k": f"${group_by}" if group_by else None, "viewer": "$viewer"}}},
+            {"$group": {"_id": "$_id.k", "viewers": {"$sum": 1}}},
+        ]
+        rows = await self.db.download_viewers.aggregate(pipeline).to_list(length=None)
+        if group_by:
+            return {r["_id"]: r["viewers"] for r in rows}
+        return rows[0]["viewers"] if rows else 0
+
+    async def get_hot_files(self, since: int, limit: int = 10):
+        since_dt = datetime.datetime.fromtimestamp(since)
+        pipeline = [
+            {"$match": {"bucket": {"$gte": since_dt}}},
+            {"$group": {
+                "_id": "$unique_id",
+                "owner": {"$first": "$owner"},
+                "hits": {"$sum": "$hits"},
+                "bytes": {"$sum": "$bytes"},
+            }},
+            {"$sort": {"hits": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "unique_id": "$_id", "owner": 1, "hits": 1, "bytes": 1}},
+        ]
+        rows = await self.db.download_stats.aggregate(pipeline).to_list(length=limit)
+        if rows:
+            viewers = await self._count_viewers(
+                {"unique_id": {"$in": [r["unique_id"] for r in rows]}, "bucket": {"$gte": since_dt}}, group_by="unique_id"
+            )
+            for r in rows:
+                r["viewers"] = viewers.get(r["unique_id"], 0)
+        return rows
+
+    async def get_owner_download_stats(self, owner: int, since: int):
+        since_dt = datetime.datetime.fromtimestamp(since)
+        pipeline = [
+            {"$match": {"owner": owner, "bucket": {"$gte": since_dt}}},
+            {"$group": {"_id": None, "hits": {"$sum": "$hits"}, "bytes": {"$sum": "$bytes"}}},
+        ]
+        rows = await self.db.download_stats.aggregate(pipeline).to_list(length=1)
+        if not rows:
+            return {"hits": 0, "bytes": 0, "viewers": 0}
+        viewers = await self._count_viewers({"owner": owner, "bucket": {"$gte": since_dt}})
+        return {"hits": rows[0]["hits"], "bytes": rows[0]["bytes"], "viewers": viewers}
+
+    # --- CONTENT INDEX (file_unique_id -> storage message, refcounted) ---
+
+    async def claim_contents(self, counts: dict):
+        """
+        Pehle se stored files ke liye refs badhata hai aur {file_unique_id: msg_id} return karta hai.
+        Atomic $inc: purge (refs <= 0 par delete) claim ke baad message nahi hata sakta.
+        Jo content purge ke liye mark ho chuka hai (message delete hone wala hai) woh claim nahi hota.
+        """
+        async def claim(fuid, n):
+            doc = await self.db.contents.find_one_and_update(
+                {"_id": fuid, "purging": {"$exists": False}},
+                {"$inc": {"refs": n}, "$set": {"updated": int(time.time())}}, projection={"msg_id": 1}
+            )
+            return fuid, doc
+        results = await asyncio.gather(*(claim(fuid, n) for fuid, n in counts.items()))
+        return {fuid: doc["msg_id"] for fuid, doc in results if doc}
+
+    async def add_content(self, file_unique_id, message_id, file_size_bytes: int = 0):
+        """Naya stored file register karta hai (refs=1). Kisi aur ne pehle register kar diya ho toh wahi msg_id."""
+        try:
+            await self.db.contents.insert_one({
+                "_id": file_unique_id, "msg_id": int(message_id), "file_size_bytes": int(file_size_bytes or 0),
+                "refs": 1, "created": int(time.time()), "updated": int(time.time())
+            })
+            return int(message_id)
+        except DuplicateKeyError:
+            claimed = await self.claim_contents({file_unique_id: 1})
+            if file_unique_id in claimed:
+                return claimed[file_unique_id]
+            # Purane message ka purge chal raha hai: entry naye message ko de do (confirm_orphan_purge msg_id match karke hi hatata hai)
+            taken = await self.db.contents.find_one_and_update(
+                {"_id": file_unique_id, "purging": {"$exists": True}},
+                {"$set": {"msg_id": int(message_id), "refs": 1, "updated": int(time.time())}, "$unset": {"purging": ""}}
+            )
+            if taken:
+                return int(message_id)
+            claimed = await self.claim_contents({file_unique_id: 1})
+            return claimed.get(file_unique_id, int(message_id))
+
+    async def release_contents(self, counts: dict):
+        """claim_contents / add_content ke refs wapas (link save nahi ho paaya)."""
+        if counts:
+            await self.db.contents.bulk_write(
+                [UpdateOne({"_id": fuid}, {"$inc": {"refs": -n}}) for fuid, n in counts.items()], ordered=False
+            )
+
+    async def pop_orphan_contents(self, limit: int = 100):
+        """
+        Jin storage messages ko koi active link reference nahi karta unhe purge ke liye mark karke msg_ids deta hai.
+        Entry tabhi hatti hai jab delete_messages ke baad confirm_orphan_purge chale; beech mein fail ho toh
+        marked entries agle sweep mein dobara aati hain.
+        """
+        msg_ids = []
+        for doc in await self.db.contents.find({"refs": {"$lte": 0}}, {"_id": 1}).limit(limit).to_list(length=limit):
+            # Condition ke saath mark: beech mein claim ho gaya toh skip
+            marked = await self.db.contents.find_one_and_update(
+                {"_id": doc["_id"], "refs": {"$lte": 0}}, {"$set": {"purging": int(time.time())}}, projection={"msg_id": 1}
+            )
+            if marked:
+                msg_ids.append(marked["msg_id"])
+        return msg_ids
+
+    async def confirm_orphan_purge(self, msg_ids: list):
+        if msg_ids:
+            await self.db.contents.delete_many({"msg_id": {"$in": [int(m) for m in msg_ids]}, "purging": {"$exists": True}})
+
+    # --- BROADCASTS ---
+
+    async def get_broadcast_targets(self, after_user_id: int, limit: int):
+        # _id index par range scan: poori users list kabhi memory mein load nahi hoti
+        cursor = self.db.users.find(
+            {"_id": {"$gt": after_user_id}, "blocked": {"$ne": True}}, {"_id": 1}
+        ).sort("_id", 1).limit(limit)
+        return [doc["_id"] async for doc in cursor]
+
+    async def create_broadcast(self, job: dict):
+        # _id hi idempotency key hai: same key dobara insert nahi hoti
+        try:
+            await self.db.broadcasts.insert_one(job)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def update_broadcast(self, broadcast_id, fields: dict):
+        await self.db.broadcasts.update_one({"_id": broadcast_id}, {"$set": fields})
+
+    async def get_running_broadcasts(self):
+        return await self.db.broadcasts.find({"status": "running"}).sort("created", 1).to_list(length=None)
+
+
+def get_database(url: str = None) -> BaseDatabase:
+    """
+    DATABASE_URL ke scheme se backend choose karta hai:
+      sqlite:///database.db  -> embedded SQLite (single-node deployments)
+      mongodb+srv://...      -> MongoDB Atlas (default)
+    """
+    url = url if url is not None else Config.DATABASE_URL
+    if url.startswith("sqlite:"):
+        from sqlite_database import SQLiteDatabase
+        return SQLiteDatabase(url)
+    return Database(url)
 
-db = Database()
+# Har public DB method ki latency /metrics mein (db_operation_seconds{method})
+db = time_methods(get_database(), DB_SECONDS)
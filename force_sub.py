@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+from pyrogram import Client, enums
+from pyrogram.errors import UserNotParticipant
+
+from config import Config
+from metrics import cache_counters
+
+_NOT_MEMBER = (enums.ChatMemberStatus.LEFT, enums.ChatMemberStatus.BANNED)
+_HIT, _MISS = cache_counters("force_sub")
+
+class ForceSubCache:
+    """
+    Force-sub channel membership ka TTL cache.
+    Member ka result lambe TTL tak, non-member ka chhote TTL tak yaad rehta hai (join karke "Refresh" jaldi kaam kare).
+    ChatMemberUpdated events (join/leave/kick) cache ko turant update karte hain, isliye returning users
+    ke liye gate par koi Telegram API call nahi hoti. Invite link bhi cache hota hai.
+    """
+
+    def __init__(self):
+        # {user_id: (is_member, expires_at)}
+        self._members = {}
+        self._invite_link = None
+        self._invite_expires = 0.0
+        self._lookups = {}
+
+    def _fallback_link(self):
+        return f"https://t.me/{str(Config.FORCE_SUB_CHANNEL).replace('@', '')}"
+
+    def _store(self, user_id: int, is_member: bool):
+        ttl = Config.FSUB_MEMBER_TTL if is_member else Config.FSUB_NONMEMBER_TTL
+        self._members[user_id] = (is_member, time.monotonic() + ttl)
+        if len(self._members) > Config.FSUB_CACHE_SIZE:
+            self._evict_expired()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for user_id in [u for u, (_, exp) in self._members.items() if exp <= now]:
+            del self._members[user_id]
+        # Sab abhi valid hain toh sabse puraane aadhe hata do (memory bounded rahe)
+        if len(self._members) > Config.FSUB_CACHE_SIZE:
+            for user_id in list(self._members)[:len(self._members) // 2]:
+                del self._members[user_id]
+
+    def on_member_update(self, update):
+        """ChatMemberUpdated event se cache update karo (API call nahi)."""
+        member = update.new_chat_member or update.old_chat_member
+        if not member or not member.user:
+            return
+        is_member = bool(update.new_chat_member) and update.new_chat_member.status not in _NOT_MEMBER
+        self._store(member.user.id, is_member)
+
+    def invalidate(self, user_id: int):
+        self._members.pop(user_id, None)
+
+    async def _lookup(self, client: Client, user_id: int) -> bool:
+        try:
+            member = await client.get_chat_member(Config.FORCE_SUB_CHANNEL, user_id)
+            is_member = member.status not in _NOT_MEMBER
+        except UserNotParticipant:
+            is_member = False
+        self._store(user_id, is_member)
+        return is_member
+
+    async def is_member(self, client: Client, user_id: int) -> bool:
+        cached = self._members.get(user_id)
+        if cached and cached[1] > time.monotonic():
+            _HIT.inc()
+            return cached[0]
+        _MISS.inc()
+        # Ek user ke parallel uploads ek hi get_chat_member share karein
+        task = self._lookups.get(user_id)
+        if task is None:
+            task = self._lookups[user_id] = asyncio.ensure_future(self._lookup(client, user_id))
+            task.add_done_callback(lambda _: self._lookups.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    def set_invite_link(self, link):
+        if link:
+            self._invite_link, self._invite_expires = link, time.monotonic() + Config.FSUB_INVITE_TTL
+
+    async def invite_link(self, client: Client) -> str:
+        if self._invite_link and self._invite_expires > time.monotonic():
+            return self._invite_link
+        try:
+            link = (await client.get_chat(Config.FORCE_SUB_CHANNEL)).invite_link or self._fallback_link()
+        except Exception:
+            link = self._fallback_link()
+        self._invite_link, self._invite_expires = link, time.monotonic() + Config.FSUB_INVITE_TTL
+        return link
+
+force_sub_cache = ForceSubCache()
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import time
+
+from config import Config
+
+class CountMinSketch:
+    """Fixed-memory approximate counter (over-count kar sakta hai, under-count kabhi nahi)."""
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def add(self, key, count: int = 1) -> int:
+        estimate = None
+        for seed, row in enumerate(self.rows):
+            i = hash((seed, key)) % self.width
+            row[i] += count
+            estimate = row[i] if estimate is None else min(estimate, row[i])
+        return estimate
+
+    def estimate(self, key) -> int:
+        return min(row[hash((seed, key)) % self.width] for seed, row in enumerate(self.rows))
+
+    def decay(self):
+        # Purani popularity aadhi: jo files ab nahi chal rahi woh dheere dheere thandi ho jaati hain
+        for row in self.rows:
+            for i, v in enumerate(row):
+                if v:
+                    row[i] = v >> 1
+
+
+class HotFileCache:
+    """
+    Sabse zyada stream hone wali files ko local disk par materialize karta hai.
+    Har stream request sketch mein count hoti hai (storage msg_id par, taaki dedup wale links ek hi file share karein);
+    background loop top-K garam files poori download karta hai (alag task mein) aur thandi ho chuki files hata deta hai.
+    Materialized file ke range requests seedha disk se (FileResponse / nginx X-Accel-Redirect) jaate hain,
+    Telegram ya Python generators se nahi.
+    """
+
+    def __init__(self, fetch):
+        # fetch(msg_id, path, max_size) -> storage message ki poori file `path` par likhkar size deta hai (max_size se badi ho toh 0)
+        self.fetch = fetch
+        self._sketch = CountMinSketch()
+        # {msg_id: estimate} sirf un files ke jo threshold ke aas paas hain (top-K nikalne ke liye)
+        self._candidates = {}
+        # {msg_id: size} jo disk par poori likhi ja chuki hain
+        self._files = {}
+        # {msg_id: (delete_at, size)} evict ho chuki par abhi disk par (grace period)
+        self._doomed = {}
+        self._task = None
+        self._fill_task = None
+
+    def _path(self, msg_id: int) -> str:
+        return os.path.join(Config.HOT_CACHE_DIR, str(msg_id))
+
+    def record(self, msg_id: int):
+        estimate = self._sketch.add(msg_id)
+        if estimate >= Config.HOT_MIN_HITS // 2:
+            self._candidates[msg_id] = estimate
+
+    def path_for(self, msg_id: int):
+        return self._path(msg_id) if msg_id in self._files else None
+
+    def _adopt_existing(self):
+        # Restart ke baad pehle se download hui files dobara use karo, adhoori (.part) hata do
+        os.makedirs(Config.HOT_CACHE_DIR, exist_ok=True)
+        for name in os.listdir(Config.HOT_CACHE_DIR):
+            path = os.path.join(Config.HOT_CACHE_DIR, name)
+            if name.isdigit():
+                self._files[int(name)] = os.path.getsize(path)
+                # Pehle rebalance mein turant evict na ho: ek interval ki mohlat
+                self._sketch.add(int(name), Config.HOT_MIN_HITS)
+            else:
+                os.remove(path)
+        if self._files:
+            print(f"✅ Hot cache: {len(self._files)} files adopted from disk.")
+
+    def _evict(self, msg_id: int):
+        # Naye requests turant Telegram par; file ek interval baad delete hoti hai, taaki jis request ko abhi
+        # path_for() se path mila hai (FileResponse / nginx X-Accel-Redirect ne file kholi nahi) use 404 na mile
+        size = self._files.pop(msg_id, None)
+        if size is not None:
+            self._doomed[msg_id] = (time.monotonic() + Config.HOT_CACHE_INTERVAL, size)
+
+    def _purge_doomed(self):
+        now = time.monotonic()
+        for msg_id, (delete_at, _) in list(self._doomed.items()):
+            if delete_at <= now:
+                del self._doomed[msg_id]
+                try:
+                    os.remove(self._path(msg_id))
+                except OSError:
+                    pass
+
+    def _disk_used(self) -> int:
+        return sum(self._files.values()) + sum(size for _, size in self._doomed.values())
+
+    async def _materialize(self, msg_id: int, max_size: int):
+        if msg_id in self._doomed:
+            # Evict hui file abhi disk par hai aur phir garam ho gayi: dobara download ki zaroorat nahi
+            self._files[msg_id] = self._doomed.pop(msg_id)[1]
+            return
+        part = self._path(msg_id) + ".part"
+        try:
+            size = await self.fetch(msg_id, part, max_size)
+            if size:
+                os.replace(part, self._path(msg_id))
+                self._files[msg_id] = size
+                print(f"🔥 Hot cache: msg {msg_id} materialized ({size // (1024 * 1024)} MB).")
+        except Exception as e:
+            print(f"⚠️ Hot cache: msg {msg_id} download failed: {e}")
+        finally:
+            if os.path.exists(part):
+                os.remove(part)
+
+    async def _fill(self, msg_ids: list):
+        """Garam files ek ek karke download (rebalance se alag task, ek waqt mein ek hi): badi files rebalance ko nahi rokti."""
+        for msg_id in msg_ids:
+            if msg_id in self._files:
+                continue
+            used = self._disk_used()
+            if used >= Config.HOT_CACHE_MAX_BYTES:
+                break
+            await self._materialize(msg_id, min(Config.HOT_MAX_FILE_SIZE, Config.HOT_CACHE_MAX_BYTES - used))
+
+    async def rebalance(self):
+        self._purge_doomed()
+        # Sketch estimates fresh karo, top-K garam files chuno
+        scores = {mid: self._sketch.estimate(mid) for mid in set(self._candidates) | set(self._files)}
+        hot = sorted((mid for mid, s in scores.items() if s >= Config.HOT_MIN_HITS), key=scores.get, reverse=True)
+        hot = hot[:Config.HOT_TOP_K]
+
+        # Thandi files: top-K se bahar aur threshold ke aadhe se neeche (flapping na ho)
+        for msg_id in [m for m in self._files if m not in hot and scores.get(m, 0) < Config.HOT_MIN_HITS // 2]:
+            self._evict(msg_id)
+            print(f"❄️ Hot cache: msg {msg_id} evicted.")
+
+        # Pichla fill abhi chal raha ho toh woh apni list poori kare; agla rebalance nayi list dega
+        wanted = [m for m in hot if m not in self._files]
+        if wanted and (self._fill_task is None or self._fill_task.done()):
+            self._fill_task = asyncio.create_task(self._fill(wanted))
+
+        self._sketch.decay()
+        self._candidates = {m: s // 2 for m, s in scores.items() if s // 2 >= Config.HOT_MIN_HITS // 2}
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(Config.HOT_CACHE_INTERVAL)
+            try:
+                await self.rebalance()
+            except Exception as e:
+                print(f"⚠️ Hot cache rebalance error: {e}")
+
+    async def start(self):
+        self._adopt_existing()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        for task in (self._task, self._fill_task):
+            if task:
+                task.cancel()
+        self._task = self._fill_task = None
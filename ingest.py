@@ -0,0 +1,163 @@
+import asyncio
+import time
+from collections import deque
+
+from pyrogram.types import Message
+
+from config import Config
+from metrics import UPLOAD_FILES, UPLOAD_SECONDS
+
+_WAIT = UPLOAD_SECONDS.labels("wait")
+_PROCESS = UPLOAD_SECONDS.labels("process")
+
+class IngestQueue:
+    """
+    Upload ingestion pipeline: bounded queue + fixed worker pool.
+    Har user ki apni queue hoti hai aur workers users ke beech round-robin karte hain, isliye
+    100 files forward karne wala user baaki users ko block nahi karta. Ek user ke ek saath
+    INGEST_USER_CONCURRENCY se zyada uploads nahi chalte. Queue full ho toh naya upload
+    wait karta hai (backpressure), fail nahi hota.
+    Album (media_group_id) ya ek saath aayi files INGEST_BATCH_WINDOW tak collect hokar
+    ek batch ke roop mein process hoti hain (ek access check, ek DB write, ek reply).
+    """
+
+    def __init__(self, handler):
+        # handler(messages, user_id) -> ek upload batch process karta hai
+        self.handler = handler
+        # {(user_id, media_group_id): [messages]} jo abhi window mein collect ho rahe hain
+        self._collecting = {}
+        self._queues = {}
+        self._ready = deque()
+        self._active = {}
+        self._notices = {}
+        # Window mein collect ho rahe + queued messages (backpressure isi par)
+        self._size = 0
+        self._cond = asyncio.Condition()
+        self._workers = []
+        # Window close tasks ka strong reference (GC ho gaya toh poora album atak jaata)
+        self._tasks = set()
+
+    def _position(self, user_id):
+        # Round-robin mein is user ka last batch kitne batches ke baad chalega
+        k = len(self._queues[user_id])
+        return k + sum(min(len(q), k) for uid, q in self._queues.items() if uid != user_id)
+
+    async def submit(self, message: Message, user_id: int):
+        # Backpressure: queue full ho toh yahin wait (collect karne se pehle). Message abhi se gina jaata hai,
+        # taaki bahut saare khule albums/windows bhi INGEST_QUEUE_SIZE ke andar rahein
+        async with self._cond:
+            while self._size >= Config.INGEST_QUEUE_SIZE:
+                await self._cond.wait()
+            self._size += 1
+
+        key = (user_id, message.media_group_id)
+        batch = self._collecting.get(key)
+        if batch is None:
+            batch = self._collecting[key] = [message]
+            if Config.INGEST_BATCH_WINDOW > 0:
+                asyncio.get_running_loop().call_later(Config.INGEST_BATCH_WINDOW, self._spawn_close, key, batch)
+                return
+        else:
+            batch.append(message)
+            if len(batch) < Config.INGEST_BATCH_MAX:
+                return
+        await self._close_batch(key, batch)
+
+    def _spawn_close(self, key, batch):
+        task = asyncio.create_task(self._close_batch(key, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _close_batch(self, key, batch):
+        # Window khatam ya batch bhar gaya: ek hi baar enqueue ho
+        if self._collecting.get(key) is not batch:
+            return
+        del self._collecting[key]
+        await self._enqueue(batch, key[0])
+
+    async def _enqueue(self, batch: list, user_id: int):
+        async with self._cond:
+            queue = self._queues.get(user_id)
+            if queue is None:
+                queue = self._queues[user_id] = deque()
+                self._ready.append(user_id)
+            queue.append(batch)
+            position = self._position(user_id)
+            queued = sum(len(q) for q in self._queues.values())
+            busy = (sum(self._active.values()) + queued > Config.INGEST_WORKERS
+                    or self._active.get(user_id, 0) + len(queue) > Config.INGEST_USER_CONCURRENCY)
+            self._cond.notify_all()
+        message = batch[0]
+
+        # Sirf tab batao jab file turant process nahi hogi; ek burst par ek hi notice
+        if busy and user_id not in self._notices:
+            self._notices[user_id] = None
+            try:
+                self._notices[user_id] = await message.reply_text(
+                    f"**⏳ Queued!** Your file is at position `{position}`.\n__Files will be processed one by one, please wait...__",
+                    quote=True
+                )
+            except Exception:
+                pass
+
+    async def _next(self):
+        async with self._cond:
+            while True:
+                for _ in range(len(self._ready)):
+                    user_id = self._ready.popleft()
+                    if self._active.get(user_id, 0) >= Config.INGEST_USER_CONCURRENCY:
+                        self._ready.append(user_id)
+                        continue
+                    queue = self._queues[user_id]
+                    batch = queue.popleft()
+                    if queue:
+                        self._ready.append(user_id)
+                    else:
+                        del self._queues[user_id]
+                    self._active[user_id] = self._active.get(user_id, 0) + 1
+                    self._size -= len(batch)
+                    self._cond.notify_all()
+                    return user_id, batch
+                await self._cond.wait()
+
+    async def _done(self, user_id):
+        async with self._cond:
+            self._active[user_id] -= 1
+            if not self._active[user_id]:
+                del self._active[user_id]
+            drained = user_id not in self._queues and user_id not in self._active
+            self._cond.notify_all()
+        if drained and user_id in self._notices:
+            notice = self._notices.pop(user_id)
+            if notice:
+                try:
+                    await notice.delete()
+                except Exception:
+                    pass
+
+    async def _worker(self):
+        while True:
+            user_id, batch = await self._next()
+            start = time.perf_counter()
+            if batch[0].date:
+                # Message bhejne se worker milne tak: batch window + queue dono
+                _WAIT.observe(max(0.0, time.time() - batch[0].date.timestamp()))
+            try:
+                await self.handler(batch, user_id)
+                UPLOAD_FILES.inc(len(batch))
+            except Exception as e:
+                print(f"⚠️ Ingest worker error (user {user_id}): {e}")
+            finally:
+                _PROCESS.observe(time.perf_counter() - start)
+                await self._done(user_id)
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(Config.INGEST_WORKERS)]
+        print(f"✅ Upload queue started with {Config.INGEST_WORKERS} workers.")
+
+    async def stop(self):
+        for task in (*self._workers, *self._tasks):
+            task.cancel()
+        self._workers = []
+        if self._size:
+            print(f"⚠️ Upload queue stopped with {self._size} pending file(s).")
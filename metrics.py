@@ -0,0 +1,224 @@
+import bisect
+import functools
+import inspect
+import time
+
+import server_timing
+
+# Prometheus text exposition (format 0.0.4), bina prometheus_client ke.
+# Sab kuch ek hi event loop par update hota hai, isliye na locks chahiye na atomics: inc/observe bas
+# ek attribute / list slot badalte hain. Hot paths par `labels()` ek baar (module / object level) bind karke
+# child reuse karo, taaki har chunk par label dict lookup bhi na ho.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOW_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # {label values tuple: child}
+        self._children = {}
+        registry.register(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _label_str(self, key: tuple, extra: str = "") -> str:
+        parts = [f'{n}="{_escape(v)}"' for n, v in zip(self.labelnames, key)]
+        if extra:
+            parts.append(extra)
+        return "{" + ",".join(parts) + "}" if parts else ""
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            yield f"{self.name}{self._label_str(key)} {_fmt(child.value)}"
+
+
+class Gauge(Counter):
+    """Gauge; `set_function` se value scrape ke waqt nikalti hai (jaise work_loads), hot path par kuch update nahi hota."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._collect = None
+
+    def set_function(self, fn):
+        # fn() -> {label values tuple: value}
+        self._collect = fn
+
+    def _samples(self):
+        if self._collect is not None:
+            for key, value in self._collect().items():
+                yield f"{self.name}{self._label_str(tuple(str(v) for v in key))} {_fmt(value)}"
+        else:
+            yield from super()._samples()
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        # Har bucket ka apna (non-cumulative) count; aakhri slot +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        for key, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = 'le="%s"' % _fmt(bound)
+                yield f"{self.name}_bucket{self._label_str(key, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_str(key)} {_fmt(child.sum)}"
+            yield f"{self.name}_count{self._label_str(key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        return "\n".join(m.render() for m in self._metrics.values()) + "\n"
+
+registry = Registry()
+
+
+def time_methods(obj, histogram: Histogram, label_prefix: str = ""):
+    """
+    Object ke saare public async methods ko latency timer se wrap karta hai (instance attributes, class nahi badalti).
+    Har method ka histogram child pehle se bound hota hai; chal rahi request ki Server-Timing timeline mein bhi
+    `db.<method>` phase jaata hai.
+    """
+    for name, fn in inspect.getmembers(type(obj), inspect.iscoroutinefunction):
+        if name.startswith("_"):
+            continue
+        bound = getattr(obj, name)
+        child = histogram.labels(label_prefix + name)
+
+        def wrap(bound=bound, child=child, phase=f"db.{name}"):
+            @functools.wraps(bound)
+            async def timed(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await bound(*args, **kwargs)
+                finally:
+                    end = time.perf_counter()
+                    child.observe(end - start)
+                    server_timing.record(phase, start, end)
+            return timed
+        setattr(obj, name, wrap())
+    return obj
+
+
+# --- METRICS ---
+# Streaming
+STREAM_BYTES = Counter("stream_bytes_total", "Bytes streamed from Telegram to viewers", ("client", "dc"))
+GETFILE_SECONDS = Histogram("tg_getfile_seconds", "upload.GetFile latency per chunk", ("dc",))
+DL_TTFB_SECONDS = Histogram("dl_ttfb_seconds", "Time from /dl request to first body byte", ("source",))
+WORK_LOADS = Gauge("stream_work_loads", "Active streams per client", ("client",))
+MEDIA_SESSIONS = Counter("tg_media_sessions_created_total", "Media DC sessions created", ("dc", "source"))
+
+# Telegram rate limits
+FLOOD_WAITS = Counter("tg_flood_waits_total", "FloodWait errors received", ("client", "op"))
+FLOOD_WAIT_SECONDS = Counter("tg_flood_wait_seconds_total", "Seconds spent waiting on FloodWait", ("client", "op"))
+
+# Caches: hit ratio = rate(result="hit") / rate(sum)
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result", ("cache", "result"))
+
+# Database
+DB_SECONDS = Histogram("db_operation_seconds", "Database method latency", ("method",))
+
+# Bot pipelines
+UPLOAD_SECONDS = Histogram("upload_seconds", "Upload pipeline latency (wait: message sent -> worker picks it, process: handler)", ("stage",), SLOW_BUCKETS)
+UPLOAD_FILES = Counter("upload_files_total", "Files processed by the upload pipeline")
+BROADCAST_MESSAGES = Counter("broadcast_messages_total", "Broadcast deliveries by result", ("result",))
+
+
+def cache_counters(cache: str):
+    """(hit, miss) children, module level par ek baar bind karne ke liye."""
+    return CACHE_REQUESTS.labels(cache, "hit"), CACHE_REQUESTS.labels(cache, "miss")
+
+def flood_wait(client, op: str, seconds: float):
+    name = getattr(client, "name", client)
+    FLOOD_WAITS.labels(name, op).inc()
+    FLOOD_WAIT_SECONDS.labels(name, op).inc(seconds)
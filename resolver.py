@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+from pyrogram import Client
+from pyrogram.errors import FloodWait
+
+from config import Config
+from metrics import cache_counters, flood_wait
+
+_HIT, _MISS = cache_counters("resolver")
+
+class MessageResolver:
+    """
+    Storage channel messages ka micro-batching resolver.
+    Kuch milliseconds ke andar aaye saare msg_id lookups (per client) ek get_messages call mein jaate hain
+    (channels.getMessages ek baar mein 200 ids leta hai), results sab waiters ko milte hain
+    aur thodi der cache rehte hain. Burst load par metadata RPCs aur FloodWaits dono kam hote hain.
+    """
+
+    def __init__(self):
+        # {(id(client), msg_id): (message, expires_at)}
+        self._cache = {}
+        # {id(client): {msg_id: [futures]}}
+        self._pending = {}
+        self._timers = {}
+        # Chal rahe _resolve tasks ka strong reference (loop sirf weak ref rakhta hai, warna beech mein GC ho sakte hain)
+        self._tasks = set()
+
+    def _cached(self, client: Client, msg_id: int):
+        hit = self._cache.get((id(client), msg_id))
+        if hit and hit[1] > time.monotonic():
+            return hit[0]
+        return None
+
+    async def get(self, client: Client, msg_id: int):
+        msg_id = int(msg_id)
+        message = self._cached(client, msg_id)
+        if message is not None:
+            _HIT.inc()
+            return message
+        _MISS.inc()
+
+        future = asyncio.get_running_loop().create_future()
+        pending = self._pending.setdefault(id(client), {})
+        pending.setdefault(msg_id, []).append(future)
+        if len(pending) >= Config.RESOLVER_BATCH_MAX:
+            self._flush_now(client)
+        elif id(client) not in self._timers:
+            self._timers[id(client)] = asyncio.get_running_loop().call_later(
+                Config.RESOLVER_WINDOW_MS / 1000, self._flush_now, client
+            )
+        return await future
+
+    def invalidate(self, client: Client, msg_id: int):
+        self._cache.pop((id(client), int(msg_id)), None)
+
+    def _flush_now(self, client: Client):
+        timer = self._timers.pop(id(client), None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(id(client), None)
+        if batch:
+            task = asyncio.create_task(self._resolve(client, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, client: Client, batch: dict):
+        ids = list(batch)
+        try:
+            for attempt in range(3):
+                try:
+                    messages = await client.get_messages(Config.STORAGE_CHANNEL, ids)
+                    break
+                except FloodWait as e:
+                    flood_wait(client, "get_messages", e.value)
+                    if attempt == 2:
+                        raise
+                    await asyncio.sleep(e.value + 1)
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        expires = time.monotonic() + Config.RESOLVER_CACHE_TTL
+        if len(self._cache) > Config.RESOLVER_CACHE_SIZE:
+            now = time.monotonic()
+            self._cache = {k: v for k, v in self._cache.items() if v[1] > now}
+        for msg_id, message in zip(ids, messages):
+            if not message.empty:
+                self._cache[(id(client), msg_id)] = (message, expires)
+            for future in batch[msg_id]:
+                if not future.done():
+                    future.set_result(message)
+
+message_resolver = MessageResolver()
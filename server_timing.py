@@ -0,0 +1,112 @@
+import contextvars
+import json
+import random
+import time
+from contextlib import contextmanager
+
+from config import Config
+
+# Request ki timeline ContextVar mein: gehre code (DB wrapper, yield_file, fetch_chunk) ko kuch pass nahi karna padta.
+# Timeline na ho (bot handlers, background tasks, baaki routes) toh record() ek ContextVar.get() ke baad no-op hai.
+_current = contextvars.ContextVar("server_timing", default=None)
+
+# Ek request mein itne se zyada phases nahi (retry loops header ko bada na karein)
+_MAX_PHASES = 24
+
+
+class Timeline:
+    """Ek request ke phases (name, start, end). Response headers jaate hi band: uske baad ke phases (stream body) ignore."""
+
+    __slots__ = ("path", "started", "phases", "meta", "done")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.started = time.perf_counter()
+        self.phases = []
+        self.meta = {}
+        self.done = False
+
+    def add(self, name: str, start: float, end: float):
+        if not self.done and len(self.phases) < _MAX_PHASES:
+            self.phases.append((name, start, end))
+
+    def header(self, total: float) -> str:
+        parts = [f"{name};dur={(end - start) * 1000:.1f}" for name, start, end in self.phases]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+    def log_if_slow(self, status: int, total: float):
+        if total * 1000 < Config.SLOW_REQUEST_MS or random.random() >= Config.SLOW_REQUEST_SAMPLE_RATE:
+            return
+        record = {
+            "path": self.path,
+            "status": status,
+            "total_ms": round(total * 1000, 1),
+            "phases": [
+                {"name": name, "at_ms": round((start - self.started) * 1000, 1), "dur_ms": round((end - start) * 1000, 1)}
+                for name, start, end in self.phases
+            ],
+            **self.meta,
+        }
+        print(f"🐢 Slow request: {json.dumps(record, default=str)}")
+
+
+def record(name: str, start: float, end: float = None):
+    timeline = _current.get()
+    if timeline is not None:
+        timeline.add(name, start, end if end is not None else time.perf_counter())
+
+@contextmanager
+def phase(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, start)
+
+def annotate(**fields):
+    """Slow log ke liye extra context (client, dc, msg_id...)."""
+    timeline = _current.get()
+    if timeline is not None and not timeline.done:
+        timeline.meta.update(fields)
+
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware (BaseHTTPMiddleware nahi, woh streams ko buffer/slow karta hai).
+    Chune hue routes par har request ki timeline banata hai; response headers ke saath `Server-Timing`
+    (total = headers bhejne tak ka time, streams ke liye time to first byte) aur SLOW_REQUEST_MS se dheemi
+    requests ka sampled structured log.
+    """
+
+    def __init__(self, app, prefixes: tuple):
+        self.app = app
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefixes):
+            return await self.app(scope, receive, send)
+
+        timeline = Timeline(scope["path"])
+        token = _current.set(timeline)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start" and not timeline.done:
+                total = time.perf_counter() - timeline.started
+                if Config.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", timeline.header(total).encode()))
+                    headers.append((b"timing-allow-origin", b"*"))
+                    message = {**message, "headers": headers}
+                timeline.done = True
+                timeline.log_if_slow(message["status"], total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            if not timeline.done:
+                # Unhandled exception: response hamare through nahi gaya (ServerErrorMiddleware 500 bhejega)
+                timeline.done = True
+                timeline.log_if_slow(500, time.perf_counter() - timeline.started)
+            _current.reset(token)
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+from pyrogram import Client, raw
+from pyrogram.session import Session, Auth
+
+from metrics import MEDIA_SESSIONS
+
+# Media-DC auth keys client ki apni session file (Pyrogram SQLite storage) mein hi save hoti hain,
+# taaki restart ke baad har DC ke liye Auth().create() + Export/ImportAuthorization dobara na karna pade.
+_MEDIA_AUTH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media_auth (
+    dc_id INTEGER NOT NULL,
+    test_mode INTEGER NOT NULL,
+    auth_key BLOB NOT NULL,
+    created INTEGER,
+    PRIMARY KEY (dc_id, test_mode)
+)
+"""
+
+# Ek (client, dc) ke liye ek hi media session bane, chahe kitne streams saath mein shuru hon
+_session_locks = {}
+
+def _conn(client: Client):
+    # in_memory / custom storage ke paas conn na ho toh persistence skip
+    conn = getattr(client.storage, "conn", None)
+    if conn is not None:
+        conn.execute(_MEDIA_AUTH_SCHEMA)
+    return conn
+
+def load_media_auth(client: Client, dc_id: int, test_mode: bool):
+    conn = _conn(client)
+    if conn is None:
+        return None
+    row = conn.execute("SELECT auth_key FROM media_auth WHERE dc_id = ? AND test_mode = ?", (dc_id, int(test_mode))).fetchone()
+    return row[0] if row else None
+
+def save_media_auth(client: Client, dc_id: int, test_mode: bool, auth_key: bytes):
+    conn = _conn(client)
+    if conn is None:
+        return
+    conn.execute(
+        "REPLACE INTO media_auth (dc_id, test_mode, auth_key, created) VALUES (?, ?, ?, ?)",
+        (dc_id, int(test_mode), auth_key, int(time.time()))
+    )
+    conn.commit()
+
+def delete_media_auth(client: Client, dc_id: int, test_mode: bool):
+    conn = _conn(client)
+    if conn is None:
+        return
+    conn.execute("DELETE FROM media_auth WHERE dc_id = ? AND test_mode = ?", (dc_id, int(test_mode)))
+    conn.commit()
+
+async def _start_saved_session(client: Client, dc_id: int, test_mode: bool):
+    auth_key = load_media_auth(client, dc_id, test_mode)
+    if not auth_key:
+        return None
+    ms = Session(client, dc_id, auth_key, test_mode, is_media=True)
+    try:
+        await ms.start()
+        # Saved key abhi bhi authorized hai? (AUTH_KEY_UNREGISTERED par fresh auth)
+        await ms.invoke(raw.functions.users.GetUsers(id=[raw.types.InputUserSelf()]))
+        return ms
+    except Exception as e:
+        print(f"⚠️ Saved media session for DC {dc_id} rejected ({type(e).__name__}), re-authorizing...")
+        try:
+            await ms.stop()
+        except Exception:
+            pass
+        delete_media_auth(client, dc_id, test_mode)
+        return None
+
+async def get_media_session(client: Client, dc_id: int) -> Session:
+    """File ke DC ka media session deta hai: memory -> saved auth key -> fresh export/import."""
+    ms = client.media_sessions.get(dc_id)
+    if ms is not None:
+        return ms
+    lock = _session_locks.setdefault((id(client), dc_id), asyncio.Lock())
+    async with lock:
+        ms = client.media_sessions.get(dc_id)
+        if ms is not None:
+            return ms
+        if dc_id == await client.storage.dc_id():
+            ms = client.session
+        else:
+            test_mode = await client.storage.test_mode()
+            ms = await _start_saved_session(client, dc_id, test_mode)
+            if ms is not None:
+                MEDIA_SESSIONS.labels(dc_id, "saved").inc()
+            else:
+                auth_key = await Auth(client, dc_id, test_mode).create()
+                ms = Session(client, dc_id, auth_key, test_mode, is_media=True)
+                await ms.start()
+                ea = await client.invoke(raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                await ms.invoke(raw.functions.auth.ImportAuthorization(id=ea.id, bytes=ea.bytes))
+                save_media_auth(client, dc_id, test_mode, auth_key)
+                MEDIA_SESSIONS.labels(dc_id, "fresh").inc()
+                print(f"✅ Media session for DC {dc_id} authorized and saved ({client.name}).")
+        client.media_sessions[dc_id] = ms
+        return ms
+
+async def invalidate_media_session(client: Client, dc_id: int):
+    """Auth key revoke ho gayi (AUTH_KEY_UNREGISTERED): memory aur file dono se hatao, agla stream fresh auth karega."""
+    ms = client.media_sessions.pop(dc_id, None)
+    if ms is not None and ms is not client.session:
+        try:
+            await ms.stop()
+        except Exception:
+            pass
+    delete_media_auth(client, dc_id, await client.storage.test_mode())
+
+async def warm_peer(client: Client, chat_id):
+    """Peer (access hash) session file mein na ho tabhi resolve karo; warna koi API call nahi."""
+    if not chat_id:
+        return
+    if isinstance(chat_id, int):
+        try:
+            await client.storage.get_peer_by_id(chat_id)
+            return
+        except KeyError:
+            pass
+    await client.get_chat(chat_id)
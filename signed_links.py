@@ -0,0 +1,105 @@
+import base64
+import hashlib
+import hmac
+import struct
+import time
+
+from config import Config
+
+# Token payload: msg_id, owner user_id, expiry (unix) + unique_id (stats aur revocation ke liye)
+_HEADER = struct.Struct(">qqI")
+_SIG_BYTES = 16
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class LinkSigner:
+    """
+    Stateless signed download URLs (dashboard token jaisa HMAC, BOT_TOKEN se derived key).
+    Token mein storage msg_id, owner aur expiry hote hain, isliye /s/ route bina kisi DB read ke
+    stream shuru kar deta hai. Revoke kiye gaye links ek chhoti in-memory denylist mein rehte hain,
+    jab tak unke koi bhi issued token valid ho sakta hai; denylist DB mein bhi persist hoti hai
+    (startup par aur periodically load_revocations se wapas aati hai).
+    """
+
+    def __init__(self):
+        secret = Config.LINK_SIGNING_SECRET or Config.BOT_TOKEN or ""
+        self._key = hashlib.sha256(b"signed-dl:" + secret.encode()).digest()
+        # {unique_id: deny_until}
+        self._denied = {}
+
+    def _sig(self, payload: bytes) -> bytes:
+        return hmac.new(self._key, payload, hashlib.sha256).digest()[:_SIG_BYTES]
+
+    def _expiry(self, expiry_date) -> int:
+        # Window ke hisaab se round: ek window mein same token (ETag / page cache stable), lifetime TTL se 2*TTL tak
+        ttl = Config.SIGNED_URL_TTL
+        exp = (int(time.time()) // ttl + 2) * ttl
+        if expiry_date:
+            exp = min(exp, int(expiry_date.timestamp()))
+        return exp
+
+    def sign(self, unique_id: str, msg_id: int, owner_id: int, expiry_date=None) -> str:
+        payload = _HEADER.pack(int(msg_id), int(owner_id or 0), self._expiry(expiry_date)) + unique_id.encode()
+        return f"{_b64(payload)}.{_b64(self._sig(payload))}"
+
+    def verify(self, token: str):
+        """Valid token ho toh {"unique_id", "msg_id", "owner_id", "exp"}, warna None."""
+        try:
+            payload_b64, sig_b64 = token.split(".", 1)
+            payload, sig = _unb64(payload_b64), _unb64(sig_b64)
+        except ValueError:
+            return None
+        if len(payload) <= _HEADER.size or not hmac.compare_digest(sig, self._sig(payload)):
+            return None
+        msg_id, owner_id, exp = _HEADER.unpack_from(payload)
+        unique_id = payload[_HEADER.size:].decode(errors="replace")
+        if exp <= time.time() or self.is_revoked(unique_id):
+            return None
+        return {"unique_id": unique_id, "msg_id": msg_id, "owner_id": owner_id, "exp": exp}
+
+    def chunk_key(self, msg_id: int) -> str:
+        """
+        /c/ chunks ka address: msg_id + chhota HMAC (storage channel enumerate na ho sake). Kabhi expire nahi hota,
+        isliye yeh viewers tak nahi jaata: /c/ sirf app <-> cache tier ka internal route hai (chunk_origin_token dekho),
+        link ki expiry / revoke / ban pehle hi /dl ya /s par check ho chuke hote hain.
+        """
+        return f"{int(msg_id)}-{_b64(self._sig(b'chunk:%d' % int(msg_id))[:9])}"
+
+    def verify_chunk_key(self, key: str):
+        msg_id, _, sig = key.partition("-")
+        if not msg_id.isdigit() or not hmac.compare_digest(sig, self.chunk_key(int(msg_id)).partition("-")[2]):
+            return None
+        return int(msg_id)
+
+    def chunk_origin_token(self) -> str:
+        """App cache tier ko har /c/ request ke saath bhejta hai (nginx upstream tak forward karta hai); iske bina /c/ 404."""
+        return _b64(self._sig(b"chunk-origin"))
+
+    def revoke(self, unique_id: str) -> int:
+        """Link deny karo; deny_until return karta hai (caller ise DB mein persist karta hai)."""
+        now = time.time()
+        self._denied = {u: until for u, until in self._denied.items() if until > now}
+        # Is link ka koi bhi issued token isse zyada der valid nahi ho sakta
+        until = int(now) + 2 * Config.SIGNED_URL_TTL + 1
+        self._denied[unique_id] = until
+        return until
+
+    def load_revocations(self, denied: dict):
+        """DB se aayi {unique_id: deny_until} merge karo (restart / dusre workers ke revokes)."""
+        now = time.time()
+        merged = {u: until for u, until in self._denied.items() if until > now}
+        for unique_id, until in denied.items():
+            if until > now:
+                merged[unique_id] = max(until, merged.get(unique_id, 0))
+        self._denied = merged
+
+    def is_revoked(self, unique_id: str) -> bool:
+        until = self._denied.get(unique_id)
+        return bool(until and until > time.time())
+
+link_signer = LinkSigner()
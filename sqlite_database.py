@@ -0,0 +1,625 @@
+import asyncio
+import datetime
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from database import BaseDatabase
+
+# Columns jo Python datetime objects store karte hain (ISO text ke roop mein save hote hain)
+_DATETIME_COLUMNS = {"expiry_date", "plan_expiry"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS links (
+    _id TEXT PRIMARY KEY,
+    msg_id INTEGER NOT NULL,
+    backups TEXT NOT NULL DEFAULT '{}',
+    file_name TEXT NOT NULL DEFAULT 'Unknown',
+    file_size TEXT NOT NULL DEFAULT 'Unknown',
+    user_id INTEGER NOT NULL DEFAULT 0,
+    timestamp INTEGER NOT NULL DEFAULT 0,
+    date_str TEXT,
+    expiry_date TEXT,
+    file_size_bytes INTEGER NOT NULL DEFAULT 0,
+    file_unique_id TEXT,
+    expired INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS contents (
+    _id TEXT PRIMARY KEY,
+    msg_id INTEGER NOT NULL,
+    file_size_bytes INTEGER NOT NULL DEFAULT 0,
+    refs INTEGER NOT NULL DEFAULT 0,
+    created INTEGER,
+    updated INTEGER,
+    purging INTEGER
+);
+
+-- Filename search index: har link ke normalized name tokens (prefix range scans ke liye)
+CREATE TABLE IF NOT EXISTS link_tokens (
+    user_id INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    link_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, token, link_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS users (
+    _id INTEGER PRIMARY KEY,
+    plan TEXT NOT NULL DEFAULT 'free',
+    plan_expiry TEXT,
+    daily_count INTEGER NOT NULL DEFAULT 0,
+    last_usage_date TEXT,
+    last_active INTEGER,
+    blocked INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS banned (
+    _id INTEGER PRIMARY KEY,
+    reason TEXT
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    _id TEXT PRIMARY KEY,
+    links INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    active_links INTEGER NOT NULL DEFAULT 0,
+    users INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS download_stats (
+    unique_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    owner INTEGER,
+    hits INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (unique_id, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS download_viewers (
+    unique_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    viewer TEXT NOT NULL,
+    PRIMARY KEY (unique_id, bucket, viewer)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS revocations (
+    _id TEXT PRIMARY KEY,
+    until INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS broadcasts (
+    _id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    source_chat TEXT NOT NULL,
+    source_msg INTEGER NOT NULL,
+    status_chat INTEGER,
+    status_msg INTEGER,
+    last_user_id INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    blocked INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    created INTEGER,
+    finished INTEGER,
+    priority TEXT NOT NULL DEFAULT 'normal',
+    text TEXT
+);
+"""
+
+# Purani database files mein jo columns baad mein jode gaye (table, column, declaration)
+_ADDED_COLUMNS = [
+    ("links", "file_size_bytes", "INTEGER NOT NULL DEFAULT 0"),
+    ("links", "expired", "INTEGER NOT NULL DEFAULT 0"),
+    ("links", "file_unique_id", "TEXT"),
+    ("contents", "purging", "INTEGER"),
+    ("users", "blocked", "INTEGER NOT NULL DEFAULT 0"),
+    ("broadcasts", "priority", "TEXT NOT NULL DEFAULT 'normal'"),
+    ("broadcasts", "text", "TEXT"),
+]
+
+# Indexes aur triggers columns migrate hone ke baad bante hain.
+# Triggers counters ko usi transaction mein update karte hain jisme link/user likha gaya.
+_INDEXES_AND_TRIGGERS = """
+CREATE INDEX IF NOT EXISTS idx_links_user_ts ON links (user_id, timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_links_ts ON links (timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_links_expiry ON links (expired, expiry_date);
+CREATE INDEX IF NOT EXISTS idx_contents_refs ON contents (refs);
+CREATE INDEX IF NOT EXISTS idx_links_fuid ON links (file_unique_id);
+CREATE INDEX IF NOT EXISTS idx_download_stats_bucket ON download_stats (bucket);
+CREATE INDEX IF NOT EXISTS idx_download_stats_owner ON download_stats (owner, bucket);
+CREATE INDEX IF NOT EXISTS idx_download_viewers_bucket ON download_viewers (bucket);
+
+CREATE TRIGGER IF NOT EXISTS trg_links_insert AFTER INSERT ON links BEGIN
+    INSERT INTO counters (_id, links, bytes, active_links)
+    VALUES ('global', 1, NEW.file_size_bytes, 1 - NEW.expired), ('user:' || NEW.user_id, 1, NEW.file_size_bytes, 1 - NEW.expired)
+    ON CONFLICT(_id) DO UPDATE SET links = links + excluded.links, bytes = bytes + excluded.bytes, active_links = active_links + excluded.active_links;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_links_delete AFTER DELETE ON links BEGIN
+    UPDATE counters SET links = links - 1, bytes = bytes - OLD.file_size_bytes, active_links = active_links - (1 - OLD.expired)
+    WHERE _id IN ('global', 'user:' || OLD.user_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_links_expire AFTER UPDATE OF expired ON links WHEN NEW.expired = 1 AND OLD.expired = 0 BEGIN
+    UPDATE counters SET active_links = active_links - 1 WHERE _id IN ('global', 'user:' || OLD.user_id);
+END;
+
+-- Active link hata ya expire ho toh uske storage message ka refcount ghatao (claim app karta hai)
+CREATE TRIGGER IF NOT EXISTS trg_links_release_delete AFTER DELETE ON links WHEN OLD.file_unique_id IS NOT NULL AND OLD.expired = 0 BEGIN
+    UPDATE contents SET refs = refs - 1 WHERE _id = OLD.file_unique_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_links_release_expire AFTER UPDATE OF expired ON links
+WHEN NEW.expired = 1 AND OLD.expired = 0 AND OLD.file_unique_id IS NOT NULL BEGIN
+    UPDATE contents SET refs = refs - 1 WHERE _id = OLD.file_unique_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_links_tokens_delete AFTER DELETE ON links BEGIN
+    DELETE FROM link_tokens WHERE user_id = OLD.user_id AND link_id = OLD._id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_users_insert AFTER INSERT ON users BEGIN
+    INSERT INTO counters (_id, users) VALUES ('global', 1)
+    ON CONFLICT(_id) DO UPDATE SET users = users + 1;
+END;
+"""
+
+def _to_db(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=" ", timespec="microseconds")
+    return value
+
+def _row_to_doc(row):
+    if row is None:
+        return None
+    doc = dict(row)
+    for key in _DATETIME_COLUMNS & doc.keys():
+        if doc[key]:
+            doc[key] = datetime.datetime.fromisoformat(doc[key])
+    if "backups" in doc:
+        doc["backups"] = json.loads(doc["backups"] or "{}")
+    return doc
+
+
+class SQLiteDatabase(BaseDatabase):
+    """
+    Embedded SQLite backend (WAL mode). Saari queries ek dedicated thread par chalti hain
+    taaki event loop block na ho aur connection ek hi thread se use ho.
+    """
+    backend_name = "SQLite (embedded)"
+
+    def __init__(self, url: str):
+        super().__init__()
+        # sqlite:///database.db -> database.db, sqlite:////data/app.db -> /data/app.db
+        path = url.split(":", 1)[1]
+        self.path = (path[3:] if path.startswith("///") else path.lstrip("/")) or "database.db"
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _fetchone(self, sql, params=()):
+        return _row_to_doc(await self._run(lambda: self._conn.execute(sql, params).fetchone()))
+
+    async def _fetchall(self, sql, params=()):
+        rows = await self._run(lambda: self._conn.execute(sql, params).fetchall())
+        return [_row_to_doc(r) for r in rows]
+
+    async def _execute(self, sql, params=()):
+        def op():
+            with self._conn:
+                return self._conn.execute(sql, params).rowcount
+        return await self._run(op)
+
+    async def connect(self):
+        print(f"Connecting to SQLite ({self.path})...")
+        await self._run(self._open)
+        await self._start_background_tasks()
+        print("✅ Database connection established (SQLite).")
+
+    def _open(self):
+        # cached_statements: prepared statements reuse hote hain (har query dobara compile nahi hoti)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=256, isolation_level="DEFERRED")
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._migrate_legacy_links()
+        self._conn.executescript(_SCHEMA)
+        for table, column, decl in _ADDED_COLUMNS:
+            if column not in {r["name"] for r in self._conn.execute(f"PRAGMA table_info({table})")}:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        self._conn.executescript(_INDEXES_AND_TRIGGERS)
+        self._backfill_name_tokens()
+        self._conn.commit()
+        print("✅ Database indexes created/verified.")
+
+    def _migrate_legacy_links(self):
+        # Purani database.db mein links(unique_id, message_id) table tha, usse naye schema mein le aao
+        cols = {r["name"] for r in self._conn.execute("PRAGMA table_info(links)")}
+        if cols and "_id" not in cols:
+            print("Migrating legacy SQLite links table...")
+            with self._conn:
+                self._conn.execute("ALTER TABLE links RENAME TO links_legacy")
+                self._conn.executescript(_SCHEMA)
+                self._conn.execute("INSERT OR IGNORE INTO links (_id, msg_id) SELECT unique_id, message_id FROM links_legacy WHERE message_id IS NOT NULL")
+                self._conn.execute("DROP TABLE links_legacy")
+
+    def _backfill_name_tokens(self):
+        # Search feature se pehle ki database: saare links ke tokens ek baar bana do
+        if self._conn.execute("SELECT 1 FROM link_tokens LIMIT 1").fetchone():
+            return
+        rows = self._conn.execute("SELECT _id, user_id, file_name FROM links").fetchall()
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO link_tokens (user_id, token, link_id) VALUES (?, ?, ?)",
+            [(r["user_id"], t, r["_id"]) for r in rows for t in self._name_tokens(r["file_name"])]
+        )
+
+    def _write_tokens(self, docs):
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO link_tokens (user_id, token, link_id) VALUES (?, ?, ?)",
+            [(d["user_id"], t, d["_id"]) for d in docs for t in d["name_tokens"]]
+        )
+
+    async def _close(self):
+        if self._conn:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+    def _user_columns(self):
+        return {r["name"] for r in self._conn.execute("PRAGMA table_info(users)")}
+
+    async def _write_user_updates(self, batch: dict):
+        def op():
+            allowed = self._user_columns()
+            # Same field-set wale updates ek executemany mein jaate hain
+            groups = {}
+            for uid, fields in batch.items():
+                fields = {k: v for k, v in fields.items() if k in allowed and k != "_id"}
+                if fields:
+                    groups.setdefault(tuple(sorted(fields)), []).append((uid, fields))
+            with self._conn:
+                for cols, rows in groups.items():
+                    sql = (
+                        f"INSERT INTO users (_id, {', '.join(cols)}) VALUES (?{', ?' * len(cols)}) "
+                        f"ON CONFLICT(_id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in cols)}"
+                    )
+                    self._conn.executemany(sql, [(uid, *(_to_db(f[c]) for c in cols)) for uid, f in rows])
+        await self._run(op)
+
+    async def save_link(self, unique_id, message_id, backups: dict, file_name: str = "Unknown", file_size: str = "Unknown", user_id: int = 0, expiry_date: datetime.datetime = None, file_size_bytes: int = 0, file_unique_id: str = None):
+        # Upsert (REPLACE nahi) taaki counters triggers sirf naye link par fire hon
+        def op():
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO links (_id, msg_id, backups, file_name, file_size, user_id, timestamp, date_str, expiry_date, file_size_bytes, file_unique_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(_id) DO UPDATE SET msg_id = excluded.msg_id, backups = excluded.backups, file_name = excluded.file_name, "
+                    "file_size = excluded.file_size, expiry_date = excluded.expiry_date",
+                    (unique_id, int(message_id), json.dumps(backups or {}), file_name, file_size, user_id,
+                     int(time.time()), time.strftime("%Y-%m-%d %H:%M:%S"), _to_db(expiry_date), int(file_size_bytes or 0), file_unique_id)
+                )
+                # Name badla ho sakta hai: tokens dobara likho
+                self._conn.execute("DELETE FROM link_tokens WHERE user_id = ? AND link_id = ?", (user_id, unique_id))
+                self._write_tokens([{"_id": unique_id, "user_id": user_id, "name_tokens": self._name_tokens(file_name)}])
+        await self._run(op)
+        # Also track user (write-behind, flushed in batches)
+        if user_id:
+            self._buffer_user_update(user_id, {"last_active": int(time.time())})
+        print(f"DEBUG DB: Saved {unique_id} to SQLite.")
+
+    async def save_links(self, links: list):
+        # Ek transaction, ek executemany; counters triggers se apne aap update hote hain
+        docs = [self._new_link_doc(**link) for link in links]
+        if not docs:
+            return
+        def op():
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO links (_id, msg_id, backups, file_name, file_size, user_id, timestamp, date_str, expiry_date, file_size_bytes, file_unique_id) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(d["_id"], d["msg_id"], json.dumps(d["backups"] or {}), d["file_name"], d["file_size"], d["user_id"],
+                      d["timestamp"], d["date_str"], _to_db(d["expiry_date"]), d["file_size_bytes"], d["file_unique_id"]) for d in docs]
+                )
+                self._write_tokens(docs)
+        await self._run(op)
+        for user_id in {d["user_id"] for d in docs if d["user_id"]}:
+            self._buffer_user_update(user_id, {"last_active": int(time.time())})
+        print(f"DEBUG DB: Saved {len(docs)} links to SQLite.")
+
+    async def _find_link(self, unique_id):
+        return await self._fetchone("SELECT * FROM links WHERE _id = ?", (unique_id,))
+
+    # --- SUBSCRIPTION METHODS ---
+
+    async def get_user_data(self, user_id):
+        user = await self._fetchone("SELECT * FROM users WHERE _id = ?", (user_id,))
+        if not user:
+            # Create default free user
+            user = self._new_user_doc(user_id)
+            await self._execute(
+                "INSERT OR IGNORE INTO users (_id, plan, plan_expiry, daily_count, last_usage_date) VALUES (?, ?, ?, ?, ?)",
+                (user_id, user["plan"], None, user["daily_count"], user["last_usage_date"])
+            )
+        return self._overlay_user_updates(user)
+
+    async def get_users_data(self, user_ids: list):
+        def op():
+            marks = ", ".join("?" * len(user_ids))
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO users (_id, plan, daily_count, last_usage_date) VALUES (?, ?, ?, ?)",
+                    [(d["_id"], d["plan"], d["daily_count"], d["last_usage_date"]) for d in map(self._new_user_doc, user_ids)]
+                )
+                return self._conn.execute(f"SELECT * FROM users WHERE _id IN ({marks})", list(user_ids)).fetchall()
+        if not user_ids:
+            return {}
+        return {doc["_id"]: self._overlay_user_updates(doc) for doc in map(_row_to_doc, await self._run(op))}
+
+    async def set_user_plan(self, user_id, plan_name, expiry_date: datetime.datetime):
+        await self._execute(
+            "INSERT INTO users (_id, plan, plan_expiry) VALUES (?, ?, ?) "
+            "ON CONFLICT(_id) DO UPDATE SET plan = excluded.plan, plan_expiry = excluded.plan_expiry",
+            (user_id, plan_name, _to_db(expiry_date))
+        )
+
+    async def get_user_links(self, user_id, limit=20):
+        return await self._fetchall("SELECT * FROM links WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?", (user_id, limit))
+
+    async def get_user_active_links(self, user_id, limit=5):
+        # Filter: Expiry is None OR Expiry > Now
+        return await self._fetchall(
+            "SELECT * FROM links WHERE user_id = ? AND (expiry_date IS NULL OR expiry_date > ?) ORDER BY timestamp DESC LIMIT ?",
+            (user_id, _to_db(datetime.datetime.now()), limit)
+        )
+
+    async def get_all_user_active_links(self, user_id):
+        return await self._fetchall(
+            "SELECT * FROM links WHERE user_id = ? AND (expiry_date IS NULL OR expiry_date > ?) ORDER BY timestamp DESC",
+            (user_id, _to_db(datetime.datetime.now()))
+        )
+
+    async def get_user_links_by_ids(self, user_id, ids: list):
+        if not ids:
+            return []
+        marks = ", ".join("?" * len(ids))
+        return await self._fetchall(
+            f"SELECT * FROM links WHERE _id IN ({marks}) AND user_id = ? AND (expiry_date IS NULL OR expiry_date > ?)",
+            [*ids, user_id, _to_db(datetime.datetime.now())]
+        )
+
+    async def search_user_links(self, user_id, query: str = "", sort: str = "newest", skip: int = 0, limit: int = 30):
+        # Har query token ek prefix range scan (user_id, token) primary key par
+        sql = "SELECT * FROM links WHERE user_id = ? AND (expiry_date IS NULL OR expiry_date > ?)"
+        params = [user_id, _to_db(datetime.datetime.now())]
+        for token in self._name_tokens(query):
+            sql += " AND _id IN (SELECT link_id FROM link_tokens WHERE user_id = ? AND token >= ? AND token < ?)"
+            params += [user_id, token, token + "\uffff"]
+        # _id tie-breaker: same second mein bane links pages ke beech repeat/skip na hon
+        sql += {
+            "oldest": " ORDER BY timestamp ASC, _id ASC",
+            "name_asc": " ORDER BY file_name COLLATE NOCASE ASC, _id ASC",
+            "name_desc": " ORDER BY file_name COLLATE NOCASE DESC, _id DESC",
+        }.get(sort, " ORDER BY timestamp DESC, _id DESC")
+        sql += " LIMIT ? OFFSET ?"
+        return await self._fetchall(sql, (*params, limit, skip))
+
+    async def get_all_links(self):
+        return await self._fetchall("SELECT * FROM links ORDER BY timestamp DESC LIMIT 100") # Cap at 100 for safety
+
+    async def delete_link(self, unique_id):
+        await self._execute("DELETE FROM links WHERE _id = ?", (unique_id,))
+
+    async def _get_counter_doc(self, key):
+        return await self._fetchone("SELECT * FROM counters WHERE _id = ?", (key,))
+
+    async def expire_links(self):
+        # trg_links_expire active_links counters ghata deta hai
+        return await self._execute(
+            "UPDATE links SET expired = 1 WHERE expired = 0 AND expiry_date IS NOT NULL AND expiry_date <= ?",
+            (_to_db(datetime.datetime.now()),)
+        )
+
+    async def reconcile_counters(self):
+        def op():
+            with self._conn:
+                self._conn.execute("DELETE FROM counters")
+                self._conn.execute(
+                    "INSERT INTO counters (_id, links, bytes, active_links) "
+                    "SELECT 'user:' || user_id, COUNT(*), SUM(file_size_bytes), SUM(1 - expired) FROM links GROUP BY user_id"
+                )
+                self._conn.execute(
+                    "INSERT INTO counters (_id, links, bytes, active_links, users) "
+                    "SELECT 'global', COUNT(*), COALESCE(SUM(file_size_bytes), 0), COALESCE(SUM(1 - expired), 0), (SELECT COUNT(*) FROM users) FROM links"
+                )
+                # Content refcounts bhi active links se dobara (abhi claim hue contents chhod do: unka link save ho raha ho sakta hai)
+                self._conn.execute(
+                    "UPDATE contents SET refs = (SELECT COUNT(*) FROM links WHERE links.file_unique_id = contents._id AND links.expired = 0) "
+                    "WHERE COALESCE(updated, 0) < ?",
+                    (int(time.time()) - 600,)
+                )
+        await self._run(op)
+
+    async def get_all_users(self):
+        return await self._fetchall("SELECT _id FROM users")
+
+    async def _insert_ban(self, user_id, reason):
+        await self._execute(
+            "INSERT INTO banned (_id, reason) VALUES (?, ?) ON CONFLICT(_id) DO UPDATE SET reason = excluded.reason",
+            (user_id, reason)
+        )
+
+    async def _delete_ban(self, user_id):
+        await self._execute("DELETE FROM banned WHERE _id = ?", (user_id,))
+
+    async def _load_banned_ids(self):
+        return [row["_id"] for row in await self._fetchall("SELECT _id FROM banned")]
+
+    async def add_revocation(self, unique_id, until: int):
+        def op():
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO revocations (_id, until) VALUES (?, ?) ON CONFLICT(_id) DO UPDATE SET until = MAX(until, excluded.until)",
+                    (unique_id, int(until))
+                )
+                # Expired revocations ki zarurat nahi: tab tak ke saare tokens expire ho chuke
+                self._conn.execute("DELETE FROM revocations WHERE until <= ?", (int(time.time()),))
+        await self._run(op)
+
+    async def get_revocations(self):
+        rows = await self._fetchall("SELECT _id, until FROM revocations WHERE until > ?", (int(time.time()),))
+        return {row["_id"]: row["until"] for row in rows}
+
+    async def _watch_bans(self):
+        """
+        Same file ko share karne wale dusre processes (WEB_CONCURRENCY > 1) ke commits
+        PRAGMA data_version badal dete hain; sirf tab ban list reload hoti hai.
+        """
+        last_version = None
+        while True:
+            try:
+                version = (await self._fetchone("PRAGMA data_version"))["data_version"]
+                if version != last_version:
+                    self._banned_ids = set(await self._load_banned_ids())
+                last_version = version
+            except Exception as e:
+                print(f"⚠️ Ban list refresh failed: {e}")
+            await asyncio.sleep(Config.BAN_POLL_INTERVAL)
+
+    # --- CONTENT INDEX (file_unique_id -> storage message, refcounted) ---
+
+    async def claim_contents(self, counts: dict):
+        # Ek hi thread/transaction: refs badhana aur msg_id padhna atomic hai, purge beech mein nahi aa sakta.
+        # Purge ke liye marked content (message delete hone wala hai) claim nahi hota.
+        def op():
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE contents SET refs = refs + ?, updated = ? WHERE _id = ? AND purging IS NULL",
+                    [(n, int(time.time()), fuid) for fuid, n in counts.items()]
+                )
+                marks = ", ".join("?" * len(counts))
+                return self._conn.execute(
+                    f"SELECT _id, msg_id FROM contents WHERE _id IN ({marks}) AND purging IS NULL", list(counts)
+                ).fetchall()
+        if not counts:
+            return {}
+        return {row["_id"]: row["msg_id"] for row in await self._run(op)}
+
+    async def add_content(self, file_unique_id, message_id, file_size_bytes: int = 0):
+        def op():
+            with self._conn:
+                inserted = self._conn.execute(
+                    "INSERT OR IGNORE INTO contents (_id, msg_id, file_size_bytes, refs, created, updated) VALUES (?, ?, ?, 1, ?, ?)",
+                    (file_unique_id, int(message_id), int(file_size_bytes or 0), int(time.time()), int(time.time()))
+                ).rowcount
+                if inserted:
+                    return int(message_id)
+                row = self._conn.execute("SELECT msg_id, purging FROM contents WHERE _id = ?", (file_unique_id,)).fetchone()
+                if row["purging"] is not None:
+                    # Purane message ka purge chal raha hai: entry naye message ko de do (confirm msg_id match karke hi hatata hai)
+                    self._conn.execute(
+                        "UPDATE contents SET msg_id = ?, refs = 1, updated = ?, purging = NULL WHERE _id = ?",
+                        (int(message_id), int(time.time()), file_unique_id)
+                    )
+                    return int(message_id)
+                # Kisi aur ne pehle register kiya: usi ko claim karo
+                self._conn.execute("UPDATE contents SET refs = refs + 1, updated = ? WHERE _id = ?", (int(time.time()), file_unique_id))
+                return row["msg_id"]
+        return await self._run(op)
+
+    async def release_contents(self, counts: dict):
+        def op():
+            with self._conn:
+                self._conn.executemany("UPDATE contents SET refs = refs - ? WHERE _id = ?", [(n, fuid) for fuid, n in counts.items()])
+        if counts:
+            await self._run(op)
+
+    async def pop_orphan_contents(self, limit: int = 100):
+        # Sirf mark: entry confirm_orphan_purge (delete_messages safal hone ke baad) hatata hai
+        def op():
+            with self._conn:
+                rows = self._conn.execute("SELECT _id, msg_id FROM contents WHERE refs <= 0 LIMIT ?", (limit,)).fetchall()
+                self._conn.executemany(
+                    "UPDATE contents SET purging = ? WHERE _id = ? AND refs <= 0", [(int(time.time()), r["_id"]) for r in rows]
+                )
+                return [r["msg_id"] for r in rows]
+        return await self._run(op)
+
+    async def confirm_orphan_purge(self, msg_ids: list):
+        if msg_ids:
+            marks = ", ".join("?" * len(msg_ids))
+            await self._execute(f"DELETE FROM contents WHERE msg_id IN ({marks}) AND purging IS NOT NULL", [int(m) for m in msg_ids])
+
+    # --- DOWNLOAD ANALYTICS ---
+
+    async def record_download_stats(self, rows: list):
+        def op():
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO download_stats (unique_id, bucket, owner, hits, bytes) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(unique_id, bucket) DO UPDATE SET hits = hits + excluded.hits, bytes = bytes + excluded.bytes",
+                    [(r["unique_id"], r["bucket"], r["owner"], r["hits"], r["bytes"]) for r in rows]
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO download_viewers (unique_id, bucket, viewer) VALUES (?, ?, ?)",
+                    [(r["unique_id"], r["bucket"], v) for r in rows for v in r["viewers"]]
+                )
+                # Retention: purane buckets hata do
+                cutoff = int(time.time()) - Config.ANALYTICS_RETENTION_DAYS * 86400
+                self._conn.execute("DELETE FROM download_stats WHERE bucket < ?", (cutoff,))
+                self._conn.execute("DELETE FROM download_viewers WHERE bucket < ?", (cutoff,))
+        await self._run(op)
+
+    async def get_hot_files(self, since: int, limit: int = 10):
+        return await self._fetchall(
+            "SELECT s.unique_id, MAX(s.owner) AS owner, SUM(s.hits) AS hits, SUM(s.bytes) AS bytes, "
+            "(SELECT COUNT(DISTINCT viewer) FROM download_viewers v WHERE v.unique_id = s.unique_id AND v.bucket >= ?) AS viewers "
+            "FROM download_stats s WHERE s.bucket >= ? GROUP BY s.unique_id ORDER BY hits DESC LIMIT ?",
+            (since, since, limit)
+        )
+
+    async def get_owner_download_stats(self, owner: int, since: int):
+        row = await self._fetchone(
+            "SELECT COALESCE(SUM(hits), 0) AS hits, COALESCE(SUM(bytes), 0) AS bytes, "
+            "(SELECT COUNT(DISTINCT v.viewer) FROM download_viewers v JOIN download_stats s2 "
+            " ON s2.unique_id = v.unique_id AND s2.bucket = v.bucket WHERE s2.owner = ? AND v.bucket >= ?) AS viewers "
+            "FROM download_stats WHERE owner = ? AND bucket >= ?",
+            (owner, since, owner, since)
+        )
+        return row
+
+    # --- BROADCASTS ---
+
+    async def get_broadcast_targets(self, after_user_id: int, limit: int):
+        rows = await self._fetchall(
+            "SELECT _id FROM users WHERE _id > ? AND blocked = 0 ORDER BY _id LIMIT ?", (after_user_id, limit)
+        )
+        return [row["_id"] for row in rows]
+
+    async def create_broadcast(self, job: dict):
+        cols = list(job)
+        # _id hi idempotency key hai: same key dobara insert nahi hoti
+        return bool(await self._execute(
+            f"INSERT OR IGNORE INTO broadcasts ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})",
+            tuple(str(job[c]) if c == "source_chat" else job[c] for c in cols)
+        ))
+
+    async def update_broadcast(self, broadcast_id, fields: dict):
+        cols = list(fields)
+        await self._execute(
+            f"UPDATE broadcasts SET {', '.join(f'{c} = ?' for c in cols)} WHERE _id = ?",
+            (*(fields[c] for c in cols), broadcast_id)
+        )
+
+    async def get_running_broadcasts(self):
+        jobs = await self._fetchall("SELECT * FROM broadcasts WHERE status = 'running' ORDER BY created")
+        for job in jobs:
+            # source_chat int id ya @username dono ho sakta hai
+            chat = job["source_chat"]
+            job["source_chat"] = int(chat) if chat.lstrip("-").isdigit() else chat
+        return jobs
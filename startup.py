@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+class StartupGraph:
+    """
+    Startup steps ka chhota dependency graph.
+    Independent steps ek saath (concurrently) chalte hain, har step ka time log hota hai.
+    `background=True` wale steps ka intezaar nahi hota: server unke bina hi ready ho jaata hai.
+    """
+
+    def __init__(self):
+        self._steps = {}
+        self.tasks = {}
+
+    def add(self, name, fn, after=(), background=False, timeout=None):
+        self._steps[name] = {"fn": fn, "after": tuple(after), "background": background, "timeout": timeout}
+        return self
+
+    async def _run_step(self, name, step, started):
+        for dep in step["after"]:
+            if not await self.tasks[dep]:
+                print(f"⏭️ Startup [{name}] skipped: dependency '{dep}' failed.")
+                return False
+        t0 = time.monotonic()
+        try:
+            if step["timeout"]:
+                await asyncio.wait_for(step["fn"](), step["timeout"])
+            else:
+                await step["fn"]()
+            print(f"⏱️ Startup [{name}] done in {time.monotonic() - t0:.2f}s (t+{time.monotonic() - started:.2f}s)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Startup [{name}] failed after {time.monotonic() - t0:.2f}s: {type(e).__name__}: {e}")
+            return False
+
+    async def run(self, budget: float):
+        """
+        Saare steps schedule karta hai aur foreground steps ka `budget` seconds tak intezaar karta hai.
+        Budget khatam hone par bache steps background mein chalte rehte hain.
+        """
+        started = time.monotonic()
+        for name, step in self._steps.items():
+            self.tasks[name] = asyncio.create_task(self._run_step(name, step, started))
+
+        foreground = [self.tasks[n] for n, step in self._steps.items() if not step["background"]]
+        if foreground:
+            _, pending = await asyncio.wait(foreground, timeout=budget)
+            if pending:
+                print(f"⚠️ Startup budget ({budget:.0f}s) exceeded; {len(pending)} step(s) continue in background.")
+        print(f"⏱️ Startup critical path finished in {time.monotonic() - started:.2f}s.")
+        return self.tasks
+
+    def cancel(self):
+        for task in self.tasks.values():
+            task.cancel()
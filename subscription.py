@@ -26,7 +26,7 @@ PLANS = {
     }
 }
 
-async def get_plan_status(user_id: int):
+async def get_plan_status(user_id: int, user_data: dict = None):
     # Admin Override
     if user_id == Config.OWNER_ID:
         return {
@@ -38,7 +38,9 @@ async def get_plan_status(user_id: int):
             "current_count": "Unlimited"
         }
 
-    user_data = await db.get_user_data(user_id)
+    # UserContext pehle se loaded doc de sakta hai (dobara DB read nahi)
+    if user_data is None:
+        user_data = await db.get_user_data(user_id)
     plan_name = user_data.get("plan", "free")
     plan_expiry = user_data.get("plan_expiry")
     
@@ -75,8 +77,9 @@ def _get_link_expiry(plan_name):
     days = PLANS[plan_name]["link_expiry_days"]
     return datetime.datetime.now() + datetime.timedelta(days=days)
 
-async def increment_user_usage(user_id):
-    user_data = await db.get_user_data(user_id)
+async def increment_user_usage(user_id, count=1, user_data: dict = None):
+    if user_data is None:
+        user_data = await db.get_user_data(user_id)
     current_count = user_data.get("daily_count", 0)
     # Ensure date is today before incrementing (safety check, though get_plan_status usually handles reset)
     today_str = datetime.date.today().isoformat()
@@ -85,4 +88,6 @@ async def increment_user_usage(user_id):
     if last_usage != today_str:
         current_count = 0
     
-    await db.update_user_usage(user_id, daily_count=current_count + 1, date_str=today_str)
+    await db.update_user_usage(user_id, daily_count=current_count + count, date_str=today_str)
+    # Loaded doc bhi fresh rahe (same update mein dobara use ho sakta hai)
+    user_data["daily_count"], user_data["last_usage_date"] = current_count + count, today_str
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests repo root ke modules (config, sqlite_database, zipstream...) seedha import karte hain
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+
+import metrics
+import server_timing
+from metrics import Counter, Gauge, Histogram, Registry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Har test ka apna registry: module wale (app) metrics output mein na aayein
+    reg = Registry()
+    monkeypatch.setattr(metrics, "registry", reg)
+    return reg
+
+
+def test_render_counter_histogram_and_function_gauge(registry):
+    sent = Counter("sent_total", 'Sent "things"\nsecond line', ("client",))
+    sent.labels("bot-1").inc()
+    sent.labels("bot-1").inc(4)
+    sent.labels('we"ird').inc()
+
+    latency = Histogram("op_seconds", "Op latency", ("op",), buckets=(0.5, 0.1, 1.0))
+    child = latency.labels("get")
+    for value in (0.05, 0.1, 0.3, 2.0):
+        child.observe(value)
+
+    loads = Gauge("loads", "Active streams", ("client",))
+    loads.set_function(lambda: {(0,): 3, (1,): 0})
+
+    assert registry.render() == "\n".join([
+        '# HELP sent_total Sent \\"things\\"\\nsecond line',
+        "# TYPE sent_total counter",
+        'sent_total{client="bot-1"} 5',
+        'sent_total{client="we\\"ird"} 1',
+        "# HELP op_seconds Op latency",
+        "# TYPE op_seconds histogram",
+        # Buckets sorted aur cumulative; le=0.1 wala value us bucket mein (<=)
+        'op_seconds_bucket{op="get",le="0.1"} 2',
+        'op_seconds_bucket{op="get",le="0.5"} 3',
+        'op_seconds_bucket{op="get",le="1.0"} 3',
+        'op_seconds_bucket{op="get",le="+Inf"} 4',
+        'op_seconds_sum{op="get"} 2.45',
+        'op_seconds_count{op="get"} 4',
+        "# HELP loads Active streams",
+        "# TYPE loads gauge",
+        'loads{client="0"} 3',
+        'loads{client="1"} 0',
+    ]) + "\n"
+
+
+def test_unlabelled_metrics_and_validation(registry):
+    files = Counter("files_total", "Files")
+    files.inc()
+    level = Gauge("level", "Level")
+    level.labels().set(7)
+    assert "files_total 1\n" in registry.render()
+    assert "level 7\n" in registry.render()
+
+    with pytest.raises(ValueError):
+        Counter("files_total", "Duplicate")
+    with pytest.raises(ValueError):
+        Counter("pairs_total", "Pairs", ("a", "b")).labels("only-one")
+
+
+def test_time_methods_observes_public_coroutines(registry):
+    class FakeDB:
+        def __init__(self):
+            self.calls = []
+
+        async def get_link(self, unique_id):
+            self.calls.append(unique_id)
+            return unique_id.upper()
+
+        async def fail(self):
+            raise RuntimeError("boom")
+
+        async def _private(self):
+            return "untouched"
+
+        def sync_helper(self):
+            return "untouched"
+
+    hist = Histogram("db_seconds", "DB latency", ("method",))
+    db = metrics.time_methods(FakeDB(), hist)
+
+    async def main():
+        timeline = server_timing.Timeline("/dl/x")
+        token = server_timing._current.set(timeline)
+        try:
+            assert await db.get_link("abc") == "ABC"
+            with pytest.raises(RuntimeError):
+                await db.fail()
+            assert await db._private() == "untouched"
+        finally:
+            server_timing._current.reset(token)
+        return timeline
+
+    timeline = asyncio.run(main())
+    assert db.calls == ["abc"] and db.get_link.__name__ == "get_link"
+    assert db.sync_helper() == "untouched"
+    # Exception par bhi latency record hoti hai; private methods wrap nahi hote
+    assert set(hist._children) == {("get_link",), ("fail",)}
+    assert sum(hist.labels("get_link").counts) == 1 and sum(hist.labels("fail").counts) == 1
+    assert [name for name, _, _ in timeline.phases] == ["db.get_link", "db.fail"]
@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+import mongomock.collection
+
+from database import Database
+
+
+@pytest.fixture
+def mongo(monkeypatch):
+    # pymongo 4.x UpdateOne bulk ops mein `sort` bhejta hai, mongomock use nahi jaanta
+    original = mongomock.collection.BulkOperationBuilder.add_update
+
+    def add_update(self, *args, **kwargs):
+        kwargs.pop("sort", None)
+        return original(self, *args, **kwargs)
+    monkeypatch.setattr(mongomock.collection.BulkOperationBuilder, "add_update", add_update)
+
+    def make():
+        # connect() ke background loops ke bina
+        db = Database("mongodb://test")
+        db._client = mongomock_motor.AsyncMongoMockClient()
+        db.db = db._client["UnivoraStreamDrop"]
+        db.col = db.db.links
+        return db
+    return make
+
+
+def link(unique_id, user_id, size=100):
+    return {"unique_id": unique_id, "message_id": 1, "backups": {}, "user_id": user_id, "file_size_bytes": size}
+
+
+def test_reconcile_fixes_drift_and_drops_stale_user_counters(mongo):
+    async def body():
+        db = mongo()
+        await db.save_links([link("a", 1), link("b", 1), link("c", 2)])
+        await db.db.counters.update_one({"_id": "user:1"}, {"$set": {"links": 40}})
+        await db._inc_counters(3, links=1, size=5, active=1)  # user 3 ka koi link nahi: stale
+
+        await db.reconcile_counters()
+        assert (await db._get_counter_doc("user:1"))["links"] == 2
+        assert (await db._get_counter_doc("user:2"))["bytes"] == 100
+        assert await db._get_counter_doc("user:3") is None
+        assert (await db._get_counter_doc("global"))["links"] == 3
+    asyncio.run(body())
+
+
+def test_increments_during_reconcile_are_not_lost(mongo):
+    async def body():
+        db = mongo()
+        await db.save_links([link("a", 1), link("b", 2)])
+        aggregate = db.col.aggregate
+        calls = []
+
+        def aggregate_then_upload(pipeline, **kwargs):
+            cursor = aggregate(pipeline, **kwargs)
+
+            async def rows():
+                async for row in cursor:
+                    yield row
+                if not calls:
+                    calls.append(1)
+                    # Aggregation ke baad, counters likhne se pehle: naye uploader ka pehla link
+                    # aur ek purane user ka naya link (dono ke $inc aa chuke)
+                    await db.save_link("n1", 1, {}, user_id=9, file_size_bytes=7)
+                    await db.save_link("b2", 1, {}, user_id=2, file_size_bytes=3)
+            return rows()
+        db.col.aggregate = aggregate_then_upload
+
+        await db.reconcile_counters()
+        new_user = await db._get_counter_doc("user:9")
+        assert (new_user["links"], new_user["bytes"]) == (1, 7)
+        assert (await db._get_counter_doc("user:2"))["links"] == 2
+        assert (await db._get_counter_doc("global"))["links"] == 4
+
+        # Agla run (bina race ke) sab kuch links se match karta hai
+        db.col.aggregate = aggregate
+        await db.reconcile_counters()
+        assert (await db._get_counter_doc("user:9"))["links"] == 1
+        assert (await db._get_counter_doc("global"))["links"] == 4
+    asyncio.run(body())
+
+
+def test_download_viewers_are_deduplicated_outside_stats_docs(mongo):
+    async def body():
+        db = mongo()
+        bucket = 1_700_000_000
+        await db.record_download_stats([
+            {"unique_id": "a", "bucket": bucket, "owner": 1, "hits": 3, "bytes": 30, "viewers": ["v1", "v2"]},
+            {"unique_id": "b", "bucket": bucket, "owner": 1, "hits": 1, "bytes": 10, "viewers": ["v1"]},
+        ])
+        await db.record_download_stats([
+            {"unique_id": "a", "bucket": bucket + 3600, "owner": 1, "hits": 2, "bytes": 20, "viewers": ["v1", "v3"]},
+        ])
+
+        doc = await db.db.download_stats.find_one({"_id": f"a:{bucket}"})
+        assert "viewers" not in doc
+        hot = {r["unique_id"]: r for r in await db.get_hot_files(bucket)}
+        assert (hot["a"]["hits"], hot["a"]["viewers"]) == (5, 3)
+        assert hot["b"]["viewers"] == 1
+        assert await db.get_owner_download_stats(1, bucket) == {"hits": 6, "bytes": 60, "viewers": 3}
+        assert await db.get_owner_download_stats(2, bucket) == {"hits": 0, "bytes": 0, "viewers": 0}
+    asyncio.run(body())
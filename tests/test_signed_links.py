@@ -0,0 +1,81 @@
+import datetime
+import time
+
+import pytest
+
+from config import Config
+from signed_links import LinkSigner, _b64, _unb64
+
+
+@pytest.fixture
+def signer(monkeypatch):
+    monkeypatch.setattr(Config, "LINK_SIGNING_SECRET", "test-secret")
+    monkeypatch.setattr(Config, "SIGNED_URL_TTL", 3600)
+    return LinkSigner()
+
+
+def test_sign_and_verify_round_trip(signer):
+    data = signer.verify(signer.sign("abc123", 42, 7))
+    assert (data["unique_id"], data["msg_id"], data["owner_id"]) == ("abc123", 42, 7)
+    # Lifetime TTL se 2*TTL tak
+    assert time.time() + 3600 <= data["exp"] <= time.time() + 2 * 3600
+
+
+def test_tampered_payload_or_signature_is_rejected(signer, monkeypatch):
+    payload, sig = signer.sign("abc123", 42, 7).split(".")
+    raw = bytearray(_unb64(payload))
+    raw[7] ^= 1  # msg_id badla
+    assert signer.verify(f"{_b64(bytes(raw))}.{sig}") is None
+
+    bad_sig = bytearray(_unb64(sig))
+    bad_sig[0] ^= 1
+    assert signer.verify(f"{payload}.{_b64(bytes(bad_sig))}") is None
+    # Doosre secret ka token bhi nahi chalta
+    assert LinkSigner().verify(f"{payload}.{sig}") is not None
+    monkeypatch.setattr(Config, "LINK_SIGNING_SECRET", "other-secret")
+    assert LinkSigner().verify(f"{payload}.{sig}") is None
+
+
+def test_expiry_is_capped_by_link_expiry(signer):
+    soon = datetime.datetime.now() + datetime.timedelta(minutes=5)
+    data = signer.verify(signer.sign("abc123", 42, 7, expiry_date=soon))
+    assert data["exp"] == int(soon.timestamp())
+
+    past = datetime.datetime.now() - datetime.timedelta(seconds=1)
+    assert signer.verify(signer.sign("abc123", 42, 7, expiry_date=past)) is None
+
+
+def test_revoked_link_does_not_verify(signer):
+    token = signer.sign("abc123", 42, 7)
+    other = signer.sign("zzz999", 43, 7)
+    signer.revoke("abc123")
+    assert signer.verify(token) is None
+    assert signer.is_revoked("abc123")
+    assert signer.verify(other) is not None
+    # Naya token bhi denylist se block hai
+    assert signer.verify(signer.sign("abc123", 42, 7)) is None
+
+
+def test_persisted_revocations_survive_a_new_signer(signer):
+    token = signer.sign("abc123", 42, 7)
+    until = signer.revoke("abc123")
+    assert until >= time.time() + 2 * 3600
+
+    # Restart: naya signer khaali denylist ke saath, DB wali list load hone par token phir block
+    fresh = LinkSigner()
+    assert fresh.verify(token) is not None
+    fresh.load_revocations({"abc123": until, "old": time.time() - 1})
+    assert fresh.verify(token) is None
+    assert not fresh.is_revoked("old")
+
+
+@pytest.mark.parametrize("token", ["", "nodot", ".", "a.b", "!!!.???", "é.ü", "AAAA.AAAA", "a.b.c", "A" * 40 + "." + "B" * 22])
+def test_malformed_token_returns_none(signer, token):
+    assert signer.verify(token) is None
+
+
+def test_chunk_key_round_trip(signer):
+    key = signer.chunk_key(42)
+    assert signer.verify_chunk_key(key) == 42
+    assert signer.verify_chunk_key(key[:-1] + ("A" if key[-1] != "A" else "B")) is None
+    assert signer.verify_chunk_key("43-" + key.partition("-")[2]) is None
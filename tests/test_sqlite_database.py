@@ -0,0 +1,235 @@
+import asyncio
+import datetime
+import time
+
+from config import Config
+from sqlite_database import SQLiteDatabase
+
+
+def run(tmp_path, body):
+    """Temp file par fresh database (background loops ke bina) kholo, body chalao, band karo."""
+    async def main():
+        db = SQLiteDatabase(f"sqlite:///{tmp_path / 'test.db'}")
+        await db._run(db._open)
+        try:
+            return await body(db)
+        finally:
+            await db._close()
+    return asyncio.run(main())
+
+
+def link(unique_id, user_id=1, file_name="file.mp4", file_size_bytes=100, expiry_date=None, file_unique_id=None, message_id=10):
+    return {
+        "unique_id": unique_id, "message_id": message_id, "backups": {}, "file_name": file_name,
+        "file_size": f"{file_size_bytes} B", "user_id": user_id, "expiry_date": expiry_date,
+        "file_size_bytes": file_size_bytes, "file_unique_id": file_unique_id,
+    }
+
+
+def test_save_link_and_save_links(tmp_path):
+    async def body(db):
+        await db.save_link("a", 11, {"b1": 5}, "Alpha.mkv", "1 KB", user_id=7, file_size_bytes=1000)
+        await db.save_links([link("b", user_id=7, file_size_bytes=200), link("c", user_id=8, file_size_bytes=300)])
+        # Dobara save: upsert, counters dobara nahi badhne chahiye
+        await db.save_link("a", 12, {}, "Alpha renamed.mkv", "1 KB", user_id=7, file_size_bytes=1000)
+        await db.save_links([link("b", user_id=7, file_size_bytes=200)])
+
+        doc = await db.get_link_full("a")
+        assert doc["msg_id"] == 12 and doc["file_name"] == "Alpha renamed.mkv"
+        assert {d["_id"] for d in await db.get_user_links(7)} == {"a", "b"}
+        assert (await db._get_counter_doc("global"))["links"] == 3
+        user = await db._get_counter_doc("user:7")
+        assert (user["links"], user["bytes"], user["active_links"]) == (2, 1200, 2)
+        # Rename ke baad purane tokens se match nahi
+        assert [d["_id"] for d in await db.search_user_links(7, "renamed")] == ["a"]
+        assert await db.search_user_links(7, "zzz") == []
+    run(tmp_path, body)
+
+
+def test_search_user_links_filter_sort_and_paging(tmp_path):
+    async def body(db):
+        await db.save_links([
+            link("l1", file_name="Holiday Video 2023.mp4"),
+            link("l2", file_name="holiday_photos.zip"),
+            link("l3", file_name="Budget.xlsx"),
+            link("l4", file_name="Another holiday.mkv"),
+            link("other", user_id=2, file_name="holiday.mp4"),
+            link("gone", file_name="holiday old.mp4", expiry_date=datetime.datetime.now() - datetime.timedelta(days=1)),
+        ])
+        # Timestamps alag karo taaki newest/oldest deterministic ho
+        for i, uid in enumerate(["l1", "l2", "l3", "l4"]):
+            await db._execute("UPDATE links SET timestamp = ? WHERE _id = ?", (1000 + i, uid))
+
+        # Prefix match, case-insensitive; doosre user ka aur expired link nahi aata
+        assert [d["_id"] for d in await db.search_user_links(1, "HOLI")] == ["l4", "l2", "l1"]
+        assert [d["_id"] for d in await db.search_user_links(1, "holiday video")] == ["l1"]
+        assert [d["_id"] for d in await db.search_user_links(1, "", sort="oldest")] == ["l1", "l2", "l3", "l4"]
+        assert [d["_id"] for d in await db.search_user_links(1, "", sort="name_asc")] == ["l4", "l3", "l1", "l2"]
+        assert [d["_id"] for d in await db.search_user_links(1, "", sort="name_desc")] == ["l2", "l1", "l3", "l4"]
+
+        pages = [await db.search_user_links(1, "", skip=skip, limit=3) for skip in (0, 3)]
+        assert [[d["_id"] for d in page] for page in pages] == [["l4", "l3", "l2"], ["l1"]]
+    run(tmp_path, body)
+
+
+def test_get_user_links_by_ids_only_returns_own_valid_links(tmp_path):
+    async def body(db):
+        await db.save_links([
+            link("a"), link("b"), link("c"),
+            link("other", user_id=2),
+            link("gone", expiry_date=datetime.datetime.now() - datetime.timedelta(days=1)),
+        ])
+        found = await db.get_user_links_by_ids(1, ["b", "other", "gone", "missing", "a"])
+        assert sorted(d["_id"] for d in found) == ["a", "b"]
+        assert await db.get_user_links_by_ids(1, []) == []
+    run(tmp_path, body)
+
+
+def test_search_paging_is_stable_for_equal_timestamps(tmp_path):
+    async def body(db):
+        await db.save_links([link(f"s{i:02d}") for i in range(7)])
+        await db._execute("UPDATE links SET timestamp = 5")
+        seen = []
+        for skip in range(0, 7, 2):
+            seen += [d["_id"] for d in await db.search_user_links(1, skip=skip, limit=2)]
+        assert sorted(seen) == [f"s{i:02d}" for i in range(7)] and len(set(seen)) == 7
+    run(tmp_path, body)
+
+
+def test_expire_links_updates_counters_and_releases_refs(tmp_path):
+    async def body(db):
+        past = datetime.datetime.now() - datetime.timedelta(minutes=1)
+        future = datetime.datetime.now() + datetime.timedelta(days=1)
+        await db.add_content("fu1", 500, 100)
+        await db.claim_contents({"fu1": 1})
+        await db.save_links([
+            link("old", file_unique_id="fu1", expiry_date=past),
+            link("new", file_unique_id="fu1", expiry_date=future),
+            link("forever"),
+        ])
+        assert (await db._get_counter_doc("global"))["active_links"] == 3
+
+        assert await db.expire_links() == 1
+        # Dobara chalane par kuch nahi (trigger dobara fire nahi hona chahiye)
+        assert await db.expire_links() == 0
+        assert (await db._get_counter_doc("global"))["active_links"] == 2
+        assert (await db._get_counter_doc("user:1"))["active_links"] == 2
+        assert (await db._fetchone("SELECT refs FROM contents WHERE _id = 'fu1'"))["refs"] == 1
+
+        # Active link delete: counters aur refcount dono ghatte hain
+        await db.delete_link("new")
+        assert (await db._get_counter_doc("global"))["links"] == 2
+        assert (await db._fetchone("SELECT refs FROM contents WHERE _id = 'fu1'"))["refs"] == 0
+    run(tmp_path, body)
+
+
+def test_reconcile_counters_rebuilds_from_links(tmp_path):
+    async def body(db):
+        await db.save_links([link("a", user_id=1, file_size_bytes=10), link("b", user_id=2, file_size_bytes=20)])
+        await db.add_content("fu1", 500)
+        await db._execute("UPDATE contents SET refs = 9, updated = 0")
+        await db._execute("INSERT INTO counters (_id, links) VALUES ('user:99', 5)")
+        await db._execute("UPDATE counters SET links = 42, bytes = -1 WHERE _id = 'global'")
+
+        await db.reconcile_counters()
+        glob = await db._get_counter_doc("global")
+        assert (glob["links"], glob["bytes"], glob["active_links"]) == (2, 30, 2)
+        assert (await db._get_counter_doc("user:2"))["bytes"] == 20
+        assert await db._get_counter_doc("user:99") is None
+        assert (await db._fetchone("SELECT refs FROM contents WHERE _id = 'fu1'"))["refs"] == 0
+    run(tmp_path, body)
+
+
+def test_content_claim_add_and_two_phase_purge(tmp_path):
+    async def body(db):
+        assert await db.claim_contents({"fu1": 1}) == {}
+        assert await db.add_content("fu1", 500) == 500
+        # Race: dusre upload ne pehle register kiya, uska message reuse hota hai
+        assert await db.add_content("fu1", 501) == 500
+        assert await db.claim_contents({"fu1": 2}) == {"fu1": 500}
+        assert (await db._fetchone("SELECT refs FROM contents WHERE _id = 'fu1'"))["refs"] == 4
+
+        await db.release_contents({"fu1": 4})
+        assert await db.pop_orphan_contents() == [500]
+        # Purge marked: naya claim purane message par nahi jaata, entry abhi bhi hai
+        assert await db.claim_contents({"fu1": 1}) == {}
+        assert await db.pop_orphan_contents() == [500]
+
+        # delete_messages safal: entry hat jaati hai
+        await db.confirm_orphan_purge([500])
+        assert await db._fetchone("SELECT * FROM contents WHERE _id = 'fu1'") is None
+    run(tmp_path, body)
+
+
+def test_add_content_takes_over_purging_entry(tmp_path):
+    async def body(db):
+        await db.add_content("fu1", 500)
+        await db.release_contents({"fu1": 1})
+        assert await db.pop_orphan_contents() == [500]
+
+        # Purge ke beech same file dobara upload hui: entry naye message ki
+        assert await db.add_content("fu1", 600) == 600
+        # Purane message ka confirm naye entry ko nahi hatata
+        await db.confirm_orphan_purge([500])
+        row = await db._fetchone("SELECT msg_id, refs, purging FROM contents WHERE _id = 'fu1'")
+        assert (row["msg_id"], row["refs"], row["purging"]) == (600, 1, None)
+        assert await db.claim_contents({"fu1": 1}) == {"fu1": 600}
+    run(tmp_path, body)
+
+
+def test_concurrent_flushes_keep_read_your_writes(tmp_path):
+    async def body(db):
+        write = db._write_user_updates
+        gate = asyncio.Event()
+
+        async def slow_write(batch):
+            await gate.wait()
+            await write(batch)
+        db._write_user_updates = slow_write
+
+        db._buffer_user_update(5, {"plan": "pro"})
+        first = asyncio.create_task(db.flush_user_updates())
+        await asyncio.sleep(0.01)
+        db._buffer_user_update(5, {"daily_count": 3})
+        second = asyncio.create_task(db.flush_user_updates())
+        await asyncio.sleep(0.01)
+
+        # Dono batches abhi DB mein nahi: overlay se dikhne chahiye
+        user = (await db.get_users_data([5]))[5]
+        assert (user["plan"], user["daily_count"]) == ("pro", 3)
+        gate.set()
+        await asyncio.gather(first, second)
+        assert db._user_updates_inflight == []
+        db._write_user_updates = write
+        user = (await db.get_users_data([5]))[5]
+        assert (user["plan"], user["daily_count"]) == ("pro", 3)
+    run(tmp_path, body)
+
+
+def test_failing_flush_backs_off_and_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "USER_FLUSH_RETRIES", 2)
+
+    async def body(db):
+        async def broken(batch):
+            raise RuntimeError("db down")
+        db._write_user_updates = broken
+        db._buffer_user_update(5, {"plan": "pro"})
+
+        await db.flush_user_updates()
+        assert db._flush_retry_at > time.monotonic()
+        assert 5 in db._user_updates
+        await db.flush_user_updates()
+        await db.flush_user_updates()
+        # Teesri failure ke baad chhod diya
+        assert db._user_updates == {} and db._flush_attempts == {}
+    run(tmp_path, body)
+
+
+def test_revocations_persist_until_they_lapse(tmp_path):
+    async def body(db):
+        now = int(time.time())
+        await db.add_revocation("a", now + 100)
+        await db.add_revocation("a", now + 50)  # purana deny_until chhota nahi hota
+        await db.add_revocation("b", now - 1)
+        assert await db.get_revocations() == {"a": now + 100}
+    run(tmp_path, body)
@@ -0,0 +1,78 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import zipstream
+from zipstream import ZipEntry, ZipStream
+
+FILES = [("empty.txt", b""), ("a.bin", os.urandom(3000)), ("a.bin", os.urandom(70000)), ("c/d.txt", b"hello " * 500)]
+
+
+def make_archive():
+    def entry(i, name, data):
+        async def source(start, end):
+            # Telegram jaisa: chhote chunks mein
+            for pos in range(start, end + 1, 1024):
+                yield data[pos:min(pos + 1024, end + 1)]
+        return ZipEntry(f"test-{i}", name, len(data), 1700000000, source)
+    return ZipStream([entry(i, name, data) for i, (name, data) in enumerate(FILES)])
+
+
+def read(archive, start, end):
+    async def main():
+        return b"".join([chunk async for chunk in archive.iter_range(start, end)])
+    return asyncio.run(main())
+
+
+def setup_function():
+    zipstream._crc_cache.clear()
+
+
+def test_full_archive_round_trips_through_zipfile():
+    archive = make_archive()
+    data = read(archive, 0, archive.total_size - 1)
+    assert len(data) == archive.total_size
+
+    zf = zipfile.ZipFile(io.BytesIO(data))
+    assert zf.testzip() is None
+    assert zf.namelist() == ["empty.txt", "a.bin", "a (1).bin", "c_d.txt"]
+    for info, (_, content) in zip(zf.infolist(), FILES):
+        assert zf.read(info) == content
+
+
+def test_ranges_concatenate_to_full_archive():
+    full = read(make_archive(), 0, make_archive().total_size - 1)
+    zipstream._crc_cache.clear()
+
+    # Fresh process jaisa (koi CRC cached nahi): ranges ek ke baad ek, jaise resume karta client
+    archive = make_archive()
+    cuts = [0, 17, archive.entries[1].data_offset + 100, archive.entries[2].data_offset + 5000, archive.central_offset - 3, archive.total_size]
+    parts = [read(archive, lo, hi - 1) for lo, hi in zip(cuts, cuts[1:])]
+    assert b"".join(parts) == full
+
+
+def test_suffix_range_returns_archive_tail():
+    archive = make_archive()
+    full = read(archive, 0, archive.total_size - 1)
+    # bytes=-500 -> total-500 .. total-1 (zip_bundle yahi map karta hai)
+    assert read(archive, archive.total_size - 500, archive.total_size - 1) == full[-500:]
+
+
+def test_can_resume_from_needs_crc_of_finished_files():
+    archive = make_archive()
+    a, b = archive.entries[1], archive.entries[2]
+    # Sirf empty file khatam hui (CRC 0 pata hai) ya koi file khatam nahi hui
+    assert archive.can_resume_from(0)
+    assert archive.can_resume_from(a.data_offset)
+    assert archive.can_resume_from(a.data_offset + a.size - 1)
+    # a.bin poori ho chuki par uska CRC is process mein pata nahi
+    assert not archive.can_resume_from(a.data_offset + a.size)
+    assert not archive.can_resume_from(archive.total_size - 500)
+
+    read(archive, 0, b.data_offset + b.size)
+    assert archive.can_resume_from(b.data_offset + b.size)
+    assert not archive.can_resume_from(archive.central_offset)
+    # Naya ZipStream (naya request) bhi module cache se CRC le leta hai
+    read(archive, 0, archive.total_size - 1)
+    assert make_archive().can_resume_from(archive.total_size - 500)
@@ -0,0 +1,81 @@
+import asyncio
+
+from config import Config
+from database import db
+from subscription import get_plan_status, increment_user_usage
+
+class UserLoader:
+    """
+    DataLoader-style batching: ek event-loop tick mein jitne users ke docs maange gaye,
+    sab ek get_users_data ($in) query mein aate hain.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._scheduled = False
+        # Chal rahe _dispatch tasks ka strong reference (GC ho gaya toh saare load() futures latke rahenge)
+        self._tasks = set()
+
+    def load(self, user_id: int):
+        future = self._pending.get(user_id)
+        if future is None:
+            future = self._pending[user_id] = asyncio.get_running_loop().create_future()
+            if not self._scheduled:
+                self._scheduled = True
+                asyncio.get_running_loop().call_soon(self._spawn_dispatch)
+        return future
+
+    def _spawn_dispatch(self):
+        task = asyncio.create_task(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self):
+        batch, self._pending, self._scheduled = self._pending, {}, False
+        try:
+            users = await db.get_users_data(list(batch))
+            for user_id, future in batch.items():
+                if not future.done():
+                    future.set_result(users[user_id])
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+
+user_loader = UserLoader()
+
+
+class UserContext:
+    """
+    Ek update ke liye user ki state (doc + plan status). Doc pehli zaroorat par loader se ek baar aata hai,
+    phir plan check / usage increment dono isi ko reuse karte hain. Ban status pehle se in-memory set se aata hai.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._user = None
+        self._plan = None
+
+    @classmethod
+    def of(cls, message, user_id: int = None):
+        """Message ke saath attached context (group -1 handler lagata hai), warna naya."""
+        ctx = getattr(message, "user_ctx", None)
+        if ctx is None or (user_id is not None and ctx.user_id != user_id):
+            ctx = cls(user_id if user_id is not None else message.from_user.id)
+        return ctx
+
+    async def user(self):
+        if self._user is None:
+            self._user = await user_loader.load(self.user_id)
+        return self._user
+
+    async def plan_status(self):
+        if self._plan is None:
+            # Owner ka status doc par depend nahi karta
+            user = None if self.user_id == Config.OWNER_ID else await self.user()
+            self._plan = await get_plan_status(self.user_id, user)
+        return self._plan
+
+    async def increment_usage(self, count: int = 1):
+        await increment_user_usage(self.user_id, count, await self.user())
+        self._plan = None
@@ -0,0 +1,181 @@
+import asyncio
+import struct
+import time
+import zlib
+
+from config import Config
+
+# Store-only ZIP64 layout. Sizes pehle se pata hain, isliye poore archive ka Content-Length bhi pehle se nikal jaata hai;
+# sirf CRC32 stream karte waqt banta hai (data descriptor mein jaata hai, local header mein 0).
+_FLAGS = 0x0808        # bit 3: data descriptor, bit 11: UTF-8 names
+_VERSION = 45          # ZIP64
+_U32_MAX = 0xFFFFFFFF
+_LOCAL_EXTRA = 20      # zip64 extra: header (4) + uncompressed + compressed size
+_CENTRAL_EXTRA = 28    # + local header offset
+_DESCRIPTOR = 24
+_END = 56 + 20 + 22    # zip64 EOCD + zip64 locator + EOCD
+
+# {key (msg_id): crc32} taaki resume (Range) par pehle ki files dobara download na karni padein
+_crc_cache = {}
+
+def _dos_datetime(ts: float):
+    t = time.localtime(max(ts, 315532800))  # DOS dates 1980 se pehle nahi
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+class ZipEntry:
+    def __init__(self, key, name: str, size: int, mtime: float, source):
+        # source: async iterator factory -> source(start, end) file ke bytes deta hai
+        self.key = key
+        self.name = name.encode()
+        self.size = size
+        self.mtime = mtime
+        self.source = source
+        self.offset = 0
+        self.crc = 0 if size == 0 else _crc_cache.get(key)
+
+    @property
+    def data_offset(self):
+        return self.offset + 30 + len(self.name) + _LOCAL_EXTRA
+
+    @property
+    def end_offset(self):
+        return self.data_offset + self.size + _DESCRIPTOR
+
+    def local_header(self) -> bytes:
+        dtime, ddate = _dos_datetime(self.mtime)
+        return struct.pack(
+            "<IHHHHHIIIHH", 0x04034b50, _VERSION, _FLAGS, 0, dtime, ddate, 0, _U32_MAX, _U32_MAX, len(self.name), _LOCAL_EXTRA
+        ) + self.name + struct.pack("<HHQQ", 0x0001, 16, self.size, self.size)
+
+    def descriptor(self) -> bytes:
+        return struct.pack("<IIQQ", 0x08074b50, self.crc, self.size, self.size)
+
+    def central_header(self) -> bytes:
+        dtime, ddate = _dos_datetime(self.mtime)
+        return struct.pack(
+            "<IHHHHHHIIIHHHHHII", 0x02014b50, _VERSION, _VERSION, _FLAGS, 0, dtime, ddate, self.crc,
+            _U32_MAX, _U32_MAX, len(self.name), _CENTRAL_EXTRA, 0, 0, 0, 0, _U32_MAX
+        ) + self.name + struct.pack("<HHQQQ", 0x0001, 24, self.size, self.size, self.offset)
+
+
+class ZipStream:
+    """
+    Bina temp files, constant memory mein store-only ZIP64 stream.
+    Layout (aur Content-Length) sirf names + sizes se deterministic hai, isliye byte ranges (resume) bhi serve ho sakte hain.
+    Ek producer task agli files ke chunks pehle se fetch karta rehta hai (ZIP_PREFETCH_CHUNKS tak, file boundary ke paar bhi),
+    taaki headers likhte waqt ya file badalte waqt network idle na rahe.
+    """
+
+    def __init__(self, entries: list):
+        self.entries = entries
+        used = {}
+        offset = 0
+        for e in entries:
+            # Duplicate names: "a.mp4", "a (1).mp4", ...
+            name = e.name.decode().replace("/", "_").replace("\\", "_") or "file"
+            n = used.get(name.lower(), 0)
+            used[name.lower()] = n + 1
+            if n:
+                stem, dot, ext = name.rpartition(".")
+                name = f"{stem} ({n}).{ext}" if dot and stem else f"{name} ({n})"
+            e.name = name.encode()
+            e.offset = offset
+            offset = e.end_offset
+        self.central_offset = offset
+        self.central_size = sum(46 + len(e.name) + _CENTRAL_EXTRA for e in entries)
+        self.total_size = self.central_offset + self.central_size + _END
+
+    def can_resume_from(self, start: int) -> bool:
+        # Range se pehle poori khatam ho chuki files ke CRC pata hone chahiye (central directory ke liye)
+        return all(e.crc is not None for e in self.entries if e.data_offset + e.size <= start)
+
+    def _trailer(self) -> bytes:
+        count = len(self.entries)
+        central = b"".join(e.central_header() for e in self.entries)
+        zip64_end_offset = self.central_offset + self.central_size
+        return central + struct.pack(
+            "<IQHHIIQQQQ", 0x06064b50, 44, _VERSION, _VERSION, 0, 0, count, count, self.central_size, self.central_offset
+        ) + struct.pack("<IIQI", 0x07064b50, 0, zip64_end_offset, 1) + struct.pack(
+            "<IHHHHIIH", 0x06054b50, 0, 0, 0xFFFF, 0xFFFF, _U32_MAX, _U32_MAX, 0
+        )
+
+    async def _produce(self, plan: list, queue: asyncio.Queue):
+        try:
+            for entry, fetch_start, fetch_end in plan:
+                async for chunk in entry.source(fetch_start, fetch_end):
+                    await queue.put(chunk)
+                await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def iter_range(self, start: int, end: int):
+        """Archive ke [start, end] bytes (inclusive)."""
+        # Range mein aane wala data fetch hota hai. Jis file ka descriptor bhi range mein hai aur CRC pata nahi,
+        # use shuru se poora padhna padta hai (CRC ke liye), baaki sirf range wala hissa.
+        plan = []
+        for e in self.entries:
+            if e.size == 0 or e.data_offset + e.size <= start or e.data_offset > end:
+                continue
+            if e.crc is None and e.data_offset + e.size <= end:
+                plan.append((e, 0, e.size - 1))
+            else:
+                plan.append((e, max(0, start - e.data_offset), min(e.size - 1, end - e.data_offset)))
+
+        queue = asyncio.Queue(maxsize=Config.ZIP_PREFETCH_CHUNKS)
+        producer = asyncio.create_task(self._produce(plan, queue))
+        pending = {id(e): fetch_start for e, fetch_start, _ in plan}
+        pos = start
+
+        def window(seg_start: int, data: bytes):
+            lo = max(pos, seg_start) - seg_start
+            hi = min(end + 1, seg_start + len(data)) - seg_start
+            return data[lo:hi] if hi > lo else b""
+
+        try:
+            for e in self.entries:
+                if e.end_offset <= start:
+                    continue
+                if e.offset > end:
+                    break
+                header = e.local_header()
+                out = window(e.offset, header)
+                if out:
+                    yield out
+                    pos += len(out)
+
+                if id(e) in pending:
+                    crc, read = 0, pending[id(e)]
+                    from_start = read == 0
+                    while True:
+                        chunk = await queue.get()
+                        if chunk is None:
+                            break
+                        if isinstance(chunk, Exception):
+                            raise chunk
+                        out = window(e.data_offset + read, chunk)
+                        crc = zlib.crc32(chunk, crc)
+                        read += len(chunk)
+                        if out:
+                            yield out
+                            pos += len(out)
+                    if from_start and read == e.size:
+                        e.crc = _crc_cache[e.key] = crc
+                        if len(_crc_cache) > 10000:
+                            _crc_cache.pop(next(iter(_crc_cache)))
+                    elif read < min(e.size, end - e.data_offset + 1):
+                        # Adhoora data ke saath aage likhna archive corrupt karega; connection tod do (client resume karega)
+                        raise IOError(f"short read for {e.name.decode()}: {read}/{e.size}")
+
+                if e.data_offset + e.size <= end:
+                    out = window(e.data_offset + e.size, e.descriptor())
+                    if out:
+                        yield out
+                        pos += len(out)
+
+            if end >= self.central_offset:
+                out = window(self.central_offset, self._trailer())
+                if out:
+                    yield out
+        finally:
+            producer.cancel()